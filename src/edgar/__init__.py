@@ -3,9 +3,14 @@ from .metadata_manager import metadata_manager as _Metadata
 from .downloader import Downloader as _Downloader
 from .parser import Parser as _Parser
 from .document import DocumentType
-from .wrappers import load_files, get_files, read_file
+from .wrappers import load_files, get_files, read_file, read_files, \
+    read_exhibit, find_8k_filings, get_cover_facts
 from . import pipeline
 from .dataloader import DataLoader, DataLoaderConfig
+from .scheduler import DownloadScheduler
+from .localserver import LocalEDGARServer
+from .watcher import FilingWatcher
+from .tickers import TickerIndex
 
 module_name = 'edgar'
 
@@ -15,9 +20,14 @@ _Metadata.__module__ = module_name
 DocumentType.__module__ = module_name
 DataLoader.__module__ = module_name
 DataLoaderConfig.__module__ = module_name
+DownloadScheduler.__module__ = module_name
+LocalEDGARServer.__module__ = module_name
+FilingWatcher.__module__ = module_name
+TickerIndex.__module__ = module_name
 
 
-_, _, _ = load_files, get_files, read_file
+_, _, _, _, _, _, _ = load_files, get_files, read_file, read_files, \
+    read_exhibit, find_8k_filings, get_cover_facts
 
 Metadata = pipeline.Metadata
 Parser = pipeline.Parser
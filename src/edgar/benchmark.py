@@ -0,0 +1,323 @@
+"""End-to-end benchmark of downloading and unpacking against a local server.
+
+Run as ``python -m edgar.benchmark`` to download synthetic filings from a
+LocalEDGARServer with injected latency, bandwidth limits and errors, and
+report requests/sec, MB/s and time-to-first-document. With ``--storage``,
+compare instead the write and read MB/s and disk footprint of each storage
+compression level.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import warnings
+
+from .downloader import Downloader
+from .localserver import LocalEDGARServer, synthetic_submission
+from .metadata_manager import metadata_manager
+from . import storage
+
+
+class BenchmarkResult:
+    """Throughput and latency of one benchmark run."""
+
+    def __init__(self):
+        """Start with empty counters."""
+        self.elapsed = 0.0
+        self.requests = 0
+        self.bytes = 0
+        self.filings = 0
+        self.failed = 0
+        self.throttled = 0
+        self.errors = 0
+        self.time_to_first_document = None
+        self.unpack_elapsed = None
+
+    @property
+    def requests_per_second(self) -> float:
+        """Requests answered by the server per second of download."""
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        """Body bytes sent by the server, in MB per second of download."""
+        return self.bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        """Return the measurements as a flat dictionary."""
+        return {'elapsed': self.elapsed,
+                'requests': self.requests,
+                'requests_per_second': self.requests_per_second,
+                'megabytes': self.bytes / 1e6,
+                'megabytes_per_second': self.megabytes_per_second,
+                'time_to_first_document': self.time_to_first_document,
+                'filings': self.filings,
+                'failed': self.failed,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'unpack_elapsed': self.unpack_elapsed}
+
+    def __repr__(self):
+        """Summarize the run on a few lines."""
+        ttfd = '?' if self.time_to_first_document is None \
+            else f'{self.time_to_first_document:.3f}s'
+        out = (f'{self.filings} filings ({self.failed} failed) in '
+               f'{self.elapsed:.2f}s\n'
+               f'{self.requests} requests, {self.requests_per_second:.1f} '
+               f'req/s ({self.throttled} throttled, {self.errors} errors)\n'
+               f'{self.bytes / 1e6:.2f} MB, '
+               f'{self.megabytes_per_second:.2f} MB/s\n'
+               f'time to first document {ttfd}')
+        if self.unpack_elapsed is not None:
+            out += f'\nunpacked in {self.unpack_elapsed:.2f}s'
+        return out
+
+
+def run_benchmark(server: LocalEDGARServer, tikrs, document_type='all',
+                  workers: int = 8, rate: float = 1000.0,
+                  listing: str = 'json', documents: str = 'full',
+                  unpack: bool = False, data_dir: str = None):
+    """
+    Download every filing of some companies from a running local server.
+
+    Parameters
+    ----------
+    server: LocalEDGARServer
+        A started server with the companies' filings registered.
+    tikrs: list[str]
+        The companies to download.
+    document_type: str or list[str]
+        The form types to download, or 'all'.
+    workers: int
+        Number of requests allowed in flight at once.
+    rate: float
+        Maximum requests per second. The default leaves the server, not
+        the client, as the bottleneck.
+    listing: str
+        'json' or 'browse', see Downloader.query_server_bulk
+    documents: str
+        'full' or 'primary', see Downloader.query_server_bulk
+    unpack: bool
+        if (True), also time unpacking the downloaded submissions.
+    data_dir: str, Optional
+        Download into this directory. A temporary directory, removed
+        afterwards, is used if not provided.
+
+    Returns
+    -------
+    result: BenchmarkResult
+    """
+    is_temporary = data_dir is None
+    if is_temporary:
+        data_dir = tempfile.mkdtemp(prefix='edgar-bench-')
+    result = BenchmarkResult()
+    try:
+        metadata = metadata_manager(data_dir=data_dir)
+        if not os.path.exists(metadata.keys_path):
+            metadata.keys = {'edgar_agent': 'EDGAR-DOC-PARSER benchmark',
+                             'edgar_email': 'benchmark@localhost'}
+            metadata.save_keys()
+        loader = Downloader(data_dir=data_dir, metadata=metadata)
+
+        def on_progress(progress):
+            if result.time_to_first_document is None and progress.done > 0:
+                result.time_to_first_document = time.monotonic() - started
+
+        n_requests = len(server.request_log)
+        n_bytes = server.bytes_sent
+        n_throttled, n_failed = server.num_throttled, server.num_failed
+        started = time.monotonic()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            progress = loader.query_server_bulk(
+                tikrs, document_type=document_type, force=True,
+                workers=workers, rate=rate, base_url=server.base_url,
+                loading_bar=False, callback=on_progress, listing=listing,
+                documents=documents)
+        result.elapsed = time.monotonic() - started
+
+        result.requests = len(server.request_log) - n_requests
+        result.bytes = server.bytes_sent - n_bytes
+        result.throttled = server.num_throttled - n_throttled
+        result.errors = server.num_failed - n_failed
+        result.filings = sum(p.done for p in progress.values())
+        result.failed = sum(p.failed for p in progress.values())
+
+        if unpack and documents == 'full':
+            started = time.monotonic()
+            for dtype in ([document_type] if isinstance(document_type, str)
+                          else document_type):
+                loader.unpack_bulk_many(tikrs, force=True,
+                                        document_type=dtype, silent=True)
+            result.unpack_elapsed = time.monotonic() - started
+    finally:
+        if is_temporary:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return result
+
+
+# Compression settings compared by default, fastest to smallest
+STORAGE_SETTINGS = [(None, None), ('gzip', 1), ('gzip', 6), ('gzip', 9),
+                    ('zstd', 1), ('zstd', 3), ('zstd', 9), ('zstd', 19)]
+
+
+def run_storage_benchmark(paths: list = None, settings: list = None,
+                          samples: int = 8, size: int = 500000) -> list:
+    """
+    Measure write and read throughput and disk footprint per compression.
+
+    Parameters
+    ----------
+    paths: list[str], Optional
+        Files, or directories such as a data directory's .rawcache and
+        files/, to take samples from. Compressed samples are read through.
+        Synthetic submission dumps are used if not provided.
+    settings: list[tuple], Optional
+        (compression, level) pairs to compare. Defaults to
+        STORAGE_SETTINGS, without zstd if zstandard is not installed.
+    samples: int
+        Number of synthetic dumps, if no paths are given.
+    size: int
+        Bytes per synthetic dump.
+
+    Returns
+    -------
+    results: list[dict]
+        One row per setting, with 'megabytes' of input, 'stored_megabytes'
+        on disk, their 'ratio', and 'write_mb_per_second' and
+        'read_mb_per_second' of uncompressed data.
+    """
+    if settings is None:
+        settings = STORAGE_SETTINGS
+        try:
+            storage.check_compression('zstd')
+        except ImportError:
+            settings = [i for i in settings if i[0] != 'zstd']
+    if paths is None:
+        data = [synthetic_submission(f'0001000000-20-{i:06d}', size=size)
+                for i in range(samples)]
+    else:
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files += [os.path.join(root, i) for i in sorted(names)
+                              if not i.endswith('.part')]
+            else:
+                files.append(path)
+        data = [storage.read_bytes(i) for i in files]
+    total = sum(len(i) for i in data)
+
+    results = []
+    out_dir = tempfile.mkdtemp(prefix='edgar-storage-bench-')
+    try:
+        for compression, level in settings:
+            names = [os.path.join(out_dir, f'{n}.txt')
+                     for n in range(len(data))]
+            started = time.perf_counter()
+            for name, contents in zip(names, data):
+                storage.write_bytes(name, contents, compression, level)
+            write = time.perf_counter() - started
+            stored = sum(os.path.getsize(storage.find(i)) for i in names)
+            started = time.perf_counter()
+            for name in names:
+                storage.read_bytes(name)
+            read = time.perf_counter() - started
+            for name in names:
+                storage.remove(name)
+            results.append({
+                'compression': compression, 'level': level,
+                'megabytes': total / 1e6, 'stored_megabytes': stored / 1e6,
+                'ratio': total / stored if stored else 0.0,
+                'write_mb_per_second': total / 1e6 / write,
+                'read_mb_per_second': total / 1e6 / read})
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+
+def format_storage_results(results: list) -> str:
+    """Lay out run_storage_benchmark results as a table."""
+    lines = [f'{"compression":<12}{"level":>6}{"stored MB":>11}'
+             f'{"ratio":>8}{"write MB/s":>12}{"read MB/s":>11}']
+    for i in results:
+        level = '' if i['level'] is None else i['level']
+        lines.append(f'{str(i["compression"]):<12}{level:>6}'
+                     f'{i["stored_megabytes"]:>11.2f}{i["ratio"]:>8.2f}'
+                     f'{i["write_mb_per_second"]:>12.1f}'
+                     f'{i["read_mb_per_second"]:>11.1f}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m edgar.benchmark',
+        description='Benchmark downloads against a local EDGAR server.')
+    parser.add_argument('--companies', type=int, default=4,
+                        help='synthetic companies to serve')
+    parser.add_argument('--filings', type=int, default=8,
+                        help='filings of each form type per company')
+    parser.add_argument('--forms', nargs='+', default=['10-Q', '8-K'],
+                        help='form types to serve and download')
+    parser.add_argument('--size', type=int, default=200000,
+                        help='bytes per submission dump')
+    parser.add_argument('--raw-dir', default=None,
+                        help='serve recorded dumps from this .rawcache '
+                             'directory instead of synthetic ones')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help='client requests per second')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='bytes per second per connection')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='fraction of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with 500')
+    parser.add_argument('--retry-after', type=int, default=0)
+    parser.add_argument('--listing', choices=['json', 'browse'],
+                        default='json')
+    parser.add_argument('--documents', choices=['full', 'primary'],
+                        default='full')
+    parser.add_argument('--unpack', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--storage', action='store_true',
+                        help='benchmark storage compression levels instead')
+    parser.add_argument('--storage-paths', nargs='+', default=None,
+                        help='files or directories to sample with '
+                             '--storage, e.g. DATA_DIR/.rawcache')
+    args = parser.parse_args(argv)
+
+    if args.storage:
+        results = run_storage_benchmark(
+            paths=args.storage_paths, samples=args.filings,
+            size=args.size)
+        print(format_storage_results(results))
+        return results
+
+    server = LocalEDGARServer(
+        latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+        throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+        retry_after=args.retry_after, seed=args.seed)
+    if args.raw_dir is not None:
+        server.add_directory(args.raw_dir)
+        tikrs = sorted(server.companies)
+    else:
+        tikrs = server.add_synthetic(
+            args.companies, form_types=args.forms,
+            filings_per_type=args.filings, size=args.size)
+    with server:
+        result = run_benchmark(
+            server, tikrs, document_type=args.forms, workers=args.workers,
+            rate=args.rate, listing=args.listing, documents=args.documents,
+            unpack=args.unpack)
+    print(result)
+    return result
+
+
+if __name__ == '__main__':
+    main()
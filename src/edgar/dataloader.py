@@ -38,7 +38,10 @@ class DataLoaderConfig:
     def __init__(self, force_remove_raw: bool = True,
                  include_supplementary: bool = False,
                  return_submission: bool = False,
-                 return_tikr: bool = False):
+                 return_tikr: bool = False,
+                 virtual: bool = False,
+                 include_types: list = None,
+                 exclude_types: list = None):
         """
         Set up parameters for DataLoader.
 
@@ -55,11 +58,24 @@ class DataLoaderConfig:
         return_tikr: bool = False
             If true, will return (company ticker name, clean_text). Can be used
             alongside return_submission in form (ticker, submission, text).
+        virtual: bool = False
+            If true, documents are not extracted from the raw submission
+            dumps but read from their byte range on demand. Raw files are
+            then kept regardless of force_remove_raw.
+        include_types: list[str] = None
+            If documents are not available locally, patterns on the <TYPE> of
+            supplementary documents to extract, e.g. ['EX-99.*'].
+        exclude_types: list[str] = None
+            If documents are not available locally, patterns on the <TYPE> of
+            supplementary documents to leave unextracted.
         """
         self.force_remove_raw = force_remove_raw
         self.include_supplementary = include_supplementary
         self.return_submission = return_submission
         self.return_tikr = return_tikr
+        self.virtual = virtual
+        self.include_types = include_types
+        self.exclude_types = exclude_types
 
 
 class DataLoader:
@@ -114,10 +130,16 @@ class DataLoader:
             load_files(tikr, data_dir=self.DATA_DIR,
                        document_type=self.document_type,
                        include_supplementary=self.config.include_supplementary,
-                       force_remove_raw=self.config.force_remove_raw)
+                       force_remove_raw=self.config.force_remove_raw,
+                       virtual=self.config.virtual,
+                       include_types=self.config.include_types,
+                       exclude_types=self.config.exclude_types)
 
             submissions = self.metadata.get_submissions(tikr)
             for sub in submissions:
+                # Share-class tickers of one company list the same filings
+                if sub in self.tikr_lookup:
+                    continue
                 files = get_files(tikrs=tikr, submissions=sub,
                                   metadata=self.metadata)
                 for file in files:
@@ -165,7 +187,7 @@ class DataLoader:
         sub = self.sub_lookup[file]
         tikr = self.tikr_lookup[sub]
         f = read_file(tikr, sub, file, document_type=self.document_type,
-                      data_dir=self.DATA_DIR)
+                      data_dir=self.DATA_DIR, metadata=self.metadata)
         f = self.clean_func(f)
 
         if self.config.return_tikr:
@@ -11,6 +11,11 @@ class DocumentType:
     EXTRACTED_FILE_DIR_NAME = 'files'
     PARSED_FILE_DIR_NAME = 'parsed'
     META_FILE_DIR_NAME = '.metadata'
+    HTTP_CACHE_DIR_NAME = '.httpcache'
+    TICKER_INDEX_FILE_NAME = 'company_tickers_exchange.json'
+    JOURNAL_DIR_NAME = '.journal'
+    STORAGE_FILE_NAME = '.storage.yaml'
+    SHARD_DIR_NAME = 'shards'
     DEFAULT_DATA_DIR = 'data'
 
     # Currently implemented documents, and catcher for 'all'
@@ -1,18 +1,30 @@
 """Module for querying SEC-EDGAR database remotely and saving locally."""
 from secedgar import filings, FilingType
+from secedgar.cik_lookup import CIKLookup
 from secedgar.exceptions import NoFilingsError
-from bs4 import BeautifulSoup
 
+import io
 import os
 import warnings
 import datetime
-import sys
 import contextlib
 from time import sleep
+from typing import BinaryIO
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, \
+    FIRST_COMPLETED
 from tqdm.auto import tqdm
 
 from .document import DocumentType
 from .metadata_manager import metadata_manager
+from .network import EDGARClient, HTTPCache, EDGAR_BASE_URL, \
+    SEC_MAX_REQUESTS_PER_SECOND
+from .scheduler import DownloadScheduler
+from .submission import SubmissionReader, TypeFilter, parse_header, \
+    scan_submission, scan_stream
+from .tickers import TickerIndex
+from .journal import Journal, Checkpointer
+from .ingest import TeeReader, iter_members, open_member
+from . import storage
 
 
 class Downloader:
@@ -20,10 +32,6 @@ class Downloader:
 
     def __init__(self, data_dir: str = 'edgar_data', metadata=None):
         """Initialize Downloader."""
-        # our HTML files are so big and nested that the standard
-        #   1000 limit is too small.
-        sys.setrecursionlimit(100000)
-
         # Always gets the path of the current file
         self.data_dir = data_dir
         # Download and processed directories
@@ -31,6 +39,9 @@ class Downloader:
             self.data_dir, DocumentType.RAW_FILE_DIR_NAME)
         self.proc_dir = os.path.join(
             self.data_dir, DocumentType.PARSED_FILE_DIR_NAME)
+        self._http_cache = None
+        self._tickers = None
+        self._journal = None
 
         if metadata is None:
             self.metadata = metadata_manager(data_dir=self.data_dir)
@@ -73,6 +84,294 @@ class Downloader:
                         ' Is this correct? (y/n)'))
         self.metadata.save_keys()
 
+    def get_user_agent(self) -> str:
+        """Return the identification header required by the SEC."""
+        return ''.join([f"{self.metadata.keys['edgar_agent']}",
+                        f": {self.metadata.keys['edgar_email']}"])
+
+    @property
+    def http_cache(self) -> HTTPCache:
+        """
+        The HTTP cache under data_dir shared by this Downloader's clients.
+
+        Notes
+        -----
+        Its `hits`, `misses` and `bytes_saved` counters accumulate over
+        every download made through this Downloader.
+        """
+        if self._http_cache is None:
+            self._http_cache = HTTPCache(os.path.join(
+                self.data_dir, DocumentType.HTTP_CACHE_DIR_NAME))
+        return self._http_cache
+
+    @property
+    def tickers(self) -> TickerIndex:
+        """
+        The ticker to CIK index saved under data_dir.
+
+        Notes
+        -----
+        Shared by this Downloader's clients, so the SEC ticker file is
+        fetched at most once per data_dir until it is refreshed with
+        `tickers.update(client)`.
+        """
+        if self._tickers is None:
+            self._tickers = TickerIndex(os.path.join(
+                self.data_dir, DocumentType.TICKER_INDEX_FILE_NAME))
+            self._tickers.load()
+        return self._tickers
+
+    @property
+    def journal(self) -> Journal:
+        """
+        The per-accession processing journal under data_dir.
+
+        Notes
+        -----
+        Downloads and unpacking record each accession as it is queued,
+        fetched and split, so an interrupted run resumes where it stopped.
+        """
+        if self._journal is None:
+            self._journal = Journal(os.path.join(
+                self.data_dir, DocumentType.JOURNAL_DIR_NAME))
+        return self._journal
+
+    def _is_split(self, tikr: str, subname: str) -> bool:
+        """Return True if a submission was unpacked and its metadata kept."""
+        return self.journal.has_reached(tikr, subname, 'split') and \
+            subname in self.metadata._get_tikr(tikr)['submissions']
+
+    def get_client(self, base_url: str = EDGAR_BASE_URL,
+                   rate_limiter=None, cache: bool = True) -> EDGARClient:
+        """
+        Create a rate-limited EDGAR client identifying as the API user.
+
+        Parameters
+        ----------
+        base_url: str
+            Server to query. Point this at a local stand-in for testing.
+        rate_limiter: TokenBucket, Optional
+            Shared rate limiter, to keep several clients under one limit.
+        cache: bool
+            If (True), revalidate responses against the HTTP cache under
+            data_dir, so unchanged listings and filings are not fetched
+            again.
+        """
+        # Filings evicted by the disk quota are fetched again from here
+        self.metadata.base_url = base_url
+        return EDGARClient(self.get_user_agent(), base_url=base_url,
+                           rate_limiter=rate_limiter,
+                           cache=self.http_cache if cache else None,
+                           tickers=self.tickers)
+
+    def resolve_tikrs(self, tikrs: list, client: EDGARClient = None,
+                      base_url: str = EDGAR_BASE_URL) -> list:
+        """
+        Map tickers to the ticker their company's filings are stored under.
+
+        Parameters
+        ---------
+        tikrs: list[str]
+            the company identifiers to resolve
+        client: EDGARClient, Optional
+            Client used to look up CIKs not yet recorded in metadata.
+        base_url: str
+            Server to query when no client is given.
+
+        Returns
+        -------
+        tikrs: list[str]
+            One canonical ticker per company, in order of first appearance.
+
+        Notes
+        -----
+        Share classes of one company, such as goog and googl, file under a
+        single CIK. Only the first ticker seen for a CIK is downloaded and
+        unpacked; the others are recorded as its aliases, and metadata
+        lookups under an alias read the canonical ticker's filings.
+        Tickers whose CIK cannot be looked up are kept as they are.
+        """
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        out = []
+        for tikr in tikrs:
+            if self.metadata.get_cik(tikr) is None:
+                if client is None:
+                    client = self.get_client(base_url=base_url)
+                try:
+                    self.metadata.set_cik(tikr, client.get_cik(tikr))
+                except (KeyError, OSError, ValueError):
+                    pass
+            tikr = self.metadata.canonical(tikr)
+            if tikr not in out:
+                out.append(tikr)
+        return out
+
+    def query_server_bulk(
+            self, tikrs: list, document_type: str = '10-Q',
+            force: bool = False, workers: int = 8,
+            rate: float = SEC_MAX_REQUESTS_PER_SECOND,
+            base_url: str = EDGAR_BASE_URL, loading_bar: bool = True,
+            callback=None, listing: str = 'json', documents: str = 'full',
+            include_types: list = None, exclude_types: list = None,
+            **kwargs):
+        """
+        Download SEC filings for many companies concurrently.
+
+        Parameters
+        ---------
+        tikrs: list[str]
+            the company identifiers to query
+        document_type: str
+            The type of filings to download, 10-Q or 8-K
+        force: bool
+            if (True), then ignore locally downloaded files
+            and overwrite them.
+        workers: int
+            Number of requests allowed in flight at once.
+        rate: float
+            Maximum requests per second, shared across all workers.
+        base_url: str
+            Server to query. Point this at a local stand-in for testing.
+        loading_bar: bool
+            if True, will show overall progress and estimated finish time.
+        callback: Callable[[TickerProgress], None], Optional
+            Called with a company's progress after each of its filings.
+        listing: str
+            'json' to list filings with the submissions JSON API, or
+            'browse' to page through browse-edgar.
+        documents: str
+            'full' to download each full submission dump to the raw cache,
+            or 'primary' to fetch only the primary document straight into
+            files/, which leaves nothing to unpack.
+        include_types: list[str], Optional
+            With documents='primary', patterns on the <TYPE> of exhibits
+            to fetch as well, e.g. ['EX-99.*'].
+        exclude_types: list[str], Optional
+            With documents='primary', patterns on the <TYPE> of exhibits
+            never to fetch.
+        start_date: optional
+            The earliest date to look for filings
+        end_date: optional
+            The latest filing date retrievable
+        max_num_filings:
+            The maximum number of documents to retrieve per company.
+
+        Returns
+        -------
+        progress: dict[str, TickerProgress]
+            Final download progress of each company.
+        """
+        scheduler = DownloadScheduler(
+            self, workers=workers, rate=rate, base_url=base_url,
+            callback=callback, loading_bar=loading_bar, listing=listing,
+            documents=documents, include_types=include_types,
+            exclude_types=exclude_types)
+        progress = scheduler.run(tikrs, document_type=document_type,
+                                 force=force, **kwargs)
+        self.metadata.enforce_quota()
+        return progress
+
+    def refresh(self, tikrs: list, document_type: str = '10-Q',
+                workers: int = 8, base_url: str = EDGAR_BASE_URL,
+                remove_raw: bool = False, force_remove_raw: bool = False,
+                loading_bar: bool = True,
+                include_supplementary: bool = False, virtual: bool = False,
+                include_types: list = None, exclude_types: list = None,
+                **kwargs):
+        """
+        Download and unpack only filings newer than those held locally.
+
+        Parameters
+        ---------
+        tikrs: list[str]
+            the company identifiers to refresh
+        document_type: str
+            The type of filings to refresh, 10-Q or 8-K
+        workers: int
+            Number of requests allowed in flight at once. If greater than
+            1, new submissions are also unpacked on a pool of up to this
+            many processes.
+        base_url: str
+            Server to query. Point this at a local stand-in for testing.
+        remove_raw: bool
+            If True, will delete each raw file after it is extracted
+        force_remove_raw: bool, Optional
+            If True, will delete all files in the unpacking directory
+            of each refreshed company, even if some are not unpacked.
+        include_supplementary: bool
+            If (True), then unpack all supplementary material as well.
+        virtual: bool = False
+            If True, record byte ranges into the raw dumps instead of
+            copying documents out. Raw files are then never removed.
+        include_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to unpack.
+        exclude_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to skip.
+
+        Returns
+        -------
+        new_submissions: dict[str, list[str]]
+            The submissions fetched and unpacked for each company.
+
+        Notes
+        -----
+        Each company is listed from the latest 'FILED AS OF DATE' in its
+        metadata onwards, so a refresh costs about one request per company
+        plus one per new filing. Companies with no local submissions are
+        downloaded in full.
+        """
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        if force_remove_raw:
+            remove_raw = True
+        if virtual:
+            remove_raw = force_remove_raw = False
+        with self.metadata.deferred_quota():
+            progress = self.query_server_bulk(
+                tikrs, document_type=document_type, workers=workers,
+                base_url=base_url, loading_bar=loading_bar, refresh=True,
+                **kwargs)
+            tikrs = [i for i in dict.fromkeys(
+                self.metadata.canonical(i) for i in tikrs) if i in progress]
+
+            out = dict()
+            tasks = []
+            for tikr in tikrs:
+                out[tikr] = sorted(progress[tikr].fetched)
+                submissions = self.metadata._get_tikr(tikr)['submissions']
+                for subname in out[tikr]:
+                    dtype = progress[tikr].fetched_types[subname]
+                    path = os.path.join(self.raw_dir, tikr, dtype,
+                                        f'{subname}.txt')
+                    stored = storage.find(path)
+                    # Primary documents are written to files/ as fetched
+                    if stored is None:
+                        continue
+                    tasks.append((os.path.getsize(stored), tikr, dtype,
+                                  f'{subname}.txt',
+                                  submissions.get(subname, None)))
+
+            kwargs = {'remove_raw': remove_raw,
+                      'include_supplementary': include_supplementary,
+                      'virtual': virtual, 'include_types': include_types,
+                      'exclude_types': exclude_types}
+            if workers > 1 and len(tasks) > 1:
+                self._unpack_pool(
+                    tasks, kwargs, workers=min(workers, os.cpu_count() or 1),
+                    loading_bar=loading_bar, desc='Inflating HTM')
+            else:
+                for _, tikr, dtype, file, _ in tasks:
+                    self.unpack_file(tikr, file, document_type=dtype,
+                                     **kwargs)
+                    self.journal.record(tikr, file.split('.txt')[0], 'split')
+
+            for tikr, dtype in dict.fromkeys(
+                    (tikr, dtype) for _, tikr, dtype, _, _ in tasks):
+                self._finish_unpack_bulk(tikr, dtype, remove_raw=remove_raw,
+                                         force_remove_raw=force_remove_raw)
+        return out
+
     def query_server(
             self, tikr: str, document_type: str = 'all', delay_time: int = 1,
             force: bool = False, **kwargs):
@@ -83,6 +382,9 @@ class Downloader:
         ---------
         tikr: str
             a company identifier to query
+        document_type: str or list
+            The type of filings to download: 10-Q, 8-K, or 'all' / a list
+            of both, which are collected in a single pass over the company.
         force: bool
             if (True), then ignore locally downloaded files
             and overwrite them. Otherwise, attempt to detect
@@ -100,20 +402,21 @@ class Downloader:
         """
         sleep(delay_time)
 
-        if self.metadata.is_downloaded(tikr) and not force:
-            print('\talready downloaded')
+        if not isinstance(document_type, (str, DocumentType)) or \
+                DocumentType(document_type) == 'all':
+            # One pass over the company collects every form type
+            self.query_server_bulk([tikr], document_type=document_type,
+                                   force=force, workers=1,
+                                   loading_bar=False, **kwargs)
             return
 
-        elif (kwargs.get('start_date', None) is None and (
-                kwargs.get('end_date', None) is None) and (
-              kwargs.get('max_num_filings', None) is None)
-              ):
-
-            self.metadata.set_downloaded(tikr, True)
-
-        user_agent = ''.join([f"{self.metadata.keys['edgar_agent']}",
-                              f": {self.metadata.keys['edgar_email']}"])
         document_type = DocumentType(document_type)
+        tikr = self.resolve_tikrs([tikr])[0]
+        if self.metadata.is_downloaded(tikr, document_type) and not force:
+            print('\talready downloaded')
+            return
+
+        user_agent = self.get_user_agent()
 
         filing_type = None
         if document_type.dtype == '10-Q':
@@ -123,7 +426,13 @@ class Downloader:
         else:
             raise NotImplementedError('Query does not support this doctype')
 
-        f = filings(cik_lookup=tikr,
+        # Answer secedgar's CIK lookup from the local index
+        cik_lookup = tikr
+        if self.metadata.get_cik(tikr) is not None:
+            cik_lookup = _IndexedCIKLookup(
+                {tikr: self.metadata.get_cik(tikr)}, user_agent=user_agent)
+
+        f = filings(cik_lookup=cik_lookup,
                     filing_type=filing_type,
                     count=kwargs.get('max_num_filings', None),
                     user_agent=user_agent,
@@ -139,10 +448,21 @@ class Downloader:
                 try:
                     f.save(self.raw_dir)
                 except NoFilingsError:
-                    self.metadata.set_downloaded(tikr, True)
+                    self.metadata.set_downloaded(tikr, True, document_type)
                     self.metadata.set_unpacked(
                         tikr, document_type=document_type, value=True)
                     warnings.warn(f'No Filings Under {tikr}', RuntimeWarning)
+                else:
+                    self.journal.record(tikr, [i.split('.txt')[0] for i in
+                                               self.get_unpackable_files(
+                                                   tikr, document_type)],
+                                        'fetched')
+                    # Only marked once every filing is on disk
+                    if (kwargs.get('start_date', None) is None and (
+                            kwargs.get('end_date', None) is None) and (
+                            kwargs.get('max_num_filings', None) is None)):
+                        self.metadata.set_downloaded(
+                            tikr, True, document_type)
         warnings.simplefilter('default')
 
     def get_unpackable_files(
@@ -166,10 +486,11 @@ class Downloader:
                 **kwargs) + self.get_unpackable_files(
                 tikr=tikr, document_type='8-K', **kwargs)
 
+        tikr = self.metadata.canonical(tikr)
         d_dir = os.path.join(self.raw_dir, f'{tikr}', f'{document_type}')
-        if not os.path.exists(d_dir):
-            return []
-        return os.listdir(d_dir)
+        # Dumps demoted to colder tiers are listed as well
+        return [i for i in storage.listdir(d_dir)
+                if storage.strip_suffix(i).endswith('.txt')]
 
     def get_submissions(self, tikr, **kwargs):
         """
@@ -188,7 +509,8 @@ class Downloader:
 
     def __unpack_doc__(
             self, tikr, submission, doc, document_type, force=True,
-            include_supplementary: bool = False):
+            include_supplementary: bool = False, virtual: bool = False,
+            source: str = None, keep: BinaryIO = None):
         """
         Private utility, parses SEC submission dump into components.
 
@@ -198,8 +520,16 @@ class Downloader:
             the company the document belongs to
         submission: str
             the submission the document is from
-        doc: str
-            the html document being parsed
+        doc: SubmissionDocument
+            the document being extracted, positioned at its body
+        virtual: bool
+            If True, record the document's byte range in `source` instead
+            of writing it out.
+        source: str
+            The submission dump, relative to data_dir.
+        keep: BinaryIO, Optional
+            Also receives the body of an html document as it is read, so
+            it can be used without reading it back.
 
         Returns
         -------
@@ -209,11 +539,7 @@ class Downloader:
         submission = submission.split('.')[0]
         metadata = self.metadata._get_submission(tikr, submission)['documents']
 
-        seq = doc.find('sequence')
-        i = 20
-        while ('\n') not in seq.text[:i]:
-            i += 20
-        sequence = seq.text[:i].split('\n')[0]
+        sequence = doc.sequence
 
         # Do not repeat work unless forcing
         if metadata[sequence].get('extracted', False) and not force:
@@ -233,28 +559,22 @@ class Downloader:
         filename = metadata[sequence]['filename']
 
         if '.htm' not in filename:
-            if '.jpg' in filename or '.png' in filename:
-                warnings.warn('Images not yet supported', RuntimeWarning)
-            elif '.txt' in filename:
-                warnings.warn('Pure .TXT not yet supported', RuntimeWarning)
-            else:
-                warnings.warn('Non HTML documents are not yet supported',
-                              RuntimeWarning)
+            # Images and other exhibits are only indexed, not decoded.
+            #   See metadata_manager.read_exhibit
+            offset, length = doc.offset, doc.skip()
+            if source is not None:
+                metadata[sequence].update(
+                    {'source': source, 'offset': offset, 'length': length})
             return False
 
-        ensure_path = os.path.join(
-            self.data_dir, DocumentType.EXTRACTED_FILE_DIR_NAME)
-        if not os.path.exists(ensure_path):
-            os.mkdir(ensure_path)
-        ensure_path = os.path.join(ensure_path, f'{tikr}')
-        if not os.path.exists(ensure_path):
-            os.mkdir(ensure_path)
-        ensure_path = os.path.join(ensure_path, f'{document_type}')
-        if not os.path.exists(ensure_path):
-            os.mkdir(ensure_path)
-        ensure_path = os.path.join(ensure_path, submission)
-        if not os.path.exists(ensure_path):
-            os.mkdir(ensure_path)
+        if virtual:
+            metadata[sequence]['source'] = source
+            metadata[sequence]['offset'] = doc.offset
+            metadata[sequence]['length'] = doc.skip() if keep is None \
+                else doc.copy_to(keep)
+            metadata[sequence]['virtual'] = True
+            metadata[sequence]['extracted'] = True
+            return True
 
         out_path = None
         if form_type == '10-Q':
@@ -274,18 +594,27 @@ class Downloader:
         else:
             raise NotImplementedError
 
-        with open(
-                os.path.join(out_path, submission, filename),
-                'w', encoding='utf-8') as f:
-
-            f.write(doc.prettify())
-            metadata[sequence]['extracted'] = True
+        # The storage backend makes directories, or packs into a shard
+        with self.metadata.get_storage().open_write(
+                os.path.join(out_path, submission, filename)) as f:
+            for piece in doc.iter_body():
+                f.write(piece)
+                if keep is not None:
+                    keep.write(piece)
+            length = doc.length
+        metadata[sequence]['extracted'] = True
+        # Kept so the document can be derived again once evicted
+        if source is not None:
+            metadata[sequence].update(
+                {'source': source, 'offset': doc.offset, 'length': length})
 
         return True
 
     def unpack_file(self, tikr, file, document_type='all',
                     force=True, remove_raw=False,
-                    include_supplementary: bool = False, **kwargs):
+                    include_supplementary: bool = False,
+                    virtual: bool = False, include_types: list = None,
+                    exclude_types: list = None, **kwargs):
         """
         Process raw data from one filing at one company.
 
@@ -309,66 +638,291 @@ class Downloader:
             If (True), the raw data will be deleted after parsing.
         include_supplementary: bool = False
             If (True), unpacks all supplementary documents to the main one.
+        virtual: bool = False
+            If (True), documents are not copied out of the raw dump. Their
+            byte ranges are recorded in metadata and read on demand, and
+            the raw dump is always kept.
+        include_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to unpack,
+            e.g. ['EX-99.*']. Implies include_supplementary for matches.
+            The primary form is always unpacked.
+        exclude_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to skip.
+
+        Notes
+        -----
+        Documents rejected by the type patterns are skipped in the stream
+        before their body is read or anything is written.
         """
         # sec-edgar data save location for documents filing ticker
         document_type = DocumentType(document_type)
+        tikr = self.metadata.canonical(tikr)
 
         d_dir = os.path.join(self.raw_dir, f'{tikr}', f'{document_type}')
-        content = None
-        with open(os.path.join(d_dir, file), 'r', encoding='utf-8') as f:
-            content = f.read().strip()
+        subname = file.split('.txt')[0]
+        # Byte ranges refer to the dump however it is compressed
+        path = os.path.join(d_dir, storage.strip_suffix(file))
+        source = os.path.relpath(path, self.data_dir)
+        if virtual:
+            remove_raw = False
+
+        self.metadata.touch(path)
+        with storage.open_read(path) as f:
+            non_empty = self._unpack_reader(
+                tikr, subname, SubmissionReader(f), document_type, source,
+                force=force, include_supplementary=include_supplementary,
+                virtual=virtual, include_types=include_types,
+                exclude_types=exclude_types)
+        if non_empty is None:
+            return
 
-        d = BeautifulSoup(content, features='lxml').body
+        if remove_raw:
+            self.metadata.set_downloaded(tikr, False, document_type)
 
-        subname = file.split('.txt')[0]
-        p = d.find('sec-document')
-        if p is None:
-            p = d.find('ims-document')
-            if p is not None:
-                warnings.warn(
-                    'IMS-DOCUMENT skipped during loading', RuntimeWarning)
-                if subname not in self.metadata._get_tikr(tikr)['submissions']:
-                    self.metadata.initialize_submission_metadata(tikr, subname)
-                self.metadata._get_submission(tikr, subname)['attrs'][
-                    'is_ims-document'] = True
-                self.metadata._get_submission(tikr, subname)['attrs'][
-                    'FORM TYPE'] = 'IMS'
-                return
-        d = p
-        if d is None:
+            # Metadata only exists for submission that has entries unpacked
+            if non_empty:
+                self.metadata._gen_submission_attrs(tikr, file.replace(
+                    '.txt', ''))
+
+        self.metadata.save_tikr_metadata(tikr)
+        # The dump is only removed once its metadata is on disk
+        if remove_raw:
+            storage.remove(path)
+
+    def _unpack_reader(self, tikr, subname, reader, document_type,
+                       source=None, force=True,
+                       include_supplementary: bool = False,
+                       virtual: bool = False, include_types: list = None,
+                       exclude_types: list = None):
+        """
+        Unpack a submission from an open SubmissionReader.
+
+        Parameters
+        ---------
+        tikr: str
+            company ticker associated with the filing
+        subname: str
+            The accession number of the submission
+        reader: SubmissionReader
+            The submission, read past its header
+        document_type: DocumentType
+            document type to unpack under (10-Q, 8-K, or all)
+        source: str, Optional
+            The raw dump being read, relative to data_dir. If None, such as
+            for a dump streamed out of an archive, no byte ranges are
+            recorded and documents cannot be virtual.
+
+        Returns
+        -------
+        non_empty: bool
+            If any document was extracted, or None if the submission is not
+            an SEC-DOCUMENT and nothing was recorded.
+
+        Notes
+        -----
+        Metadata is filled in but not saved; see unpack_file.
+        """
+        if reader.kind == 'IMS-DOCUMENT':
+            warnings.warn(
+                'IMS-DOCUMENT skipped during loading', RuntimeWarning)
+            self._mark_ims_document(tikr, subname)
+            return
+        if reader.kind is None:
             warnings.warn('No sec-document tag found in submission',
                           RuntimeWarning)
             return
+        if source is None:
+            virtual = False
 
-        documents = d.find_all('document', recursive=False)
-
-        self.metadata._gen_submission_doc_attrs(tikr, subname, documents)
+        self.metadata.initialize_tikr_metadata(tikr)
+        self.metadata.initialize_submission_metadata(tikr, subname)
 
         # SET Submission ATTRS in Metadata
-        sec_header = d.find('sec-header').text.replace('\t', '').split('\n')
-        sec_header = [i for i in sec_header if ':' in i]
-        attrs = {i.split(':')[0]: i.split(':')[1] for i in sec_header}
-        self.metadata._get_tikr(tikr)['submissions'][subname]['attrs'] = attrs
+        attrs = parse_header(reader.header_lines())
+        self.metadata._get_tikr(tikr)['submissions'][subname][
+            'attrs'] = attrs
+        self.metadata._gen_submission_items(tikr, subname)
 
         # We track whether any submission is succesfully unpacked
         non_empty = False
-        for doc in documents:
+        type_filter = TypeFilter(include_types, exclude_types)
+        primary = None
+        for doc in reader:
+            self.metadata._gen_submission_doc_attrs(tikr, subname, [doc])
+            keep = None
+            if primary is None and doc.filename == \
+                    self.metadata.get_primary_doc_name(tikr, subname):
+                primary = keep = io.BytesIO()
+
+            # Supplementary documents are filtered by <TYPE> alone
+            if not DocumentType.is_valid_type(doc.type) and not (
+                    (include_supplementary or type_filter.is_restrictive)
+                    and type_filter(doc.type)):
+                # Still index its byte range for read_exhibit
+                entry = self.metadata._get_submission(
+                    tikr, subname)['documents'][doc.sequence]
+                offset, length = doc.offset, doc.skip()
+                if source is not None:
+                    entry.update({'source': source, 'offset': offset,
+                                  'length': length})
+                continue
+
             succesfully_unpacked = self.__unpack_doc__(
-                tikr, subname, doc, document_type=document_type, force=force,
-                include_supplementary=include_supplementary)
+                tikr, subname, doc, document_type=document_type,
+                force=force, include_supplementary=True,
+                virtual=virtual, source=source, keep=keep)
 
             non_empty = non_empty or succesfully_unpacked
 
-        if remove_raw:
-            os.remove(os.path.join(d_dir, file))
-            self.metadata.set_downloaded(tikr, False)
+        # Cover facts are read from the primary document's bytes as they
+        #   were unpacked, unless it was skipped
+        data = primary.getvalue() if primary is not None else b''
+        self.metadata._gen_submission_facts(tikr, subname,
+                                            data=data or None)
+        return non_empty
 
-            # Metadata only exists for submission that has entries unpacked
-            if non_empty:
-                self.metadata._gen_submission_attrs(tikr, file.replace(
-                    '.txt', ''))
+    def _record_submission(self, tikr, subname, kind, header, documents,
+                           extracted):
+        """
+        Record metadata for a submission whose documents were fetched \
+        individually instead of unpacked from a raw dump.
 
-        self.metadata.save_tikr_metadata(tikr)
+        Parameters
+        ---------
+        tikr: str
+            company ticker associated with the filing
+        subname: str
+            The accession number of the submission
+        kind, header, documents:
+            As returned by parse_index_headers.
+        extracted: list[str]
+            Names of the documents that were written under files/.
+        """
+        if kind == 'IMS-DOCUMENT':
+            self._mark_ims_document(tikr, subname)
+            return
+        self.metadata.initialize_tikr_metadata(tikr)
+        self.metadata.initialize_submission_metadata(tikr, subname)
+        self.metadata._get_submission(tikr, subname)['attrs'] = \
+            parse_header(header)
+        self.metadata._gen_submission_items(tikr, subname)
+        self.metadata._gen_submission_doc_attrs(tikr, subname, documents)
+        entries = self.metadata._get_submission(tikr, subname)['documents']
+        for doc in documents:
+            if doc.filename in extracted:
+                entries[doc.sequence]['extracted'] = True
+        self.metadata._gen_submission_facts(tikr, subname)
+
+    def _mark_ims_document(self, tikr, subname):
+        """Record a submission as an unsupported IMS-DOCUMENT."""
+        if subname not in self.metadata._get_tikr(tikr)['submissions']:
+            self.metadata.initialize_submission_metadata(tikr, subname)
+        self.metadata._get_submission(tikr, subname)['attrs'][
+            'is_ims-document'] = True
+        self.metadata._get_submission(tikr, subname)['attrs'][
+            'FORM TYPE'] = 'IMS'
+
+    def scan_file(self, tikr, file, document_type='all',
+                  documents: bool = True):
+        """
+        Fill submission metadata from the headers of one raw dump.
+
+        Parameters
+        ---------
+        tikr: str
+            company ticker associated with the filing
+        file: str
+            filing submission to scan
+        document_type: str
+            document type the filing was downloaded under (10-Q or 8-K)
+        documents: bool
+            If False, only read the <SEC-HEADER> block.
+
+        Notes
+        -----
+        Nothing is extracted and no document body is read. The submission
+        attrs (FORM TYPE, FILED AS OF DATE, ...) and each document's type,
+        filename, description and byte range are recorded, as unpack_file
+        would. Metadata is not saved; see scan_raw.
+        """
+        document_type = DocumentType(document_type)
+        tikr = self.metadata.canonical(tikr)
+        path = os.path.join(self.raw_dir, f'{tikr}', f'{document_type}',
+                            storage.strip_suffix(file))
+        subname = file.split('.txt')[0]
+
+        stored = storage.find(path)
+        if storage.compression_of(stored) is None:
+            kind, header, docs = scan_submission(stored, documents=documents)
+        else:
+            with storage.open_read(stored) as f:
+                kind, header, docs = scan_stream(f, documents=documents)
+        if kind == 'IMS-DOCUMENT':
+            self._mark_ims_document(tikr, subname)
+            return
+        if kind is None:
+            warnings.warn('No sec-document tag found in submission',
+                          RuntimeWarning)
+            return
+
+        self.metadata.initialize_tikr_metadata(tikr)
+        self.metadata.initialize_submission_metadata(tikr, subname)
+        self.metadata._get_submission(tikr, subname)['attrs'].update(
+            parse_header(header))
+        self.metadata._gen_submission_items(tikr, subname)
+
+        self.metadata._gen_submission_doc_attrs(tikr, subname, docs)
+        source = os.path.relpath(path, self.data_dir)
+        entries = self.metadata._get_submission(tikr, subname)['documents']
+        for doc in docs:
+            entry = entries[doc.sequence]
+            if 'offset' not in entry:
+                entry.update({'source': source, 'offset': doc.offset,
+                              'length': doc.length})
+
+    def scan_raw(self, tikrs: list = None, document_type='all',
+                 documents: bool = True, loading_bar: bool = False):
+        """
+        Build submission metadata for raw dumps without unpacking them.
+
+        Parameters
+        ---------
+        tikrs: list[str], Optional
+            companies to scan. Defaults to every company in the raw cache.
+        document_type: str
+            document type to scan (10-Q, 8-K, or all)
+        documents: bool
+            If False, only read each dump's <SEC-HEADER> block.
+        loading_bar: bool
+            if True, will show progress
+
+        Returns
+        -------
+        count: int
+            The number of submissions scanned.
+        """
+        if tikrs is None:
+            tikrs = storage.listdir(self.raw_dir)
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        document_type = DocumentType(document_type)
+        document_types = [DocumentType('10-Q'), DocumentType('8-K')] \
+            if document_type == 'all' else [document_type]
+
+        itera = tikrs
+        if loading_bar:
+            itera = tqdm(itera, desc='Scanning headers', leave=False)
+
+        count = 0
+        for tikr in itera:
+            for dtype in document_types:
+                for file in self.get_unpackable_files(
+                        tikr, document_type=dtype):
+                    self.scan_file(tikr, file, document_type=dtype,
+                                   documents=documents)
+                    count += 1
+            self.metadata.save_tikr_metadata(tikr)
+        return count
 
     def _are_filings_unpacked(self, tikr: str, document_type: str):
         """
@@ -389,7 +943,9 @@ class Downloader:
             desc='Inflating HTM', remove_raw=False,
             force_remove_raw=False,
             document_type='all', silent=False,
-            include_supplementary=False):
+            include_supplementary=False, workers: int = 1,
+            virtual: bool = False, include_types: list = None,
+            exclude_types: list = None):
         """
         Process all raw data from one company.
 
@@ -412,21 +968,45 @@ class Downloader:
             even if some are not unpacked.
         include_supplementary: bool = False
             If (True), then load all supplementary material as well.
+        workers: int = 1
+            If greater than 1, unpacks submissions in parallel on this many
+            processes. See unpack_bulk_many.
+        virtual: bool = False
+            If True, record byte ranges into the raw dumps instead of
+            copying documents out. Raw files are then never removed.
+        include_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to unpack,
+            e.g. ['EX-99.*']. The primary form is always unpacked.
+        exclude_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to skip.
         """
+        if workers > 1:
+            return self.unpack_bulk_many(
+                [tikr], force=force, loading_bar=loading_bar, desc=desc,
+                remove_raw=remove_raw, force_remove_raw=force_remove_raw,
+                document_type=document_type, silent=silent,
+                include_supplementary=include_supplementary, workers=workers,
+                virtual=virtual, include_types=include_types,
+                exclude_types=exclude_types)
+
         document_type = DocumentType(document_type)
         if document_type == 'all':
-            self.unpack_bulk(tikr, force=force, loading_bar=False,
-                             desc=desc, remove_raw=remove_raw,
-                             document_type='10-Q', silent=silent,
-                             include_supplementary=include_supplementary)
-            self.unpack_bulk(tikr, force=force, loading_bar=False,
-                             desc=desc, remove_raw=remove_raw,
-                             document_type='8-K', silent=silent,
-                             include_supplementary=include_supplementary)
+            with self.metadata.deferred_quota():
+                for dtype in ('10-Q', '8-K'):
+                    self.unpack_bulk(
+                        tikr, force=force, loading_bar=False, desc=desc,
+                        remove_raw=remove_raw, document_type=dtype,
+                        silent=silent,
+                        include_supplementary=include_supplementary,
+                        virtual=virtual, include_types=include_types,
+                        exclude_types=exclude_types)
             return
 
         if force_remove_raw:
             remove_raw = True
+        if virtual:
+            remove_raw = force_remove_raw = False
+        tikr = self.metadata.canonical(tikr)
 
         # Early quitting conditions
         if not force and self.metadata.is_unpacked(tikr, document_type):
@@ -441,6 +1021,10 @@ class Downloader:
             itera = tqdm(itera, desc=desc, leave=False)
 
         for file in itera:
+            # Submissions split before an interruption are not redone
+            subname = file.split('.txt')[0]
+            if not force and self._is_split(tikr, subname):
+                continue
             self.unpack_file(
                 tikr,
                 file,
@@ -448,15 +1032,307 @@ class Downloader:
                 force=force,
                 silent=silent,
                 remove_raw=remove_raw,
-                include_supplementary=True)
+                include_supplementary=include_supplementary,
+                virtual=virtual,
+                include_types=include_types,
+                exclude_types=exclude_types)
+            self.journal.record(tikr, subname, 'split')
+
+        self._finish_unpack_bulk(tikr, document_type, remove_raw=remove_raw,
+                                 force_remove_raw=force_remove_raw)
+        self.metadata.enforce_quota()
+
+    def unpack_bulk_many(
+            self, tikrs, force=False, loading_bar=False,
+            desc='Inflating HTM', remove_raw=False,
+            force_remove_raw=False,
+            document_type='all', silent=False,
+            include_supplementary=False, workers: int = None,
+            virtual: bool = False, include_types: list = None,
+            exclude_types: list = None):
+        """
+        Process all raw data from several companies on a process pool.
+
+        Parameters
+        ---------
+        tikrs: list[str]
+            company tickers associated with unpacking
+        force: bool
+            if (True), then ignore previously unpacked files and
+            overwrite them.
+        loading_bar: bool
+            if True, will time and show progress
+        document_type: str or DocumentType
+            The type of filings in question
+        remove_raw: bool, Optional
+            If True, will delete each raw file after it is extracted
+        force_remove_raw: bool, Optional
+            If True, will delete all files in the unpacking directory
+            even if some are not unpacked.
+        include_supplementary: bool = False
+            If (True), then load all supplementary material as well.
+        workers: int, Optional
+            Number of worker processes. Defaults to the number of CPUs.
+        virtual: bool = False
+            If True, record byte ranges into the raw dumps instead of
+            copying documents out. Raw files are then never removed.
+        include_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to unpack,
+            e.g. ['EX-99.*']. The primary form is always unpacked.
+        exclude_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to skip.
+
+        Notes
+        -----
+        The unit of work is one submission, not one company. Submissions
+        from every company are queued largest first, and idle workers take
+        the next one from the shared queue, so a few very large filers do
+        not hold up the rest of the batch.
+
+        Workers never write metadata to disk. Each returns its submission's
+        metadata, which is merged here as it arrives and saved at least
+        every second, then journaled as split. New submissions are ordered
+        by name, so the result does not depend on scheduling. Submissions
+        already split by an interrupted run are skipped.
+        """
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        # Aliases of one company are unpacked once, under its canonical
+        tikrs = list(dict.fromkeys(self.metadata.canonical(i) for i in tikrs))
+        document_type = DocumentType(document_type)
+        document_types = [DocumentType('10-Q'), DocumentType('8-K')] \
+            if document_type == 'all' else [document_type]
+        if force_remove_raw:
+            remove_raw = True
+        if virtual:
+            remove_raw = force_remove_raw = False
+
+        # Early quitting conditions
+        targets = [(tikr, dtype) for tikr in tikrs for dtype in document_types
+                   if force or not self.metadata.is_unpacked(tikr, dtype)]
+
+        tasks = []
+        for tikr, dtype in targets:
+            d_dir = os.path.join(self.raw_dir, f'{tikr}', f'{dtype}')
+            submissions = self.metadata._get_tikr(tikr)['submissions']
+            for file in self.get_unpackable_files(tikr, document_type=dtype):
+                if not force and self._is_split(tikr, file.split('.txt')[0]):
+                    continue
+                size = os.path.getsize(storage.find(os.path.join(d_dir, file)))
+                tasks.append((size, tikr, dtype, file,
+                              submissions.get(file.split('.txt')[0], None)))
+
+        kwargs = {'force': force, 'remove_raw': remove_raw,
+                  'include_supplementary': include_supplementary,
+                  'virtual': virtual, 'include_types': include_types,
+                  'exclude_types': exclude_types}
+        self._unpack_pool(tasks, kwargs, workers=workers,
+                          loading_bar=loading_bar, desc=desc)
+
+        for tikr, dtype in targets:
+            self._finish_unpack_bulk(tikr, dtype, remove_raw=remove_raw,
+                                     force_remove_raw=force_remove_raw)
+        self.metadata.enforce_quota()
+
+    def _unpack_pool(self, tasks: list, kwargs: dict, workers: int = None,
+                     loading_bar: bool = False, desc: str = 'Inflating HTM'):
+        """
+        Unpack submissions on a process pool and merge their metadata.
+
+        Parameters
+        ----------
+        tasks: list[tuple]
+            (size, tikr, document type, raw file name, submission metadata
+            or None) for each submission to unpack.
+        kwargs: dict
+            Keyword arguments passed to unpack_file for every submission.
+        """
+        # Largest submissions first, so the slowest work starts earliest
+        tasks = sorted(tasks, key=lambda x: -x[0])
+        before = {tikr: list(self.metadata._get_tikr(tikr)['submissions'])
+                  for _, tikr, _, _, _ in tasks}
+        checkpoint = Checkpointer(self.metadata, self.journal)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(
+                _unpack_submission_worker, self.data_dir, self.metadata.keys,
+                tikr, file, dtype, submission, kwargs)
+                for _, tikr, dtype, file, submission in tasks]
+
+            itera = as_completed(futures)
+            if loading_bar:
+                itera = tqdm(itera, total=len(futures), desc=desc,
+                             leave=False)
+            # Merged and saved as they finish, so an interruption keeps them
+            for future in itera:
+                tikr, subname, submission, attrs = future.result()
+                if submission is not None:
+                    self.metadata._get_tikr(tikr)['submissions'][
+                        subname] = submission
+                self.metadata._get_tikr(tikr)['attrs'].update(attrs)
+                checkpoint.add(tikr, subname)
+        checkpoint.flush()
+
+        self._order_submissions(before)
+
+    def _order_submissions(self, before: dict):
+        """Put submissions merged from workers after the existing, by name."""
+        for tikr in before:
+            submissions = self.metadata._get_tikr(tikr)['submissions']
+            order = [i for i in before[tikr] if i in submissions] + sorted(
+                set(submissions) - set(before[tikr]))
+            self.metadata._get_tikr(tikr)['submissions'] = {
+                i: submissions[i] for i in order}
+
+    def ingest(self, sources, tikrs: list = None, document_type='all',
+               workers: int = None, keep_raw: bool = False,
+               force: bool = False, include_supplementary: bool = False,
+               include_types: list = None, exclude_types: list = None,
+               loading_bar: bool = False, desc: str = 'Ingesting') -> int:
+        """
+        Unpack submission dumps from local archives, with no network access.
+
+        Parameters
+        ---------
+        sources: str or list[str]
+            tar archives (compressed or not), zip archives or directories
+            holding .txt submission dumps, such as EDGAR bulk downloads or
+            an old raw cache.
+        tikrs: list[str], Optional
+            Only ingest these companies. Defaults to every company found.
+        document_type: str or DocumentType
+            The form types to ingest (10-Q, 8-K, or all)
+        workers: int, Optional
+            Number of worker processes. Defaults to the number of CPUs.
+        keep_raw: bool
+            If True, also copy each dump into the raw cache as it is read,
+            so exhibits keep their byte ranges for read_exhibit.
+        force: bool
+            If True, unpack submissions that were already split again.
+        include_supplementary: bool = False
+            If (True), then load all supplementary material as well.
+        include_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to unpack,
+            e.g. ['EX-99.*']. The primary form is always unpacked.
+        exclude_types: list[str], Optional
+            Patterns on the <TYPE> of supplementary documents to skip.
+        loading_bar: bool
+            if True, will show progress
 
+        Returns
+        -------
+        count: int
+            The number of submissions unpacked.
+
+        Notes
+        -----
+        Archives are never extracted. Each dump is streamed straight from
+        its archive member into the unpack path by a worker process, which
+        reads the header to find the filer's CIK and form type. CIKs are
+        named by the saved ticker index and ticker aliases, not by a
+        request; filers that are not in either are stored under their CIK.
+        As in unpack_bulk_many, results are merged and saved as they
+        arrive and journaled as split, so an interrupted ingest resumes
+        without redoing submissions.
+        """
+        if isinstance(sources, str):
+            sources = [sources]
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        document_type = DocumentType(document_type)
+        document_types = ['10-Q', '8-K'] if document_type == 'all' \
+            else [f'{document_type}']
+        workers = workers or os.cpu_count() or 1
+
+        # Name filers offline: stored aliases first, then the ticker index
+        aliases = self.metadata._get_aliases()
+        ciks = dict()
+        for company in self.tickers.companies.values():
+            ciks.setdefault(company['cik'], company['ticker'])
+        ciks.update(aliases['canonical'])
+        wanted = None
+        if tikrs is not None:
+            wanted = set()
+            for tikr in tikrs:
+                cik = self.metadata.get_cik(tikr)
+                if cik is None and tikr in self.tickers:
+                    cik = self.tickers.get_cik(tikr)
+                if cik is None:
+                    warnings.warn(f'No CIK known for {tikr}, not ingested',
+                                  RuntimeWarning)
+                    continue
+                ciks[cik] = aliases['canonical'].get(cik, tikr)
+                wanted.add(cik)
+
+        # Submissions split by an earlier run are not redone
+        known = set()
+        journal_dir = self.journal.journal_dir
+        if not force and os.path.exists(journal_dir):
+            for name in os.listdir(journal_dir):
+                tikr = name.split('.jsonl')[0]
+                known.update((tikr, i) for i in self.journal.get_accessions(
+                    tikr) if self._is_split(tikr, i))
+
+        kwargs = {'force': force,
+                  'include_supplementary': include_supplementary,
+                  'include_types': include_types,
+                  'exclude_types': exclude_types}
+        members = (i for source in sources for i in iter_members(source))
+        if loading_bar:
+            members = tqdm(members, desc=desc, leave=False)
+
+        count = 0
+        before = dict()
+        checkpoint = Checkpointer(self.metadata, self.journal)
+
+        def merge(futures):
+            nonlocal count
+            for future in futures:
+                result = future.result()
+                if result is None:
+                    continue
+                tikr, cik, subname, submission, attrs = result
+                tikr = self.metadata.set_cik(tikr, cik)
+                if tikr not in before:
+                    before[tikr] = list(
+                        self.metadata._get_tikr(tikr)['submissions'])
+                if submission is not None:
+                    self.metadata._get_tikr(tikr)['submissions'][
+                        subname] = submission
+                self.metadata._get_tikr(tikr)['attrs'].update(attrs)
+                checkpoint.add(tikr, subname)
+                count += 1
+
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_ingest_worker,
+                initargs=(ciks, wanted, document_types, known)) as pool:
+            pending = set()
+            for name, member in members:
+                pending.add(pool.submit(
+                    _ingest_worker, self.data_dir, self.metadata.keys, name,
+                    member, keep_raw, kwargs))
+                # A bounded queue keeps streamed members from piling up
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(
+                        pending, return_when=FIRST_COMPLETED)
+                    merge(done)
+            merge(wait(pending)[0])
+        checkpoint.flush()
+
+        self._order_submissions(before)
+        for tikr in before:
+            self.metadata.save_tikr_metadata(tikr)
+        self.metadata.enforce_quota()
+        return count
+
+    def _finish_unpack_bulk(self, tikr, document_type, remove_raw=False,
+                            force_remove_raw=False):
+        """Clean up raw files and mark a company's filings as unpacked."""
         # Delete raw files if desired
         d_dir = os.path.join(self.raw_dir, f'{tikr}', f'{document_type}')
 
         if force_remove_raw:
-            if os.path.exists(d_dir):
-                for file in os.listdir(d_dir):
-                    os.remove(os.path.join(d_dir, file))
+            for file in storage.listdir(d_dir):
+                storage.remove(os.path.join(d_dir, storage.strip_suffix(file)))
 
         if (remove_raw and os.path.exists(d_dir) and
                 len(os.listdir(d_dir)) == 0):
@@ -530,7 +1406,137 @@ class Downloader:
                         return dates[start].split('.txt')[0], start
                     return dates[start].split('.txt')[0]
 
-    def __del__(self):
-        """Set recursion limit."""
-        # back to normal
-        sys.setrecursionlimit(1000)
+
+class _IndexedCIKLookup(CIKLookup):
+    """A secedgar CIK lookup answered from known CIKs, with no request."""
+
+    def __init__(self, ciks: dict, user_agent: str):
+        """Wrap a mapping of lookup value to CIK."""
+        super().__init__(list(ciks), client=None, user_agent=user_agent)
+        self._known = {k: str(v) for k, v in ciks.items()}
+
+    def get_ciks(self):
+        """Return the known CIKs."""
+        return dict(self._known)
+
+
+class _DetachedMetadata(metadata_manager):
+    """
+    Metadata held by an unpacking worker process.
+
+    Notes
+    -----
+    Nothing is loaded from or saved to the metadata directory. The parent
+    process merges the worker's results into its own metadata instead.
+    """
+
+    def __init__(self, data_dir, keys):
+        """Create empty metadata that reuses the parent's API keys."""
+        super().__init__(data_dir=data_dir)
+        self.keys = keys
+
+    def load_keys(self):
+        """Keep the keys handed over by the parent process."""
+
+    def load_tikr_metadata(self, tikr):
+        """Start from empty metadata, never from disk."""
+        self.initialize_tikr_metadata(tikr)
+        return False
+
+    def save_tikr_metadata(self, tikr):
+        """Keep metadata in memory only."""
+        self.initialize_tikr_metadata(tikr)
+
+
+def _unpack_submission_worker(data_dir, keys, tikr, file, document_type,
+                              submission, kwargs):
+    """
+    Unpack one submission in a worker process.
+
+    Returns
+    -------
+    result: tuple
+        (tikr, submission name, submission metadata, company attrs set)
+    """
+    metadata = _DetachedMetadata(data_dir, keys)
+    metadata.initialize_tikr_metadata(tikr)
+    subname = file.split('.txt')[0]
+    if submission is not None:
+        metadata[tikr]['submissions'][subname] = submission
+
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.unpack_file(tikr, file, document_type=document_type, **kwargs)
+    return (tikr, subname, metadata[tikr]['submissions'].get(subname, None),
+            metadata[tikr]['attrs'])
+
+
+# Settings shared by every task of an ingest, set once per worker process
+_ingest_config = dict()
+
+
+def _init_ingest_worker(ciks, wanted, document_types, known):
+    """Hold an ingest's CIK names and filters in a worker process."""
+    _ingest_config.update({'ciks': ciks, 'wanted': wanted,
+                           'document_types': document_types,
+                           'known': known})
+
+
+def _ingest_worker(data_dir, keys, name, member, keep_raw, kwargs):
+    """
+    Unpack one archive member in a worker process.
+
+    Returns
+    -------
+    result: tuple
+        (tikr, cik, submission name, submission metadata, company attrs
+        set), or None if the member is not a wanted, new submission.
+    """
+    config = _ingest_config
+    with open_member(member) as raw, \
+            storage.wrap_read(raw, storage.compression_of(name)) as fp:
+        stream = TeeReader(fp) if keep_raw else fp
+        reader = SubmissionReader(stream)
+        if reader.kind != 'SEC-DOCUMENT':
+            return None
+        attrs = parse_header(reader.header_lines())
+        form_type = attrs.get('CONFORMED SUBMISSION TYPE', '').strip()
+        if form_type not in config['document_types']:
+            return None
+
+        # The first filer listed is the company the filing belongs to
+        cik = next((i.split(':', 1)[1].strip()
+                    for i in reader.header_lines()
+                    if i.strip().startswith('CENTRAL INDEX KEY:')), '')
+        if not cik.isdigit():
+            return None
+        cik = int(cik)
+        if config['wanted'] is not None and cik not in config['wanted']:
+            return None
+        tikr = config['ciks'].get(cik, f'{cik}')
+        subname = attrs.get('ACCESSION NUMBER', '').strip() or \
+            name.split('.txt')[0]
+        if (tikr, subname) in config['known']:
+            return None
+
+        metadata = _DetachedMetadata(data_dir, keys)
+        metadata.initialize_tikr_metadata(tikr)
+        loader = Downloader(data_dir=data_dir, metadata=metadata)
+        if not keep_raw:
+            loader._unpack_reader(tikr, subname, reader,
+                                  DocumentType(form_type), **kwargs)
+        else:
+            d_dir = os.path.join(loader.raw_dir, tikr, form_type)
+            os.makedirs(d_dir, exist_ok=True)
+            path = os.path.join(d_dir, f'{subname}.txt')
+            # Copied as it is read, and only kept once complete
+            with storage.open_write(
+                    path, *metadata.get_compression()) as out:
+                stream.attach(out)
+                loader._unpack_reader(
+                    tikr, subname, reader, DocumentType(form_type),
+                    os.path.relpath(path, data_dir), **kwargs)
+                stream.drain()
+            metadata.touch(path)
+    return (tikr, cik, subname,
+            metadata[tikr]['submissions'].get(subname, None),
+            metadata[tikr]['attrs'])
@@ -1,6 +1,7 @@
 #!/usr/bin/env python # [1]
 """Manipulate and clean html strings."""
 import re
+from html import unescape
 from typing import List
 
 
@@ -67,3 +68,50 @@ def split_pages(htmltext: str) -> List[str]:
 def remove_tables(htlmtext: str) -> str:
     """Delete all <table></table> entries in html."""
     return re.sub('<table(.|\n)*?</table>', '', string=htlmtext, flags=re.I)
+
+
+_IX_HIDDEN = re.compile(r'<ix:hidden\b[^>]*>(.*?)</ix:hidden\s*>',
+                        flags=re.I | re.S)
+_IX_FACT = re.compile(
+    r'<ix:(nonnumeric|nonfraction)\b([^>]*)>(.*?)</ix:\1\s*>',
+    flags=re.I | re.S)
+_IX_DEI_FACT = re.compile(
+    r'<ix:(nonnumeric|nonfraction)\b([^>]*\bname\s*=\s*["\']dei:[^>]*)>'
+    r'(.*?)</ix:\1\s*>', flags=re.I | re.S)
+_IX_ATTR = re.compile(r'\b(name|sign)\s*=\s*["\']([^"\']*)["\']', flags=re.I)
+
+
+def get_cover_facts(htmltext: str) -> dict:
+    """
+    Return the ix:hidden facts and dei:* cover facts of an inline XBRL file.
+
+    Returns
+    -------
+    facts: dict
+        Maps each fact name, e.g. 'dei:DocumentPeriodEndDate', to its text
+        value, or to a list of values if it is reported more than once
+        with different values (e.g. shares outstanding per class).
+
+    Notes
+    -----
+    Only the facts are matched, by regular expression, so the rest of the
+    document is never parsed. Returns an empty dict for unannotated files.
+    """
+    matches = []
+    for block in _IX_HIDDEN.finditer(htmltext):
+        matches += _IX_FACT.findall(block.group(1))
+    matches += _IX_DEI_FACT.findall(htmltext)
+
+    facts = dict()
+    for _, attrs, value in matches:
+        attrs = {k.lower(): v for k, v in _IX_ATTR.findall(attrs)}
+        if 'name' not in attrs:
+            continue
+        value = compress_spaces(unescape(remove_tags(value)).replace(
+            '\xa0', ' ')).strip()
+        if attrs.get('sign', None) == '-':
+            value = '-' + value
+        values = facts.setdefault(attrs['name'], [])
+        if value not in values:
+            values.append(value)
+    return {k: v[0] if len(v) == 1 else v for k, v in facts.items()}
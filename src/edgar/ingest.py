@@ -0,0 +1,215 @@
+"""Stream submission dumps out of local archives, with no network access.
+
+Run as ``python -m edgar.ingest ARCHIVE [ARCHIVE ...]`` to unpack every
+10-Q and 8-K dump in tar or zip archives, or directory trees, into a
+data directory. Members are read in place; nothing is extracted to disk
+but the unpacked documents.
+"""
+import io
+import os
+import shutil
+import tarfile
+import zipfile
+import argparse
+from typing import BinaryIO, Iterator, Tuple
+
+from .storage import strip_suffix
+
+
+# Archive members with this suffix are read as submission dumps, as are
+# gzip or zstd compressed ones, e.g. '.txt.gz'
+SUBMISSION_SUFFIX = '.txt'
+
+
+def _is_submission(name: str) -> bool:
+    return strip_suffix(name).endswith(SUBMISSION_SUFFIX)
+
+
+class _Slice:
+    """A readable window of `size` bytes into a file, from its position."""
+
+    def __init__(self, fp: BinaryIO, size: int):
+        self.fp = fp
+        self.remaining = size
+
+    def readline(self, limit: int = -1) -> bytes:
+        if limit < 0 or limit > self.remaining:
+            limit = self.remaining
+        line = self.fp.readline(limit) if limit else b''
+        self.remaining -= len(line)
+        return line
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fp.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TeeReader:
+    """
+    Copy every byte read from a stream into a file attached later.
+
+    Notes
+    -----
+    Bytes read before `attach` are held in memory, so a dump's header can
+    be read to decide where it belongs before anything is written.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        """Wrap a binary stream."""
+        self.fp = fp
+        self.out = None
+        self._held = []
+
+    def readline(self, limit: int = -1) -> bytes:
+        """Read a line, as the wrapped stream does, and copy it."""
+        line = self.fp.readline(limit)
+        if self.out is None:
+            self._held.append(line)
+        else:
+            self.out.write(line)
+        return line
+
+    def attach(self, out: BinaryIO):
+        """Write what was read so far to `out`, and all reads after."""
+        self.out = out
+        out.write(b''.join(self._held))
+        self._held = []
+
+    def drain(self):
+        """Copy the rest of the stream, unread, to the attached file."""
+        shutil.copyfileobj(self.fp, self.out)
+
+
+def iter_members(source: str) -> Iterator[Tuple[str, tuple]]:
+    """
+    List the submission dumps in an archive or directory tree.
+
+    Parameters
+    ----------
+    source: str
+        A tar archive (compressed or not), a zip archive, or a directory.
+
+    Yields
+    ------
+    name: str
+        The member's name, e.g. '0000320193-20-000052.txt'. A '.gz' or
+        '.zst' suffix marks a compressed dump; see storage.wrap_read.
+    member: tuple
+        Where to read the member from; see open_member.
+
+    Notes
+    -----
+    Members of directories, zip and uncompressed tar archives are yielded
+    as locations that any process can open and read directly. Compressed
+    tar archives can only be read in order, so each of their members is
+    read from the stream here and yielded as bytes.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if _is_submission(name):
+                    yield name, ('file', os.path.join(root, name))
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_submission(info.filename):
+                    yield os.path.basename(info.filename), \
+                        ('zip', source, info.filename)
+    elif tarfile.is_tarfile(source):
+        try:
+            archive = tarfile.open(source, 'r:')
+        except tarfile.ReadError:
+            archive = None
+        if archive is not None:
+            # Uncompressed, so members are byte ranges of the archive
+            with archive:
+                for info in archive:
+                    if info.isfile() and _is_submission(info.name):
+                        yield os.path.basename(info.name), \
+                            ('tar', source, info.offset_data, info.size)
+            return
+        with tarfile.open(source, 'r|*') as archive:
+            for info in archive:
+                if info.isfile() and _is_submission(info.name):
+                    yield os.path.basename(info.name), \
+                        ('bytes', archive.extractfile(info).read())
+    else:
+        raise ValueError(f'{source} is not a directory, tar or zip archive')
+
+
+# Zip archives opened by this process, so the central directory of a
+# large archive is read once rather than once per member
+_open_zips = dict()
+
+
+def open_member(member: tuple) -> BinaryIO:
+    """
+    Open an archive member yielded by iter_members for reading.
+
+    Returns
+    -------
+    fp: BinaryIO
+        A binary stream supporting readline(limit) and read(size).
+    """
+    kind = member[0]
+    if kind == 'file':
+        return open(member[1], 'rb')
+    if kind == 'zip':
+        if member[1] not in _open_zips:
+            _open_zips[member[1]] = zipfile.ZipFile(member[1])
+        return _open_zips[member[1]].open(member[2])
+    if kind == 'tar':
+        f = open(member[1], 'rb')
+        f.seek(member[2])
+        return _Slice(f, member[3])
+    if kind == 'bytes':
+        return io.BytesIO(member[1])
+    raise ValueError(f'Unknown archive member kind {kind}')
+
+
+def main(argv=None):
+    """Ingest archives from the command line."""
+    from .downloader import Downloader
+
+    parser = argparse.ArgumentParser(
+        prog='python -m edgar.ingest',
+        description='Unpack submission dumps from local archives.')
+    parser.add_argument('sources', nargs='+',
+                        help='tar or zip archives, or directories')
+    parser.add_argument('--data-dir', default='edgar_data')
+    parser.add_argument('--tikrs', nargs='+', default=None,
+                        help='only ingest these companies')
+    parser.add_argument('--document-type', default='all',
+                        help='10-Q, 8-K or all')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--keep-raw', action='store_true',
+                        help='also copy each dump into the raw cache')
+    parser.add_argument('--include-supplementary', action='store_true')
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args(argv)
+
+    loader = Downloader(data_dir=args.data_dir)
+    count = loader.ingest(
+        args.sources, tikrs=args.tikrs, document_type=args.document_type,
+        workers=args.workers, keep_raw=args.keep_raw,
+        include_supplementary=args.include_supplementary, force=args.force,
+        loading_bar=True)
+    print(f'Ingested {count} submissions')
+    return count
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Crash-safe record of how far each filing has been processed."""
+import os
+import json
+import time
+import threading
+from typing import List
+
+
+class Journal:
+    """
+    Append-only journal of the processing state of each accession.
+
+    Notes
+    -----
+    Each company has a file of JSON lines under the journal directory.
+    An accession moves through the states 'queued' (listed, not yet
+    downloaded), 'fetched' (raw dump or documents on disk), 'split'
+    (unpacked, with its metadata saved) and 'featurized'. Lines are
+    flushed as they are written, so a process that dies keeps every state
+    it recorded; a line torn by the crash is ignored when read back.
+    Completed listings are journaled too, so a restarted download does
+    not list a company again.
+    """
+
+    STATES = ('queued', 'fetched', 'split', 'featurized')
+
+    def __init__(self, journal_dir: str):
+        """
+        Open a journal.
+
+        Parameters
+        ----------
+        journal_dir: str
+            The directory holding one journal file per company
+        """
+        self.journal_dir = journal_dir
+        self.lock = threading.Lock()
+        self._entries = dict()
+        self._listings = dict()
+
+    def _path(self, tikr: str) -> str:
+        return os.path.join(self.journal_dir, f'{tikr}.jsonl')
+
+    def _load(self, tikr: str) -> dict:
+        """Read a company's journal into memory, once."""
+        if tikr in self._entries:
+            return self._entries[tikr]
+        entries, listings = dict(), dict()
+        if os.path.exists(self._path(tikr)):
+            with open(self._path(tikr), 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'listed' in record:
+                        listings[record['listed']] = record['query']
+                        continue
+                    entry = entries.setdefault(record['accession'], dict())
+                    if 'filing' in record:
+                        entry['filing'] = record['filing']
+                    if self._rank(record['state']) >= \
+                            self._rank(entry.get('state', None)):
+                        entry['state'] = record['state']
+        self._entries[tikr] = entries
+        self._listings[tikr] = listings
+        return entries
+
+    def _rank(self, state: str) -> int:
+        return -1 if state is None else self.STATES.index(state)
+
+    def _append(self, tikr: str, records: list):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        data = ''.join(json.dumps(i) + '\n' for i in records)
+        with open(self._path(tikr), 'ab+') as f:
+            # Start afresh after a line torn by a crash
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    data = '\n' + data
+            f.write(data.encode('utf-8'))
+            f.flush()
+
+    def record(self, tikr: str, accessions, state: str,
+               filings: List[dict] = None):
+        """
+        Record that accessions reached a state.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier
+        accessions: str or list[str]
+            The accessions to record, written in a single append.
+        state: str
+            One of Journal.STATES
+        filings: list[dict], Optional
+            With state 'queued', the listing entry of each accession, kept
+            so the download can resume without listing again.
+        """
+        assert state in self.STATES, f'Unknown journal state {state}'
+        if isinstance(accessions, str):
+            accessions = [accessions]
+        records = []
+        with self.lock:
+            entries = self._load(tikr)
+            for n, accession in enumerate(accessions):
+                entry = entries.setdefault(accession, dict())
+                record = {'accession': accession, 'state': state,
+                          'time': time.time()}
+                if filings is not None:
+                    entry['filing'] = record['filing'] = filings[n]
+                if self._rank(state) >= self._rank(entry.get('state', None)):
+                    entry['state'] = state
+                records.append(record)
+            if records:
+                self._append(tikr, records)
+
+    def state(self, tikr: str, accession: str) -> str:
+        """Return the furthest state of an accession, or None."""
+        with self.lock:
+            return self._load(tikr).get(accession, dict()).get('state', None)
+
+    def has_reached(self, tikr: str, accession: str, state: str) -> bool:
+        """Return True if an accession got at least as far as state."""
+        return self._rank(self.state(tikr, accession)) >= self._rank(state)
+
+    def get_filing(self, tikr: str, accession: str) -> dict:
+        """Return the journaled listing entry of an accession, or None."""
+        with self.lock:
+            return self._load(tikr).get(accession, dict()).get('filing', None)
+
+    def get_accessions(self, tikr: str, state: str = None) -> List[str]:
+        """Return the accessions of a company, or those left at a state."""
+        with self.lock:
+            entries = self._load(tikr)
+            return [i for i in entries
+                    if state is None or entries[i].get('state') == state]
+
+    def set_listed(self, tikr: str, document_type, query: dict,
+                   filings: List[dict]):
+        """
+        Record a completed listing of one form type and its filings.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier
+        document_type: str or DocumentType
+            The form type that was listed
+        query: dict
+            The listing arguments, such as start_date
+        filings: list[dict]
+            The filings listed, queued unless already journaled
+        """
+        new = [i for i in filings
+               if self.state(tikr, i['accession']) is None]
+        self.record(tikr, [i['accession'] for i in new], 'queued',
+                    filings=new)
+        with self.lock:
+            self._load(tikr)
+            self._listings[tikr][f'{document_type}'] = query
+            self._append(tikr, [{'listed': f'{document_type}',
+                                 'query': query}])
+
+    def get_listing(self, tikr: str, document_type,
+                    query: dict) -> List[dict]:
+        """
+        Return the journaled filings of a completed listing, or None.
+
+        Notes
+        -----
+        None is returned unless the form type was listed with the same
+        arguments, so a listing is only reused by the run it belongs to.
+        """
+        with self.lock:
+            entries = self._load(tikr)
+            if self._listings[tikr].get(f'{document_type}', None) != query:
+                return None
+            return [i['filing'] for i in entries.values()
+                    if 'filing' in i and
+                    i['filing']['type'] == f'{document_type}']
+
+    def clear(self, tikr: str):
+        """Forget every record of a company."""
+        with self.lock:
+            self._entries.pop(tikr, None)
+            self._listings.pop(tikr, None)
+            if os.path.exists(self._path(tikr)):
+                os.remove(self._path(tikr))
+
+
+class Checkpointer:
+    """
+    Save company metadata, then journal what it now holds, at intervals.
+
+    Notes
+    -----
+    An accession is journaled as 'split' only after the metadata holding
+    it is on disk, so the journal never runs ahead of the metadata.
+    Saving at most once per interval keeps large companies from being
+    pickled after every submission.
+    """
+
+    def __init__(self, metadata, journal: Journal, state: str = 'split',
+                 interval: float = 1.0):
+        """
+        Create a checkpointer.
+
+        Parameters
+        ----------
+        metadata: Metadata
+            The metadata to save
+        journal: Journal
+            The journal to record saved accessions in
+        state: str
+            The state recorded once saved
+        interval: float
+            Minimum seconds between saves
+        """
+        self.metadata = metadata
+        self.journal = journal
+        self.state = state
+        self.interval = interval
+        self._pending = dict()
+        self._last = time.monotonic()
+
+    def add(self, tikr: str, accession: str):
+        """Note a finished accession, saving if the interval has passed."""
+        self._pending.setdefault(tikr, []).append(accession)
+        if time.monotonic() - self._last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Save every company with finished accessions and journal them."""
+        for tikr, accessions in self._pending.items():
+            self.metadata.save_tikr_metadata(tikr)
+            self.journal.record(tikr, accessions, self.state)
+        self._pending = dict()
+        self._last = time.monotonic()
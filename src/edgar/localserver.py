@@ -0,0 +1,585 @@
+"""Local stand-in for the SEC-EDGAR HTTP server, for offline testing."""
+import os
+import re
+import io
+import gzip
+import html
+import json
+import time
+import random
+import hashlib
+import datetime
+import threading
+import urllib.parse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .submission import SubmissionReader, scan_stream, parse_header
+from . import storage
+
+
+class LocalEDGARServer:
+    """
+    Serve registered submission dumps over HTTP the way EDGAR does.
+
+    Notes
+    -----
+    Implements the subset of endpoints used by EDGARClient: the
+    browse-edgar company listing (xml output), the ticker list, the
+    submissions JSON API with its pagination files, and under
+    /Archives/edgar/data the full submission .txt dumps, each filing's
+    -index-headers.html and its individual documents. Every request is
+    recorded in ``request_log`` as (monotonic time, path) for later
+    inspection.
+
+    Successful responses carry an ETag and Last-Modified header, are
+    answered with 304 Not Modified when revalidated, and are gzip-encoded
+    when the client accepts it. ``bytes_sent`` counts body bytes sent.
+
+    Latency, per-connection bandwidth limits, 429 throttling, 500
+    failures and dropped connections can be injected to reproduce a slow
+    or unreliable server. ``num_throttled``, ``num_failed`` and
+    ``num_dropped`` count the injected errors.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 recent_limit: int = 1000, latency: float = 0.0,
+                 jitter: float = 0.0, bandwidth: float = None,
+                 throttle_rate: float = 0.0, error_rate: float = 0.0,
+                 retry_after: int = 1, seed: int = None,
+                 drop_rate: float = 0.0):
+        """
+        Create the server. It does not listen until started.
+
+        Parameters
+        ----------
+        host: str
+            Interface to bind.
+        port: int
+            Port to bind. 0 picks any free port.
+        recent_limit: int
+            Filings per submissions JSON page. Older filings are moved to
+            pagination files, as EDGAR does past 1000 filings.
+        latency: float
+            Seconds to wait before answering each request.
+        jitter: float
+            Up to this many further seconds are added to each wait, at
+            random.
+        bandwidth: float, Optional
+            Bytes per second sent on each connection. Unlimited if None.
+        throttle_rate: float
+            Fraction of requests answered with 429 Too Many Requests.
+        error_rate: float
+            Fraction of requests answered with 500 Internal Server Error.
+        retry_after: int
+            Seconds sent in the Retry-After header of 429 responses.
+        seed: int, Optional
+            Seed for the random draws, for repeatable runs.
+        drop_rate: float
+            Fraction of requests whose connection is closed without any
+            response, as by a reset.
+        """
+        self.host = host
+        self.port = port
+        self.recent_limit = recent_limit
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.num_throttled = 0
+        self.num_failed = 0
+        self.num_dropped = 0
+        self._random = random.Random(seed)
+        self._gzipped = dict()
+        self.companies = dict()
+        self.documents = dict()
+        self.request_log = []
+        self.bytes_sent = 0
+        self.last_modified = formatdate(usegmt=True)
+        self.lock = threading.Lock()
+
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Url to hand to EDGARClient as its base_url."""
+        return f'http://{self.host}:{self.port}'
+
+    def add_company(self, tikr: str, cik: int = None, name: str = None,
+                    exchange: str = None):
+        """Register a company, returning its CIK."""
+        tikr = tikr.lower()
+        if tikr not in self.companies:
+            if cik is None:
+                cik = 1000000 + len(self.companies)
+            self.companies[tikr] = {'cik': int(cik),
+                                    'name': name or tikr.upper(),
+                                    'exchange': exchange,
+                                    'filings': []}
+        return self.companies[tikr]['cik']
+
+    def add_filing(self, tikr: str, form_type: str, accession: str,
+                   content, date: str = '2020-01-01', cik: int = None,
+                   primary_document: str = ''):
+        """
+        Register a submission dump under a company.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier the filing is listed under
+        form_type: str
+            The filing form type, e.g. '10-Q'
+        accession: str
+            The accession number, e.g. '0000320193-20-000052'
+        content: str or bytes
+            The full submission .txt dump
+        date: str
+            The filing date, as YYYY-MM-DD
+        primary_document: str
+            The primary document name listed by the submissions JSON API
+        """
+        cik = self.add_company(tikr, cik=cik)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        folder = f'/Archives/edgar/data/{cik}/{accession.replace("-", "")}'
+        self.documents[f'{folder}/{accession}.txt'] = content
+        self.documents[f'{folder}/{accession}-index-headers.html'] = \
+            self._index_headers(content)
+        with io.BytesIO(content) as f:
+            for doc in SubmissionReader(f):
+                self.documents[f'{folder}/{doc.filename}'] = b''.join(
+                    doc.iter_body())
+        self.companies[tikr.lower()]['filings'].append({
+            'accession': accession, 'type': form_type, 'date': date,
+            'folder': folder, 'primary_document': primary_document,
+            'published': time.time()})
+        # EDGAR lists newest filings first
+        self.companies[tikr.lower()]['filings'].sort(
+            key=lambda x: x['date'], reverse=True)
+
+    @staticmethod
+    def _index_headers(content: bytes) -> bytes:
+        """Render a dump's headers, without bodies, as EDGAR's html page."""
+        text = content.decode('utf-8', errors='replace')
+        text = re.sub(r'(<TEXT>\r?\n).*?(</TEXT>)', r'\1\2', text,
+                      flags=re.S)
+        text = re.sub(r'(?m)^(&lt;FILENAME&gt;)(.*?)(\r?)$',
+                      r'\1<a href="\2">\2</a>\3',
+                      html.escape(text, quote=False))
+        return ('<html><body><pre>\n' + text +
+                '</pre></body></html>').encode('utf-8')
+
+    def _current_feed(self, query: dict) -> bytes:
+        """Render the latest filings as the getcurrent atom feed."""
+        filings = [(i, tikr, company) for tikr, company in
+                   self.companies.items() for i in company['filings']]
+        form_type = query.get('type', '')
+        filings = [i for i in filings if i[0]['type'].startswith(form_type)]
+        filings.sort(key=lambda x: x[0]['published'], reverse=True)
+        filings = filings[:int(query.get('count', 40))]
+
+        out = ['<?xml version="1.0" encoding="ISO-8859-1" ?>',
+               '<feed xmlns="http://www.w3.org/2005/Atom">',
+               '<title>Latest Filings</title>']
+        for i, tikr, company in filings:
+            updated = datetime.datetime.fromtimestamp(
+                i['published'], datetime.timezone.utc).isoformat()
+            out.append(
+                f'<entry><title>{i["type"]} - {company["name"]} '
+                f'({company["cik"]:010d}) (Filer)</title>'
+                f'<link rel="alternate" type="text/html" '
+                f'href="{self.base_url}{i["folder"]}/'
+                f'{i["accession"]}-index.htm"/>'
+                f'<updated>{updated}</updated>'
+                f'<category scheme="https://www.sec.gov/" label="form type" '
+                f'term="{i["type"]}"/>'
+                f'<id>urn:tag:sec.gov,2008:accession-number='
+                f'{i["accession"]}</id></entry>')
+        out.append('</feed>')
+        return '\n'.join(out).encode('utf-8')
+
+    def add_directory(self, raw_dir: str):
+        """
+        Serve recorded submission dumps.
+
+        Parameters
+        ----------
+        raw_dir: str
+            A directory laid out as <tikr>/<form type>/<accession>.txt,
+            such as the .rawcache of a data directory.
+
+        Returns
+        -------
+        count: int
+            The number of dumps registered.
+        """
+        count = 0
+        for tikr in sorted(os.listdir(raw_dir)):
+            if not os.path.isdir(os.path.join(raw_dir, tikr)):
+                continue
+            for form_type in sorted(os.listdir(os.path.join(raw_dir, tikr))):
+                folder = os.path.join(raw_dir, tikr, form_type)
+                for file in sorted(os.listdir(folder)):
+                    # Compressed dumps are served decompressed
+                    name = storage.strip_suffix(file)
+                    if not name.endswith('.txt'):
+                        continue
+                    body = storage.read_bytes(os.path.join(folder, file))
+                    _, header, _ = scan_stream(io.BytesIO(body),
+                                               documents=False)
+                    date = parse_header(header).get(
+                        'FILED AS OF DATE', '20000101').strip()
+                    self.add_filing(
+                        tikr, form_type, name[:-len('.txt')], body,
+                        date=f'{date[:4]}-{date[4:6]}-{date[6:8]}')
+                    count += 1
+        return count
+
+    def add_synthetic(self, tikrs, form_types=('10-Q',),
+                      filings_per_type: int = 4, size: int = 100000,
+                      start_date: str = '2020-01-01'):
+        """
+        Serve generated filings for a set of companies.
+
+        Parameters
+        ----------
+        tikrs: list[str] or int
+            The companies to generate, or a number of companies.
+        form_types: list[str]
+            The form types each company files.
+        filings_per_type: int
+            The number of filings of each form type per company.
+        size: int
+            The approximate size, in bytes, of each submission dump.
+        start_date: str
+            The date of the oldest filing, as YYYY-MM-DD. Each later
+            filing is filed one day after the previous one.
+
+        Returns
+        -------
+        tikrs: list[str]
+            The companies registered.
+        """
+        if isinstance(tikrs, int):
+            tikrs = [f'syn{i}' for i in range(tikrs)]
+        start = datetime.date.fromisoformat(start_date)
+        for tikr in tikrs:
+            cik = self.add_company(tikr)
+            n = 0
+            for form_type in form_types:
+                for _ in range(filings_per_type):
+                    accession = f'{cik:010d}-{start.year % 100:02d}-{n:06d}'
+                    date = (start + datetime.timedelta(days=n)).isoformat()
+                    self.add_filing(tikr, form_type, accession,
+                                    synthetic_submission(
+                                        accession, form_type, date=date,
+                                        size=size, cik=cik,
+                                        name=tikr.upper()),
+                                    date=date)
+                    n += 1
+        return list(tikrs)
+
+    def _browse_edgar(self, query: dict) -> bytes:
+        company = self.companies.get(query.get('CIK', '').lower(), None)
+        filings = company['filings'] if company is not None else []
+        form_type = query.get('type', '')
+        filings = [i for i in filings if i['type'].startswith(form_type)]
+        datea = query.get('datea', None)
+        dateb = query.get('dateb', None)
+        if datea:
+            filings = [i for i in filings
+                       if i['date'].replace('-', '') >= datea]
+        if dateb:
+            filings = [i for i in filings
+                       if i['date'].replace('-', '') <= dateb]
+        start = int(query.get('start', 0))
+        count = int(query.get('count', 40))
+        filings = filings[start:start + count]
+
+        out = ['<?xml version="1.0" encoding="UTF-8"?>', '<companyFilings>']
+        if company is not None:
+            out.append(f'<companyInfo><CIK>{company["cik"]:010d}</CIK>'
+                       f'<name>{company["name"]}</name></companyInfo>')
+        out.append('<results>')
+        for i in filings:
+            out.append(
+                f'<filing><dateFiled>{i["date"]}</dateFiled>'
+                f'<filingHREF>{self.base_url}{i["folder"]}/'
+                f'{i["accession"]}-index.htm</filingHREF>'
+                f'<type>{i["type"]}</type></filing>')
+        out.append('</results></companyFilings>')
+        return '\n'.join(out).encode('utf-8')
+
+    def _company_tickers(self) -> bytes:
+        out = {str(n): {'cik_str': i['cik'], 'ticker': tikr.upper(),
+                        'title': i['name']}
+               for n, (tikr, i) in enumerate(self.companies.items())}
+        return json.dumps(out).encode('utf-8')
+
+    def _company_tickers_exchange(self) -> bytes:
+        out = {'fields': ['cik', 'name', 'ticker', 'exchange'],
+               'data': [[i['cik'], i['name'], tikr.upper(), i['exchange']]
+                        for tikr, i in self.companies.items()]}
+        return json.dumps(out).encode('utf-8')
+
+    def _submissions_page(self, filings: list) -> dict:
+        return {
+            'accessionNumber': [i['accession'] for i in filings],
+            'filingDate': [i['date'] for i in filings],
+            'form': [i['type'] for i in filings],
+            'primaryDocument': [i.get('primary_document', '')
+                                for i in filings]}
+
+    def _submissions(self, name: str) -> bytes:
+        """Serve CIK##########.json or CIK##########-submissions-###.json."""
+        cik = int(name[len('CIK'):len('CIK') + 10])
+        tikr = next((k for k, v in self.companies.items()
+                     if v['cik'] == cik), None)
+        if tikr is None:
+            return None
+        company = self.companies[tikr]
+        filings = company['filings']
+        pages = [filings[i:i + self.recent_limit]
+                 for i in range(0, max(len(filings), 1), self.recent_limit)]
+
+        if '-submissions-' in name:
+            n = int(name.split('-submissions-')[1].split('.')[0])
+            if not 0 < n < len(pages):
+                return None
+            return json.dumps(self._submissions_page(pages[n])).encode(
+                'utf-8')
+
+        files = [{'name': f'CIK{cik:010d}-submissions-{n:03d}.json',
+                  'filingCount': len(page),
+                  'filingFrom': page[-1]['date'],
+                  'filingTo': page[0]['date']}
+                 for n, page in enumerate(pages) if n > 0]
+        out = {'cik': str(cik), 'name': company['name'],
+               'tickers': [tikr.upper()],
+               'filings': {'recent': self._submissions_page(pages[0]),
+                           'files': files}}
+        return json.dumps(out).encode('utf-8')
+
+    def handle(self, path: str, query: dict):
+        """
+        Resolve a request to (status, headers, body).
+
+        Notes
+        -----
+        Override or extend to serve further endpoints.
+        """
+        if path == '/cgi-bin/browse-edgar' and \
+                query.get('action', '') == 'getcurrent':
+            return 200, {'Content-Type': 'application/atom+xml'}, \
+                self._current_feed(query)
+        if path == '/cgi-bin/browse-edgar':
+            return 200, {'Content-Type': 'application/xml'}, \
+                self._browse_edgar(query)
+        if path == '/files/company_tickers.json':
+            return 200, {'Content-Type': 'application/json'}, \
+                self._company_tickers()
+        if path == '/files/company_tickers_exchange.json':
+            return 200, {'Content-Type': 'application/json'}, \
+                self._company_tickers_exchange()
+        if path.startswith('/submissions/CIK'):
+            body = self._submissions(path[len('/submissions/'):])
+            if body is not None:
+                return 200, {'Content-Type': 'application/json'}, body
+        if path in self.documents:
+            return 200, {'Content-Type': 'text/plain'}, self.documents[path]
+        return 404, {'Content-Type': 'text/plain'}, b'Not Found'
+
+    def _revalidate(self, request_headers, headers: dict, body: bytes):
+        """Apply conditional request and content encoding headers."""
+        headers.setdefault(
+            'ETag', '"' + hashlib.sha1(body).hexdigest()[:16] + '"')
+        headers.setdefault('Last-Modified', self.last_modified)
+        etag = request_headers.get('If-None-Match', None)
+        since = request_headers.get('If-Modified-Since', None)
+        if (etag is not None and etag == headers['ETag']) or (
+                etag is None and since == headers['Last-Modified']):
+            return 304, {'ETag': headers['ETag']}, b''
+        if 'gzip' in request_headers.get('Accept-Encoding', ''):
+            if headers['ETag'] not in self._gzipped:
+                self._gzipped[headers['ETag']] = gzip.compress(body)
+            body = self._gzipped[headers['ETag']]
+            headers['Content-Encoding'] = 'gzip'
+        return 200, headers, body
+
+    def _fault(self):
+        """Draw the injected delay and error, if any, for one request."""
+        with self.lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            draw = self._random.random()
+            if draw < self.throttle_rate:
+                self.num_throttled += 1
+                return delay, 429
+            if draw < self.throttle_rate + self.error_rate:
+                self.num_failed += 1
+                return delay, 500
+            if draw < self.throttle_rate + self.error_rate + self.drop_rate:
+                self.num_dropped += 1
+                return delay, 'drop'
+        return delay, None
+
+    def _write(self, wfile, body: bytes, chunk_size: int = 1 << 14):
+        """Send a body, throttled to the configured bandwidth."""
+        if self.bandwidth is None:
+            wfile.write(body)
+            return
+        for i in range(0, len(body), chunk_size):
+            chunk = body[i:i + chunk_size]
+            wfile.write(chunk)
+            time.sleep(len(chunk) / self.bandwidth)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                query = dict(urllib.parse.parse_qsl(parsed.query))
+                with server.lock:
+                    server.request_log.append((time.monotonic(), parsed.path))
+                delay, fault = server._fault()
+                if delay > 0:
+                    time.sleep(delay)
+
+                if fault == 'drop':
+                    self.close_connection = True
+                    return
+                if fault == 429:
+                    status, headers, body = 429, {
+                        'Retry-After': str(server.retry_after)}, \
+                        b'Too Many Requests'
+                elif fault == 500:
+                    status, headers, body = 500, dict(), \
+                        b'Internal Server Error'
+                else:
+                    status, headers, body = server.handle(parsed.path, query)
+                    headers = dict(headers)
+                    if status == 200:
+                        status, headers, body = server._revalidate(
+                            self.headers, headers, body)
+                with server.lock:
+                    server.bytes_sent += len(body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    server._write(self.wfile, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away mid-response, e.g. was killed
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._httpd = ThreadingHTTPServer(
+            (self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        """Start the server when used as a context manager."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop the server when leaving the context."""
+        self.stop()
+
+
+def synthetic_submission(accession: str, form_type: str = '10-Q',
+                         date: str = '2020-01-01', size: int = 100000,
+                         cik: int = 1000000, name: str = 'SYNTHETIC INC'):
+    """
+    Generate a submission dump shaped like an EDGAR filing.
+
+    Parameters
+    ----------
+    accession: str
+        The accession number, e.g. '0001000000-20-000001'
+    form_type: str
+        The form type of the primary document
+    date: str
+        The filing date, as YYYY-MM-DD
+    size: int
+        The approximate size, in bytes, of the dump. The primary
+        document is padded with paragraphs of text to reach it.
+    cik: int
+        The filer's CIK
+    name: str
+        The filer's name
+
+    Returns
+    -------
+    dump: bytes
+        A header, an annotated primary html document and an EX-99.1
+        exhibit.
+    """
+    day = date.replace('-', '')
+    header = (
+        f'<SEC-DOCUMENT>{accession}.txt : {day}\n'
+        f'<SEC-HEADER>{accession}.hdr.sgml : {day}\n'
+        f'ACCESSION NUMBER:\t\t{accession}\n'
+        f'CONFORMED SUBMISSION TYPE:\t{form_type}\n'
+        f'PUBLIC DOCUMENT COUNT:\t\t2\n'
+        f'FILED AS OF DATE:\t\t{day}\n'
+        f'FILER:\n\tCOMPANY DATA:\n'
+        f'\t\tCOMPANY CONFORMED NAME:\t\t\t{name}\n'
+        f'\t\tCENTRAL INDEX KEY:\t\t\t{cik:010d}\n'
+        f'\tFILING VALUES:\n\t\tFORM TYPE:\t\t{form_type}\n'
+        '</SEC-HEADER>\n')
+    cover = (
+        '<html><body><div style="display:none"><ix:header><ix:hidden>'
+        '<ix:nonNumeric name="dei:DocumentPeriodEndDate" contextRef="c1">'
+        f'{date}</ix:nonNumeric><ix:nonNumeric '
+        'name="dei:EntityCentralIndexKey" contextRef="c1">'
+        f'{cik:010d}</ix:nonNumeric></ix:hidden></ix:header></div>\n'
+        '<p><span>Revenue <ix:nonFraction name="us-gaap:Revenues" '
+        'contextRef="c1" unitRef="usd" decimals="-6" scale="6">100'
+        '</ix:nonFraction></span></p>\n')
+    paragraph = ('<p><span>Lorem ipsum dolor sit amet, consectetur '
+                 'adipiscing elit, sed do eiusmod tempor.</span></p>\n')
+    # Shuffled words, so the text compresses about as well as a filing
+    words = paragraph[9:-13].split()
+    rand = random.Random(accession)
+    padding, length = [], size - len(header) - len(cover) - 600
+    while length > 0:
+        line = '<p><span>' + ' '.join(
+            rand.choice(words) for _ in range(40)) + '</span></p>\n'
+        padding.append(line)
+        length -= len(line)
+    padding = ''.join(padding)
+    documents = (
+        f'<DOCUMENT>\n<TYPE>{form_type}\n<SEQUENCE>1\n'
+        f'<FILENAME>{form_type.lower()}.htm\n<DESCRIPTION>{form_type}\n'
+        f'<TEXT>\n{cover}{padding}</body></html>\n</TEXT>\n</DOCUMENT>\n'
+        '<DOCUMENT>\n<TYPE>EX-99.1\n<SEQUENCE>2\n<FILENAME>ex991.htm\n'
+        '<DESCRIPTION>PRESS RELEASE\n<TEXT>\n'
+        f'<html><body>{paragraph}</body></html>\n</TEXT>\n</DOCUMENT>\n')
+    return (header + documents + '</SEC-DOCUMENT>\n').encode('utf-8')
@@ -1,16 +1,49 @@
 """The Metadata class tracks the attributes of files as they are parsed."""
 
 import os
-from typing import List
 import re
 import pathlib
 import pickle as pkl
+import shutil
+from contextlib import contextmanager
 from yaml import load, CLoader as Loader, dump, CDumper as Dumper
 import warnings
-import urllib.request
-import json
 
 from .document import DocumentType
+from .network import EDGARClient, EDGAR_BASE_URL
+from .tickers import TickerIndex
+from .journal import Journal
+from .submission import uudecode
+from .subheader_parser_8k import Parser_8K
+from . import html
+from . import storage
+from .quota import AccessLog, DiskQuota
+from .tiers import Tiers
+
+
+def _merge_tree(src: str, dst: str) -> list:
+    """
+    Move the contents of a directory into another, keeping what the \
+    destination already holds, and return the paths left behind.
+    """
+    if not os.path.isdir(src):
+        return []
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.move(src, dst)
+        return []
+    left = []
+    for name in os.listdir(src):
+        i, j = os.path.join(src, name), os.path.join(dst, name)
+        if os.path.isdir(i) and os.path.isdir(j):
+            left += _merge_tree(i, j)
+        elif os.path.exists(j):
+            left.append(i)
+        else:
+            shutil.move(i, j)
+    if not left:
+        os.rmdir(src)
+    return left
 
 
 class metadata_manager(dict):
@@ -40,6 +73,25 @@ class metadata_manager(dict):
         self.keys_path = os.path.join(self.data_dir, '.keys.yaml')
         self.keys = None
 
+        # Tickers of one company share its filings, stored once
+        self.aliases_path = os.path.join(self.meta_dir, '.aliases.yaml')
+        self.aliases = None
+
+        # How files under the raw cache, files/ and parsed/ are compressed
+        self.storage_path = os.path.join(
+            self.data_dir, DocumentType.STORAGE_FILE_NAME)
+        self.storage_options = None
+        self._storage = None
+        self._quota = None
+        self._tiers = None
+        self._access_log = None
+        # Depth of deferred_quota blocks, which hold enforce_quota back
+        self._quota_deferred = 0
+        self.load_storage_options()
+        # Server evicted filings are downloaded again from, set by the
+        #   Downloader to the one it last used
+        self.base_url = EDGAR_BASE_URL
+
         self.file2sub = {}
         self.sub2tikr = {}
         self.file2tikr = {}
@@ -58,6 +110,7 @@ class metadata_manager(dict):
         # Keep API Keys
         if keep_api_header:
             self.save_keys()
+        self.aliases = None
         self.clear()
 
     def load_keys(self):
@@ -72,8 +125,379 @@ class metadata_manager(dict):
         """Save current APIKEYs to local directory."""
         dump(self.keys, open(self.keys_path, 'w'), Dumper=Dumper)
 
+    def load_aliases(self):
+        """Load the company of each ticker from the metadata directory."""
+        self.aliases = {'ciks': dict(), 'canonical': dict()}
+        if os.path.exists(self.aliases_path):
+            with open(self.aliases_path, 'r') as f:
+                self.aliases.update(load(f, Loader=Loader) or dict())
+
+    def save_aliases(self):
+        """Save the company of each ticker to the metadata directory."""
+        with open(self.aliases_path, 'w') as f:
+            dump(self.aliases, f, Dumper=Dumper)
+
+    def load_storage_options(self):
+        """Load the storage settings of the data directory."""
+        self.storage_options = {'compression': None, 'level': None,
+                                'layout': 'files', 'quota': None,
+                                'tiers': None}
+        if os.path.exists(self.storage_path):
+            with open(self.storage_path, 'r') as f:
+                self.storage_options.update(
+                    load(f, Loader=Loader) or dict())
+        self._reset_storage()
+
+    def save_storage_options(self):
+        """Save the storage settings to the data directory."""
+        with open(self.storage_path, 'w') as f:
+            dump(self.storage_options, f, Dumper=Dumper)
+        self._reset_storage()
+
+    def _reset_storage(self):
+        """Drop objects built from the storage settings."""
+        self._storage = None
+        self._quota = None
+        if self._tiers is not None:
+            self._tiers.stop()
+        self._tiers = None
+        self._access_log = None
+        # Raw dumps are read by path, so colder roots are searched for
+        #   them as soon as the settings are known
+        storage.set_tiers(self.data_dir, self.storage_options['tiers'])
+
+    def set_compression(self, compression: str = None, level: int = None):
+        """
+        Compress files written from now on to the raw cache, files/ and \
+        parsed/.
+
+        Parameters
+        ----------
+        compression: str, Optional
+            'zstd', 'gzip', or None to store files uncompressed. zstd needs
+            the optional zstandard package.
+        level: int, Optional
+            The compression level. Defaults to 3 for zstd and 6 for gzip.
+
+        Notes
+        -----
+        The setting is saved in the data directory, so every Downloader,
+        Parser and worker process using it writes alike. Files already
+        stored are left as they are; every reader finds and decompresses
+        them by their suffix, whichever way they were written.
+        """
+        storage.check_compression(compression)
+        if self.storage_options is None:
+            self.load_storage_options()
+        self.storage_options.update(
+            {'compression': compression, 'level': level})
+        self.save_storage_options()
+
+    def set_layout(self, layout: str = 'files'):
+        """
+        Choose how extracted documents and features are laid out on disk.
+
+        Parameters
+        ----------
+        layout: str
+            'files' for one file per document under files/ and parsed/, or
+            'shards' to pack them into append-only shards per company and
+            filing year under shards/.
+
+        Notes
+        -----
+        Saved in the data directory like set_compression. Documents
+        already stored as files stay readable after switching to shards.
+        """
+        if layout not in ('files', 'shards'):
+            raise ValueError(f'Unknown layout {layout}, '
+                             "expected 'files' or 'shards'")
+        if self.storage_options is None:
+            self.load_storage_options()
+        self.storage_options['layout'] = layout
+        self.save_storage_options()
+
+    def set_quota(self, max_bytes: int = None):
+        """
+        Limit the disk used by the raw cache, files/ and parsed/.
+
+        Parameters
+        ----------
+        max_bytes: int, Optional
+            The budget, in bytes, or None for no limit.
+
+        Notes
+        -----
+        Saved in the data directory like set_compression. Once a download
+        or unpack leaves the data directory over budget, the least
+        recently used raw dumps, extracted submissions and features are
+        evicted, and they are derived again when next read. See
+        DiskQuota and enforce_quota.
+        """
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError(f'Invalid quota {max_bytes}')
+        if self.storage_options is None:
+            self.load_storage_options()
+        self.storage_options['quota'] = max_bytes
+        self.save_storage_options()
+
+    def get_quota(self) -> DiskQuota:
+        """Return the disk quota of the data directory, or None."""
+        if self.storage_options is None:
+            self.load_storage_options()
+        if self.storage_options['quota'] is None:
+            return None
+        if self._quota is None:
+            self._quota = DiskQuota(
+                self.data_dir, self.storage_options['quota'],
+                log=self.get_access_log(), tiers=self.get_tiers())
+        return self._quota
+
+    def set_tiers(self, roots: list = None):
+        """
+        Spread the data directory over colder roots.
+
+        Parameters
+        ----------
+        roots: list[str], Optional
+            Directories laid out like the data directory, from the warmest
+            down, e.g. ['/mnt/bulk']. None keeps everything in data_dir.
+
+        Notes
+        -----
+        Saved in the data directory like set_compression. The data
+        directory stays the hot tier: files are written to it, and read
+        files are moved back up to it. Files left unused move down with
+        get_tiers().demote, or in the background with get_tiers().start,
+        and with a disk quota they are demoted rather than evicted. See
+        Tiers.
+        """
+        if self.storage_options is None:
+            self.load_storage_options()
+        self.storage_options['tiers'] = \
+            [os.path.abspath(i) for i in roots] if roots else None
+        self.save_storage_options()
+
+    def get_tiers(self) -> Tiers:
+        """Return the tiers of the data directory, or None."""
+        if self.storage_options is None:
+            self.load_storage_options()
+        if not self.storage_options['tiers']:
+            return None
+        if self._tiers is None:
+            self._tiers = Tiers(self.data_dir, self.storage_options['tiers'],
+                                log=self.get_access_log())
+        return self._tiers
+
+    def get_access_log(self) -> AccessLog:
+        """
+        Return the log of when files were last used, or None if no disk
+        quota or tiers need it.
+        """
+        if self.storage_options is None:
+            self.load_storage_options()
+        if self.storage_options['quota'] is None and \
+                not self.storage_options['tiers']:
+            return None
+        if self._access_log is None:
+            self._access_log = AccessLog(self.data_dir)
+        return self._access_log
+
+    def touch(self, path: str):
+        """Record a read of a raw dump, document or feature file."""
+        log = self.get_access_log()
+        if log is not None:
+            log.touch(path)
+
+    def enforce_quota(self) -> list:
+        """
+        Evict least recently used files until within the disk quota.
+
+        Returns
+        -------
+        evicted: list[str]
+            The raw dumps, extracted submissions and features evicted,
+            relative to data_dir. Nothing is evicted within a
+            deferred_quota block.
+        """
+        quota = self.get_quota()
+        if quota is None or self._quota_deferred:
+            return []
+        return quota.enforce(self.get_storage())
+
+    @contextmanager
+    def deferred_quota(self):
+        """
+        Enforce the disk quota once, as the outermost block exits, rather
+        than after every download and unpack within it.
+        """
+        self._quota_deferred += 1
+        try:
+            yield
+        finally:
+            self._quota_deferred -= 1
+        if not self._quota_deferred:
+            self.enforce_quota()
+
+    def get_compression(self) -> tuple:
+        """Return the (compression, level) new files are written with."""
+        if self.storage_options is None:
+            self.load_storage_options()
+        return (self.storage_options['compression'],
+                self.storage_options['level'])
+
+    def get_storage(self) -> storage.FileStorage:
+        """
+        Return the backend documents and features are read and written \
+        through, as the data directory is laid out.
+        """
+        if self.storage_options is None:
+            self.load_storage_options()
+        if self._storage is None:
+            compression, level = self.get_compression()
+            if self.storage_options['layout'] == 'shards':
+                # Imported only when used, see shards._lock
+                from .shards import ShardStorage
+                self._storage = ShardStorage(
+                    self.data_dir, compression=compression, level=level)
+            else:
+                self._storage = storage.FileStorage(
+                    compression=compression, level=level)
+            if self.get_access_log() is not None:
+                self._storage.on_access = self.get_access_log().touch
+        return self._storage
+
+    def _get_aliases(self) -> dict:
+        """Safe get function for the ticker alias table."""
+        if self.aliases is None:
+            self.load_aliases()
+        return self.aliases
+
+    def set_cik(self, tikr: str, cik: int) -> str:
+        """
+        Record the company behind a ticker.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier
+        cik: int
+            The SEC Central Index Key of the company
+
+        Returns
+        -------
+        canonical: str
+            The ticker the company's filings are stored under. This is the
+            first ticker recorded for the CIK; later share classes of the
+            same company, such as googl after goog, become its aliases.
+        """
+        aliases = self._get_aliases()
+        cik = int(cik)
+        if aliases['ciks'].get(tikr) == cik:
+            return self.canonical(tikr)
+        aliases['ciks'][tikr] = cik
+        canonical = aliases['canonical'].setdefault(cik, tikr)
+        self.save_aliases()
+        if canonical != tikr:
+            self._migrate_alias(tikr, canonical)
+        return canonical
+
+    def _migrate_alias(self, alias: str, canonical: str):
+        """
+        Move what was stored under a ticker before it became an alias to \
+        the canonical ticker.
+
+        Notes
+        -----
+        Submissions, raw dumps, extracted files, features, shard records
+        and journal entries are moved unless the canonical ticker already
+        holds them. What is left under the alias is warned about, as it is
+        no longer read.
+        """
+        meta_path = os.path.join(self.meta_dir, f'{alias}.pkl')
+        data = self.pop(alias, None)
+        if data is None and os.path.exists(meta_path):
+            with open(meta_path, 'rb') as f:
+                data = pkl.load(f)
+        left = []
+
+        # Raw dumps, files and features, in every tier
+        for area in (DocumentType.RAW_FILE_DIR_NAME,
+                     DocumentType.EXTRACTED_FILE_DIR_NAME,
+                     DocumentType.PARSED_FILE_DIR_NAME):
+            src = os.path.join(self.data_dir, area, alias)
+            dst = os.path.join(self.data_dir, area, canonical)
+            for i, j in zip([src] + storage.colder(src),
+                            [dst] + storage.colder(dst)):
+                left += _merge_tree(i, j)
+
+        backend = self.get_storage()
+        if self.storage_options['layout'] == 'shards':
+            left += backend.move_tikr(alias, canonical)
+        elif os.path.isdir(os.path.join(
+                self.data_dir, DocumentType.SHARD_DIR_NAME, alias)):
+            left.append(os.path.join(DocumentType.SHARD_DIR_NAME, alias))
+
+        journal_dir = os.path.join(self.data_dir,
+                                   DocumentType.JOURNAL_DIR_NAME)
+        journal = os.path.join(journal_dir, f'{alias}.jsonl')
+        if os.path.exists(journal):
+            with open(journal, 'rb') as f, open(os.path.join(
+                    journal_dir, f'{canonical}.jsonl'), 'ab') as out:
+                shutil.copyfileobj(f, out)
+            os.remove(journal)
+
+        if data is not None:
+            prefix = os.path.join(DocumentType.RAW_FILE_DIR_NAME, alias, '')
+            submissions = self._get_tikr(canonical)['submissions']
+            for submission, entry in data['submissions'].items():
+                if submission in submissions:
+                    continue
+                for doc in entry['documents'].values():
+                    if doc.get('source', '').startswith(prefix):
+                        doc['source'] = os.path.join(
+                            DocumentType.RAW_FILE_DIR_NAME, canonical,
+                            doc['source'][len(prefix):])
+                submissions[submission] = entry
+            self.save_tikr_metadata(canonical)
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+
+        if left:
+            warnings.warn(
+                f'{alias} is now an alias of {canonical}, but {len(left)} '
+                f'of its files are also stored under {canonical} and were '
+                f'left in place, e.g. {left[0]}', RuntimeWarning)
+
+    def get_cik(self, tikr: str) -> int:
+        """Return the CIK recorded for a ticker, or None if unknown."""
+        return self._get_aliases()['ciks'].get(tikr, None)
+
+    def canonical(self, tikr: str) -> str:
+        """
+        Return the ticker a company's filings are stored under.
+
+        Notes
+        -----
+        Tickers with no recorded CIK are their own canonical ticker.
+        """
+        aliases = self._get_aliases()
+        cik = aliases['ciks'].get(tikr, None)
+        if cik is None:
+            return tikr
+        return aliases['canonical'].get(cik, tikr)
+
+    def get_aliases(self, tikr: str) -> list:
+        """Return every ticker sharing a company with tikr, including it."""
+        aliases = self._get_aliases()
+        cik = aliases['ciks'].get(tikr, None)
+        if cik is None:
+            return [tikr]
+        return [i for i in aliases['ciks'] if aliases['ciks'][i] == cik]
+
     def load_tikr_metadata(self, tikr):
         """Load previously generated metadata and add to current."""
+        tikr = self.canonical(tikr)
         data_path = os.path.join(self.meta_dir, f'{tikr}.pkl')
         if os.path.exists(data_path):
 
@@ -87,6 +511,7 @@ class metadata_manager(dict):
 
     def save_tikr_metadata(self, tikr):
         """Offload metadata to file, for later loading."""
+        tikr = self.canonical(tikr)
         self.initialize_tikr_metadata(tikr)
 
         data_path = os.path.join(self.meta_dir, f'{tikr}.pkl')
@@ -96,12 +521,13 @@ class metadata_manager(dict):
 
     def initialize_tikr_metadata(self, tikr):
         """Generate a company entry in metadata if not yet present."""
+        tikr = self.canonical(tikr)
         if tikr not in self:
             self[tikr] = {'attrs': dict(), 'submissions': dict()}
 
     def initialize_submission_metadata(self, tikr, submission):
         """Generate a submission entry for a company tikr if not present."""
-        pdict = self[tikr]['submissions']
+        pdict = self._get_tikr(tikr)['submissions']
         if submission not in pdict:
             pdict[submission] = {'attrs': dict(), 'documents': dict()}
 
@@ -137,10 +563,26 @@ class metadata_manager(dict):
             a company identifier to query
         submission: str
             The associated company filing to find the primary form for.
+        document_type: str or DocumentType, Optional
+            The form type of the primary document. Defaults to the
+            submission's 'FORM TYPE'.
 
-        TODO not implemented
+        Returns
+        --------
+        filename: str, None
+            The name of the primary document, or None
         """
-        raise NotImplementedError()
+        if document_type is None:
+            document_type = self._get_submission(
+                tikr, submission)['attrs'].get('FORM TYPE', '').strip()
+        if not DocumentType.is_valid_type(document_type):
+            return None
+        document_type = DocumentType(document_type)
+        if document_type == '10-Q':
+            return self.get_10q_name(tikr, submission)
+        if document_type == '8-K':
+            return self.get_8k_name(tikr, submission)
+        return None
 
     def get_10q_name(self, tikr, submission):
         """
@@ -189,6 +631,7 @@ class metadata_manager(dict):
 
     def _get_tikr(self, tikr):
         """Safe get function for company entries in metadata."""
+        tikr = self.canonical(tikr)
         if tikr not in self:
             self.load_tikr_metadata(tikr)
         return self[tikr]
@@ -208,12 +651,314 @@ class metadata_manager(dict):
         Returns
         -------
         file_metadata: dict or None
+            None also if the submission is not in metadata.
         """
+        if submission not in self._get_tikr(tikr)['submissions']:
+            return None
         sub = self._get_submission(tikr, submission)
         docs = sub['documents']
         seq = self.find_sequence_of_file(tikr, submission, filename)
         return docs.get(seq, None)
 
+    def read_document(self, tikr: str, submission: str, filename: str,
+                      document_type: str = None) -> str:
+        """
+        Read the contents of an unpacked document.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        submission: str
+            The filing the document belongs to
+        filename: str
+            The name of the document
+        document_type: str or DocumentType, Optional
+            The document type the filing was unpacked under. Defaults to
+            the submission's 'FORM TYPE'.
+
+        Notes
+        -----
+        Documents unpacked with `virtual=True` are read straight out of the
+        byte range they occupy in the raw submission dump, as are indexed
+        documents that were never extracted while the dump is kept.
+        Extracted documents evicted by the disk quota are derived again,
+        see restore_document.
+        """
+        with self.open_document(tikr, submission, filename,
+                                document_type=document_type) as document:
+            return document.text()
+
+    def open_document(self, tikr: str, submission: str, filename: str,
+                      document_type: str = None) -> storage.Document:
+        """
+        Open an unpacked document as bytes, without decoding it.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        submission: str
+            The filing the document belongs to
+        filename: str
+            The name of the document
+        document_type: str or DocumentType, Optional
+            The document type the filing was unpacked under. Defaults to
+            the submission's 'FORM TYPE'.
+
+        Returns
+        -------
+        document: Document
+            A handle to close once read, memory mapped where the document
+            is stored uncompressed, see storage.Document.
+
+        Notes
+        -----
+        Documents are found as by read_document.
+        """
+        doc = self._get_file(tikr, submission, filename)
+        if doc is not None and doc.get('virtual', False):
+            document = self._open_raw_slice(tikr, submission, doc)
+            if document is None:
+                raise FileNotFoundError(
+                    f"{os.path.join(self.data_dir, doc['source'])}")
+            return document
+
+        path = self._document_path(tikr, submission, filename, document_type)
+        backend = self.get_storage()
+        if not backend.exists(path):
+            return storage.Document(self.restore_document(
+                tikr, submission, filename, path).encode('utf-8'))
+        return backend.open_document(path)
+
+    def locate_document(self, tikr: str, submission: str, filename: str,
+                        document_type: str = None) -> tuple:
+        """
+        Return a key sorting documents in the order they are stored on \
+        disk, or None if the document has to be derived again.
+        """
+        where = self.get_storage().locality(self._document_path(
+            tikr, submission, filename, document_type))
+        if where is None and self.is_virtual(tikr, submission, filename):
+            doc = self._get_file(tikr, submission, filename)
+            where = storage.locality(os.path.join(
+                self.data_dir, doc['source']), doc['offset'])
+        return where
+
+    def _document_path(self, tikr: str, submission: str, filename: str,
+                       document_type: str = None) -> str:
+        """Return where a document is stored when extracted."""
+        tikr = self.canonical(tikr)
+        if document_type is None:
+            document_type = self._get_submission(
+                tikr, submission)['attrs']['FORM TYPE']
+        document_type = DocumentType(document_type)
+        return os.path.join(self.data_dir,
+                            DocumentType.EXTRACTED_FILE_DIR_NAME,
+                            tikr, f'{document_type}', submission, filename)
+
+    def restore_document(self, tikr: str, submission: str, filename: str,
+                         path: str) -> str:
+        """
+        Read a document missing from files/, deriving it again if it was \
+        extracted before.
+
+        Parameters
+        ----------
+        path: str
+            Where the document is stored when extracted
+
+        Notes
+        -----
+        The document is sliced out of its raw submission dump, which is
+        downloaded again from its journaled url if it is gone too, and a
+        document that was fetched alone is fetched again. Extracted
+        documents are then written back to `path`.
+        """
+        doc = self._get_file(tikr, submission, filename)
+        if doc is None:
+            raise FileNotFoundError(f'{path}')
+        extracted = doc.get('extracted', False)
+        if 'offset' in doc:
+            data = self._read_raw_slice(tikr, submission, doc,
+                                        refetch=extracted)
+            if data is None:
+                raise FileNotFoundError(f'{path}')
+            if extracted:
+                self.get_storage().write_bytes(path, data)
+            return storage.decode_text(data)
+        filing = self._get_journal().get_filing(self.canonical(tikr),
+                                                submission)
+        if not extracted or filing is None:
+            raise FileNotFoundError(f'{path}')
+        folder = filing['url'][:filing['url'].rfind('/')]
+        self._get_client().download(f'{folder}/{filename}', path,
+                                    backend=self.get_storage())
+        return self.get_storage().read_text(path)
+
+    def _restore_raw(self, tikr: str, submission: str, source: str) -> bool:
+        """
+        Download a raw submission dump again if it is not stored.
+
+        Returns
+        -------
+        stored: bool
+            False if the dump is gone and no url to fetch it was journaled.
+        """
+        path = os.path.join(self.data_dir, source)
+        if storage.exists(path):
+            return True
+        filing = self._get_journal().get_filing(self.canonical(tikr),
+                                                submission)
+        if filing is None:
+            return False
+        compression, level = self.get_compression()
+        self._get_client().download(filing['url'], path,
+                                    compression=compression, level=level)
+        self.touch(path)
+        return True
+
+    def _read_raw_slice(self, tikr: str, submission: str, doc: dict,
+                        refetch: bool = True) -> bytes:
+        """Read a document's byte range of its raw dump, or None."""
+        document = self._open_raw_slice(tikr, submission, doc,
+                                        refetch=refetch)
+        if document is None:
+            return None
+        with document:
+            return document[:]
+
+    def _open_raw_slice(self, tikr: str, submission: str, doc: dict,
+                        refetch: bool = True) -> storage.Document:
+        """Open a document's byte range of its raw dump, or None."""
+        if refetch:
+            if not self._restore_raw(tikr, submission, doc['source']):
+                return None
+        elif not storage.exists(os.path.join(self.data_dir, doc['source'])):
+            return None
+        path = os.path.join(self.data_dir, doc['source'])
+        self.touch(path)
+        return storage.open_document(path, doc['offset'], doc['length'])
+
+    def _get_journal(self) -> Journal:
+        """Open the accession journal, read afresh."""
+        return Journal(os.path.join(self.data_dir,
+                                    DocumentType.JOURNAL_DIR_NAME))
+
+    def _get_client(self) -> EDGARClient:
+        """Create a client identified by the saved API keys."""
+        if self.keys is None:
+            self.load_keys()
+        return EDGARClient(''.join([
+            f"{self.keys.get('edgar_agent', '')}",
+            f": {self.keys.get('edgar_email', '')}"]), base_url=self.base_url)
+
+    def _gen_submission_facts(self, tikr: str, submission: str,
+                              data: bytes = None):
+        """
+        Extract and store the cover facts of a submission's primary document.
+
+        Parameters
+        ----------
+        data: bytes, Optional
+            The primary document's contents, if already at hand. Otherwise
+            it is read with read_document.
+
+        Notes
+        -----
+        Facts are stored as the submission's 'facts' entry. A submission
+        without a readable primary document gets an empty entry, so
+        extracting facts never fails an unpack.
+        """
+        facts = dict()
+        filename = self.get_primary_doc_name(tikr, submission)
+        if filename is not None:
+            try:
+                if data is not None:
+                    text = storage.decode_text(data)
+                else:
+                    text = self.read_document(tikr, submission, filename)
+                facts = html.get_cover_facts(text)
+            except (OSError, ValueError):
+                pass
+        self._get_submission(tikr, submission)['facts'] = facts
+        return facts
+
+    def get_cover_facts(self, tikr: str, submission: str,
+                        refresh: bool = False) -> dict:
+        """
+        Return the ix:hidden and dei:* facts of a submission.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        submission: str
+            The filing to get facts for
+        refresh: bool
+            if (True), re-extract facts already stored in metadata.
+
+        Returns
+        -------
+        facts: dict
+            e.g. {'dei:DocumentPeriodEndDate': '2020-03-28', ...}
+
+        Notes
+        -----
+        Facts are extracted from the primary document on first use and
+        kept in metadata, which is not saved here.
+        """
+        sub = self._get_submission(tikr, submission)
+        if refresh or 'facts' not in sub:
+            return self._gen_submission_facts(tikr, submission)
+        return sub['facts']
+
+    def read_exhibit(self, tikr: str, submission: str,
+                     filename: str) -> bytes:
+        """
+        Decode a non-HTML exhibit, such as an image, PDF or spreadsheet.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        submission: str
+            The filing the exhibit belongs to
+        filename: str
+            The name of the exhibit, e.g. 'g1.jpg'
+
+        Returns
+        -------
+        content: bytes
+            The decoded file. Exhibits that are not uuencoded, such as
+            plain text or XML, are returned as stored.
+
+        Notes
+        -----
+        Exhibits are left in the raw submission dump during unpacking and
+        only their byte range is recorded, so they can only be read while
+        the raw dump is kept, or can be downloaded again from the url it
+        was journaled with.
+        """
+        doc = self._get_file(tikr, submission, filename)
+        if doc is None or 'offset' not in doc:
+            raise FileNotFoundError(
+                f'{filename} in {submission} was not indexed')
+        data = self._read_raw_slice(tikr, submission, doc)
+        if data is None:
+            raise FileNotFoundError(
+                f"{os.path.join(self.data_dir, doc['source'])} was removed, "
+                f'{filename} is no longer available')
+        # PDFs are wrapped in a <PDF> tag ahead of the 'begin' line
+        if re.match(rb'\s*(<\w+>\s*)?begin [0-7]+ ', data[:256]):
+            data = uudecode(data)
+        return data
+
+    def is_virtual(self, tikr: str, submission: str, filename: str) -> bool:
+        """Return True if a document is read from its raw submission dump."""
+        doc = self._get_file(tikr, submission, filename)
+        return doc is not None and doc.get('virtual', False)
+
     def get_submissions(self, tikr):
         """
         Get a list of filing submissions under a company.
@@ -238,7 +983,7 @@ class metadata_manager(dict):
         but not guaranteed that the primary file has sequence 1 and the
         supplementary materials ascend in sequence.
         """
-        level = self[tikr]['submissions'][submission]['documents']
+        level = self._get_tikr(tikr)['submissions'][submission]['documents']
         for sequence in level:
             if level[sequence]['filename'] == filename:
                 return sequence
@@ -269,25 +1014,168 @@ class metadata_manager(dict):
         """
         sequence = self.find_sequence_of_file(tikr, submission, filename)
         assert sequence is not None, 'Error: filename not found'
-        doc = self[tikr]['submissions'][submission]['documents'][sequence]
+        doc = self._get_tikr(tikr)['submissions'][submission][
+            'documents'][sequence]
         return doc.get('features_pregenerated', False)
 
-    def set_downloaded(self, tikr: str, value: bool = True):
+    @staticmethod
+    def _document_types(document_type) -> list:
+        """Expand 'all' into each form type that can be downloaded."""
+        document_type = DocumentType(document_type)
+        return [DocumentType('10-Q'), DocumentType('8-K')] \
+            if document_type == 'all' else [document_type]
+
+    def set_downloaded(self, tikr: str, value: bool = True,
+                       document_type: str = 'all'):
         """Set the status for is_downloaded function."""
-        self._get_tikr(tikr)['attrs']['downloaded'] = value
+        for dtype in self._document_types(document_type):
+            self._get_tikr(tikr)['attrs'][f'downloaded_{dtype}'] = value
         self.save_tikr_metadata(tikr)
 
-    def is_downloaded(self, tikr: str):
+    def is_downloaded(self, tikr: str, document_type: str = 'all'):
         """
         Return True if TIKR has local results of bulk download.
 
+        Parameters
+        ------------
+        document_type: str or DocumentType
+            The form type in question. 'all' requires every form type.
+
         Notes
         -----
         This indicates whether there is any extra information available
         for download from the SEC EDGAR database, but does not track
         new releases.
         """
-        return self._get_tikr(tikr)['attrs'].get('downloaded', False)
+        return all(self._get_tikr(tikr)['attrs'].get(
+            f'downloaded_{dtype}', False)
+            for dtype in self._document_types(document_type))
+
+    def get_latest_filing_date(self, tikr: str, document_type: str = 'all'):
+        """
+        Return the most recent 'FILED AS OF DATE' among local submissions.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        document_type: str or DocumentType
+            Only consider submissions of this form type
+
+        Returns
+        -------
+        date: str or None
+            The date as YYYYMMDD, or None if no submission has been unpacked.
+        """
+        document_type = DocumentType(document_type)
+        latest = None
+        for submission in self._get_tikr(tikr)['submissions'].values():
+            attrs = submission['attrs']
+            date = attrs.get('FILED AS OF DATE', None)
+            if date is None:
+                continue
+            form_type = attrs.get('FORM TYPE', '').strip()
+            if document_type != 'all' and not (
+                    DocumentType.is_valid_type(form_type) and
+                    DocumentType(form_type) == document_type.dtype):
+                continue
+            date = date.strip()
+            if latest is None or date > latest:
+                latest = date
+        return latest
+
+    def _gen_submission_items(self, tikr: str, submission: str):
+        """
+        Record the 8-K item numbers listed in a submission's header.
+
+        Notes
+        -----
+        Items are stored as attrs['ITEMS'], e.g. ['2.02', '9.01']. An
+        'ITEM INFORMATION' line that matches no known item is kept by its
+        description.
+        """
+        attrs = self._get_submission(tikr, submission)['attrs']
+        descriptions = attrs.get('ITEM INFORMATION', [])
+        if isinstance(descriptions, str):
+            descriptions = [descriptions]
+        items = []
+        for description in descriptions:
+            item = Parser_8K.item_number(description) or description.strip()
+            if item not in items:
+                items.append(item)
+        attrs['ITEMS'] = items
+        return items
+
+    def get_item_index(self, tikr: str) -> dict:
+        """
+        Return the 8-K items filed by a company.
+
+        Returns
+        -------
+        index: dict[str, list[str]]
+            Maps each item number, e.g. '2.02', to the submissions listing
+            it in their header, oldest first.
+
+        Notes
+        -----
+        Built from metadata alone; no document is read.
+        """
+        index = dict()
+        submissions = self._get_tikr(tikr)['submissions']
+        for submission in sorted(
+                submissions, key=lambda x: self._filing_date(tikr, x)):
+            items = submissions[submission]['attrs'].get('ITEMS', None)
+            if items is None:
+                items = self._gen_submission_items(tikr, submission)
+            for item in items:
+                index.setdefault(item, []).append(submission)
+        return index
+
+    def _filing_date(self, tikr: str, submission: str) -> str:
+        attrs = self._get_submission(tikr, submission)['attrs']
+        return attrs.get('FILED AS OF DATE', '').strip()
+
+    def find_filings_by_item(self, tikr: str, item: str,
+                             start_date: str = None,
+                             end_date: str = None) -> list:
+        """
+        List the submissions of a company that report an 8-K item.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        item: str
+            The item number, e.g. '2.02' or 'Item 2.02', or its description
+        start_date: str, Optional
+            The earliest filing date to include, as YYYYMMDD or YYYY-MM-DD
+        end_date: str, Optional
+            The latest filing date to include, as YYYYMMDD or YYYY-MM-DD
+
+        Returns
+        -------
+        submissions: list[str]
+            Matching submissions, oldest first.
+        """
+        item = str(item).strip()
+        if item.lower().startswith('item'):
+            item = item[len('item'):].strip()
+        if item not in Parser_8K.section_names:
+            item = Parser_8K.item_number(item) or item
+        start_date = str(start_date).replace('-', '') \
+            if start_date is not None else None
+        end_date = str(end_date).replace('-', '') \
+            if end_date is not None else None
+
+        out = []
+        for submission in self.get_item_index(tikr).get(item, []):
+            date = self._filing_date(tikr, submission)
+            if start_date is not None and date < start_date:
+                continue
+            if end_date is not None and date > end_date:
+                continue
+            out.append(submission)
+        return out
 
     def set_unpacked(self, tikr, document_type, value=True):
         """Set the status for is_unpacked function."""
@@ -306,6 +1194,10 @@ class metadata_manager(dict):
             The document type in question
         """
         document_type = DocumentType(document_type)
+        if document_type == 'all' and 'unpacked_all' not in \
+                self._get_tikr(tikr)['attrs']:
+            return all(self.is_unpacked(tikr, dtype)
+                       for dtype in self._document_types(document_type))
         return self._get_tikr(tikr)['attrs'].get(
             f'unpacked_{document_type}', False)
 
@@ -319,15 +1211,11 @@ class metadata_manager(dict):
         tikr : list[str]
             All SEC filing company public stock tickers.
         """
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-        tikr_fpath = os.path.join(self.data_dir, 'company_tickers.json')
-        if not os.path.isfile(tikr_fpath):
-            urllib.request.urlretrieve(
-                'https://www.sec.gov/files/company_tickers.json', tikr_fpath)
-        with open(tikr_fpath) as json_file:
-            data = json.load(json_file)
-        return [data[i]['ticker'] for i in data]
+        index = TickerIndex(os.path.join(
+            self.data_dir, DocumentType.TICKER_INDEX_FILE_NAME))
+        if not index.load():
+            index.update(self._get_client())
+        return index.tickers()
 
     def offload_submission_file(self, tikr: str, submission: str):
         """Delete submission from local dataset, removing it from disk."""
@@ -340,10 +1228,7 @@ class metadata_manager(dict):
                 tikr,
                 f'{document_type}',
                 submission)).absolute()
-        if os.path.exists(spath):
-            for file in os.listdir(spath):
-                os.remove(os.path.join(spath, file))
-            os.rmdir(spath)
+        self.get_storage().remove_dir(spath)
 
         self._get_tikr(tikr)['submissions'].pop(submission)
         self.save_tikr_metadata(tikr)
@@ -395,7 +1280,7 @@ class metadata_manager(dict):
                     'Document Encountered without 10-Q or 8-K', RuntimeWarning)
                 for file in files:
                     if files[file].get('is_ims-document', False):
-                        self[tikr]['submissions'][submission][
+                        self._get_submission(tikr, submission)[
                             'attrs']['is_annotated'] = False
                         warnings.warn(
                             'Encountered unlabeled IMS-DOCUMENT',
@@ -414,68 +1299,44 @@ class metadata_manager(dict):
             document_type = DocumentType(document_type)
 
         data = None
-        fname = os.path.join(self.data_dir,
-                             DocumentType.EXTRACTED_FILE_DIR_NAME,
-                             tikr, f'{document_type}', submission)
-        files = os.listdir(fname)
+        files = self._get_submission(tikr, submission)['documents']
+        files = [files[i]['filename'] for i in files
+                 if files[i].get('extracted', False)]
 
         for file in files:
-            with open(os.path.join(fname, file), 'r', encoding='utf-8') as f:
-                data = f.read()
-            for tag in annotated_tag_list:
-                if re.search(tag, data):
-                    self._get_submission(tikr, submission)['attrs'][
-                        'is_annotated'] = True
-                    return True
+            # Scanned as bytes, without decoding the document
+            with self.open_document(tikr, submission, file,
+                                    document_type=document_type) as data:
+                annotated = any(data.search(tag, flags=re.I)
+                                for tag in annotated_tag_list)
+            if annotated:
+                self._get_submission(tikr, submission)['attrs'][
+                    'is_annotated'] = True
+                return True
         self._get_submission(tikr, submission)['attrs'][
             'is_annotated'] = False
         return False
 
     def _gen_submission_doc_attrs(
-            self, tikr: str, submission: str, documents: List[str]):
-        """Generate the document metadata for a submission under company."""
+            self, tikr: str, submission: str, documents: list):
+        """
+        Generate the document metadata for a submission under company.
+
+        Parameters
+        ----------
+        documents: list[SubmissionDocument]
+            Documents read from the submission dump by a SubmissionReader.
+        """
         out = dict()
 
         for doc in documents:
+            if doc.sequence == '':
+                raise RuntimeError('No <sequence> in document')
 
-            seq = doc.find('sequence')
-            i = 20
-            while ('\n') not in seq.text[:i]:
-                i += 20
-                if i > 600:
-                    raise RuntimeError('No <sequence> in document')
-
-            seq = seq.text[:i].split('\n')[0]
-            out[seq] = dict()
-
-            for nextElem in ['type', 'filename', 'description']:
-                doc2 = doc.find(nextElem)
-
-                # Sentinel for missing fields in early 2000s
-                if doc2 is None:
-                    if nextElem == 'filename':
-                        out[seq][nextElem] = f'h{seq}_{hash(doc)}.htm'
-                    else:
-                        out[seq][nextElem] = ''
-                    continue
-
-                skip = False
-                i = 20
-                while ('\n') not in doc2.text[:i]:
-                    i += 20
-                    if i > 600:
-                        skip = True
-                        # type: GRAPHIC elements have no <description>
-                        # after <filename>
-                        if nextElem != 'description' and out[seq][
-                                'type'] != 'GRAPHIC':
-                            raise RuntimeError
-                        break
-
-                if not skip:
-                    out[seq][nextElem] = doc2.text[:i].split('\n')[0]
-
-            out[seq]['extracted'] = False
+            out[doc.sequence] = {'type': doc.type,
+                                 'filename': doc.filename,
+                                 'description': doc.description,
+                                 'extracted': False}
 
         # Extend existing tikr metadata with new results,
         #   or start with empty dict and add new results
@@ -485,5 +1346,5 @@ class metadata_manager(dict):
         self.initialize_submission_metadata(tikr, submission)
 
         # Add documents to submission of tikr
-        self[tikr]['submissions'][submission]['documents'] = \
-            dict(out, **self[tikr]['submissions'][submission]['documents'])
+        sub = self._get_submission(tikr, submission)
+        sub['documents'] = dict(out, **sub['documents'])
@@ -0,0 +1,602 @@
+"""Rate-limited HTTP access to the SEC-EDGAR servers."""
+import os
+import re
+import gzip
+import json
+import time
+import zlib
+import socket
+import hashlib
+import threading
+import http.client
+import urllib.request
+import urllib.parse
+import urllib.error
+from typing import List
+
+from .tickers import TickerIndex
+from . import storage
+
+
+EDGAR_BASE_URL = 'https://www.sec.gov'
+EDGAR_DATA_URL = 'https://data.sec.gov'
+
+# The SEC asks that automated tools stay under 10 requests per second
+SEC_MAX_REQUESTS_PER_SECOND = 10
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared between concurrent requests."""
+
+    def __init__(self, rate: float = SEC_MAX_REQUESTS_PER_SECOND,
+                 capacity: float = None):
+        """
+        Create a token bucket.
+
+        Parameters
+        ----------
+        rate: float
+            Tokens added to the bucket per second.
+        capacity: float, Optional
+            Maximum number of tokens held at once, which bounds the size of
+            any burst. Defaults to 1, so requests are evenly spaced and no
+            one second window ever exceeds `rate`.
+        """
+        assert rate > 0, 'Rate must be positive'
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else 1)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def acquire(self, tokens: float = 1):
+        """Block until `tokens` are available, then consume them."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HTTPCache:
+    """
+    On-disk store of HTTP responses and their validators.
+
+    Notes
+    -----
+    Each url keeps its ETag and Last-Modified values, which EDGARClient
+    sends back as If-None-Match and If-Modified-Since. A 304 response is
+    then served from the stored body. Bodies of files streamed to disk
+    with EDGARClient.download are not stored twice; the downloaded file
+    itself is revalidated.
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Create or open a cache.
+
+        Parameters
+        ----------
+        cache_dir: str
+            The directory responses are stored in
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _path(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def lookup(self, url: str) -> dict:
+        """Return the stored entry of a url, or None."""
+        try:
+            with open(self._path(url) + '.json', 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        """Return the conditional request headers for an entry."""
+        headers = dict()
+        if entry is None:
+            return headers
+        if entry.get('etag', None):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified', None):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, headers, body: bytes = None,
+              size: int = None):
+        """
+        Record a full response, counted as a miss.
+
+        Parameters
+        ----------
+        url: str
+            The requested url
+        headers:
+            The response headers
+        body: bytes, Optional
+            The decoded body, if it should be kept in the cache
+        size: int, Optional
+            The decoded size of a body kept elsewhere
+        """
+        with self.lock:
+            self.misses += 1
+        entry = {'url': url, 'etag': headers.get('ETag', None),
+                 'last_modified': headers.get('Last-Modified', None),
+                 'size': len(body) if body is not None else size,
+                 'has_body': body is not None}
+        if not entry['etag'] and not entry['last_modified']:
+            return
+        path = self._path(url)
+        if body is not None:
+            with open(path + '.part', 'wb') as f:
+                f.write(body)
+            os.replace(path + '.part', path)
+        with open(path + '.json.part', 'w') as f:
+            json.dump(entry, f)
+        os.replace(path + '.json.part', path + '.json')
+
+    def read(self, url: str) -> bytes:
+        """Return the stored body of a url."""
+        with open(self._path(url), 'rb') as f:
+            return f.read()
+
+    def record_hit(self, size: int):
+        """Count a response served from the cache."""
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += size
+
+    def __repr__(self):
+        """Represent the cache by its counters."""
+        return (f'HTTPCache({self.cache_dir}): {self.hits} hits, '
+                f'{self.misses} misses, '
+                f'{self.bytes_saved / 1e6:.1f}MB not transferred')
+
+
+class EDGARClient:
+    """HTTP client for EDGAR that routes every request through a bucket."""
+
+    def __init__(self, user_agent: str, base_url: str = EDGAR_BASE_URL,
+                 rate_limiter: TokenBucket = None, timeout: float = 30,
+                 max_retries: int = 3, data_url: str = None,
+                 cache: HTTPCache = None, tickers: TickerIndex = None):
+        """
+        Create an EDGAR client.
+
+        Parameters
+        ----------
+        user_agent: str
+            The 'Name: email' identification string required by the SEC.
+        base_url: str
+            Server to query. Point this at a local stand-in for testing.
+        rate_limiter: TokenBucket, Optional
+            Shared rate limiter. A private 10 requests/second bucket is
+            created if not provided.
+        timeout: float
+            Socket timeout, in seconds, for each request.
+        max_retries: int
+            Number of times to retry after a 429 or 5xx response, a
+            connection error or a timeout.
+        data_url: str, Optional
+            Server for the JSON APIs hosted at data.sec.gov. Defaults to
+            data.sec.gov, or to base_url when base_url is not sec.gov.
+        cache: HTTPCache, Optional
+            Revalidate responses against this cache instead of fetching
+            them in full.
+        tickers: TickerIndex, Optional
+            Index used to look up CIKs. A saved index is loaded rather than
+            fetched. An index held in memory is created if not provided.
+
+        Notes
+        -----
+        Responses are requested gzip-encoded. `num_bytes` counts bytes as
+        transferred, before decompression.
+        """
+        self.user_agent = user_agent
+        self.base_url = base_url.rstrip('/')
+        if data_url is None:
+            data_url = EDGAR_DATA_URL if self.base_url == EDGAR_BASE_URL \
+                else self.base_url
+        self.data_url = data_url.rstrip('/')
+        self.tickers = tickers if tickers is not None else TickerIndex()
+        self._tickers_fetched = False
+        self._ciks_lock = threading.Lock()
+        self.rate_limiter = rate_limiter if rate_limiter is not None \
+            else TokenBucket()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.num_bytes = 0
+
+    def url(self, path: str, params: dict = None) -> str:
+        """Resolve a server path, or rebase an absolute sec.gov url."""
+        if path.startswith(EDGAR_DATA_URL):
+            path = self.data_url + path[len(EDGAR_DATA_URL):]
+        if path.startswith(EDGAR_BASE_URL):
+            path = path[len(EDGAR_BASE_URL):]
+        if not path.startswith('http'):
+            path = self.base_url + '/' + path.lstrip('/')
+        if params:
+            path += '?' + urllib.parse.urlencode(params)
+        return path
+
+    def _open(self, url: str, headers: dict = None):
+        """
+        Open a url, waiting on the rate limiter and retrying on 429, 5xx,
+        connection errors and timeouts.
+
+        Returns
+        -------
+        response: or None
+            None if the server answered 304 Not Modified.
+        """
+        request = urllib.request.Request(url, headers=dict({
+            'User-Agent': self.user_agent,
+            'Accept-Encoding': 'gzip'}, **(headers or dict())))
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            with self.lock:
+                self.num_requests += 1
+            try:
+                return urllib.request.urlopen(request, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    return None
+                if attempt >= self.max_retries or not (
+                        e.code == 429 or e.code >= 500):
+                    raise
+                retry_after = e.headers.get('Retry-After', None)
+                delay = float(retry_after) if retry_after and (
+                    retry_after.isdigit()) else 2 ** attempt
+            except (urllib.error.URLError, ConnectionError, socket.timeout,
+                    http.client.HTTPException):
+                if attempt >= self.max_retries:
+                    raise
+                delay = 2 ** attempt
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, path: str, params: dict = None) -> bytes:
+        """Fetch the body of a server path."""
+        url = self.url(path, params)
+        entry = None
+        if self.cache is not None:
+            entry = self.cache.lookup(url)
+            if entry is not None and not entry.get('has_body', False):
+                entry = None
+
+        response = self._open(url, HTTPCache.validators(entry))
+        if response is None:
+            try:
+                content = self.cache.read(url)
+            except OSError:
+                # The cached body was removed meanwhile
+                response = self._open(url)
+            else:
+                self.cache.record_hit(len(content))
+                return content
+
+        with response:
+            raw = response.read()
+            headers = response.headers
+        content = gzip.decompress(raw) \
+            if headers.get('Content-Encoding', '') == 'gzip' else raw
+        with self.lock:
+            self.num_bytes += len(raw)
+        if self.cache is not None:
+            self.cache.store(url, headers, body=content)
+        return content
+
+    def download(self, path: str, out_path: str,
+                 chunk_size: int = 1 << 16, compression: str = None,
+                 level: int = None, backend=None) -> int:
+        """
+        Stream a server path to a local file.
+
+        Parameters
+        ----------
+        path: str
+            The server path or full url
+        out_path: str
+            The local file, as named uncompressed
+        compression: str, Optional
+            'gzip' or 'zstd' to store the file compressed, with a suffix;
+            see storage.open_write.
+        level: int, Optional
+            The compression level
+        backend: FileStorage, Optional
+            The storage backend to write through, such as a ShardStorage
+            for documents under files/. Overrides compression and level.
+
+        Returns
+        -------
+        size: int
+            Bytes transferred, which is 0 if a cached copy at out_path was
+            still current.
+
+        Notes
+        -----
+        The file is written under a temporary name and renamed once
+        complete, so an interrupted download never looks finished.
+        """
+        url = self.url(path)
+        if backend is None:
+            backend = storage.FileStorage(compression, level)
+        entry = None
+        if self.cache is not None and backend.exists(out_path):
+            entry = self.cache.lookup(url)
+            # Other copies were written into place only once complete
+            stored = storage.find(out_path)
+            if entry is not None and stored is not None and \
+                    storage.compression_of(stored) is None and \
+                    entry.get('size', None) != os.path.getsize(stored):
+                entry = None
+
+        response = self._open(url, HTTPCache.validators(entry))
+        if response is None and not backend.exists(out_path):
+            # Evicted since it was looked up
+            response = self._open(url)
+        if response is None:
+            self.cache.record_hit(entry['size'])
+            return 0
+
+        raw_size = 0
+        size = 0
+        with response:
+            decoder = None
+            if response.headers.get('Content-Encoding', '') == 'gzip':
+                decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            with backend.open_write(out_path) as f:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    raw_size += len(chunk)
+                    if decoder is not None:
+                        chunk = decoder.decompress(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                if decoder is not None:
+                    chunk = decoder.flush()
+                    f.write(chunk)
+                    size += len(chunk)
+            headers = response.headers
+        with self.lock:
+            self.num_bytes += raw_size
+        if self.cache is not None:
+            self.cache.store(url, headers, size=size)
+        return raw_size
+
+    def list_filings(self, tikr: str, filing_type: str,
+                     start_date: str = None, end_date: str = None,
+                     max_num_filings: int = None,
+                     batch_size: int = 100) -> List[dict]:
+        """
+        List the filings of one form type made by a company.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier to query
+        filing_type: str
+            The exact form type to list, e.g. '10-Q'
+        start_date: str, Optional
+            The earliest date to look for filings, as YYYYMMDD
+        end_date: str, Optional
+            The latest filing date retrievable, as YYYYMMDD
+        max_num_filings: int, Optional
+            The maximum number of filings to list.
+
+        Returns
+        -------
+        filings: list[dict]
+            One dict per filing with 'accession', 'date', 'type' and 'url'
+            (the full submission .txt dump) entries, newest first.
+        """
+        params = {'action': 'getcompany', 'CIK': tikr, 'type': filing_type,
+                  'owner': 'include', 'output': 'xml', 'count': batch_size}
+        if start_date is not None:
+            params['datea'] = str(start_date).replace('-', '')
+        if end_date is not None:
+            params['dateb'] = str(end_date).replace('-', '')
+
+        out = []
+        start = 0
+        while max_num_filings is None or len(out) < max_num_filings:
+            params['start'] = start
+            page = self.get('/cgi-bin/browse-edgar', params).decode(
+                'utf-8', errors='replace')
+            entries = re.findall(r'<filing>(.*?)</filing>', page, re.S)
+            for entry in entries:
+                fields = dict(re.findall(r'<(\w+)>\s*([^<]*?)\s*</\1>', entry))
+                if fields.get('type', None) != filing_type:
+                    continue
+                link = fields['filingHREF']
+                url = link[:link.rfind('-')].strip() + '.txt'
+                out.append({'accession': url.split('/')[-1][:-len('.txt')],
+                            'date': fields.get('dateFiled', ''),
+                            'type': fields['type'],
+                            'url': url})
+            if len(entries) < batch_size:
+                break
+            start += batch_size
+
+        if max_num_filings is not None:
+            out = out[:max_num_filings]
+        return out
+
+    def get_cik(self, tikr: str) -> int:
+        """
+        Look up the CIK of a company ticker.
+
+        Notes
+        -----
+        Answered from the ticker index, which is loaded from disk or
+        fetched on first use. A ticker missing from a saved index makes
+        the client refresh the index once, in case it was listed since.
+        Numeric identifiers are taken to be CIKs already.
+        """
+        tikr = str(tikr).strip()
+        if tikr.isdigit():
+            return int(tikr)
+        with self._ciks_lock:
+            if len(self.tickers) == 0 and not self.tickers.load():
+                self.tickers.update(self)
+                self._tickers_fetched = True
+            if tikr not in self.tickers and not self._tickers_fetched:
+                self.tickers.update(self)
+                self._tickers_fetched = True
+        return self.tickers.get_cik(tikr)
+
+    def list_filings_json(self, tikr: str, filing_type,
+                          start_date: str = None, end_date: str = None,
+                          max_num_filings: int = None) -> List[dict]:
+        """
+        List the filings of one or more form types using the submissions \
+        JSON API.
+
+        Parameters
+        ----------
+        tikr: str
+            a company ticker or CIK to query
+        filing_type: str or list[str]
+            The exact form types to list, e.g. '10-Q' or ['10-Q', '8-K']
+        start_date: str, Optional
+            The earliest date to look for filings, as YYYYMMDD
+        end_date: str, Optional
+            The latest filing date retrievable, as YYYYMMDD
+        max_num_filings: int, Optional
+            The maximum number of filings to list of each form type.
+
+        Returns
+        -------
+        filings: list[dict]
+            As list_filings, with an added 'primary_document' entry.
+
+        Notes
+        -----
+        A company's recent filings of every form type come from a single
+        submissions/CIK##########.json document. Older filings are split
+        into further pages, which are only fetched if their date range is
+        wanted and the listing is not yet full.
+        """
+        cik = self.get_cik(tikr)
+        filing_types = [filing_type] if isinstance(filing_type, str) \
+            else list(filing_type)
+        start_date = str(start_date).replace('-', '') \
+            if start_date is not None else None
+        end_date = str(end_date).replace('-', '') \
+            if end_date is not None else None
+        counts = {i: 0 for i in filing_types}
+
+        def is_full(form=None):
+            if max_num_filings is None:
+                return False
+            if form is not None:
+                return counts[form] >= max_num_filings
+            return all(i >= max_num_filings for i in counts.values())
+
+        def add_page(page):
+            columns = zip(page.get('accessionNumber', []),
+                          page.get('filingDate', []),
+                          page.get('form', []),
+                          page.get('primaryDocument', []))
+            for accession, date, form, primary in columns:
+                if form not in counts or is_full(form):
+                    continue
+                if start_date is not None and \
+                        date.replace('-', '') < start_date:
+                    continue
+                if end_date is not None and date.replace('-', '') > end_date:
+                    continue
+                counts[form] += 1
+                out.append({
+                    'accession': accession, 'date': date, 'type': form,
+                    'url': f'{EDGAR_BASE_URL}/Archives/edgar/data/{cik}/'
+                           f'{accession.replace("-", "")}/{accession}.txt',
+                    'primary_document': primary})
+
+        out = []
+        data = json.loads(self.get(
+            f'{EDGAR_DATA_URL}/submissions/CIK{cik:010d}.json'))
+        add_page(data['filings']['recent'])
+        for file in data['filings'].get('files', []):
+            if is_full():
+                break
+            if start_date is not None and \
+                    file['filingTo'].replace('-', '') < start_date:
+                continue
+            if end_date is not None and \
+                    file['filingFrom'].replace('-', '') > end_date:
+                continue
+            add_page(json.loads(self.get(
+                f'{EDGAR_DATA_URL}/submissions/{file["name"]}')))
+        out.sort(key=lambda x: x['date'], reverse=True)
+        return out
+
+    def list_current_filings(self, filing_type: str = '8-K',
+                             count: int = 100) -> List[dict]:
+        """
+        List the latest filings accepted by EDGAR across all companies.
+
+        Parameters
+        ----------
+        filing_type: str
+            The exact form type to list, e.g. '8-K'
+        count: int
+            The number of latest filings to read from the feed.
+
+        Returns
+        -------
+        filings: list[dict]
+            One dict per filing with 'accession', 'cik', 'type', 'url' and
+            'updated' (an ISO 8601 acceptance time) entries, newest first.
+
+        Notes
+        -----
+        Reads the atom feed of browse-edgar's getcurrent action, which EDGAR
+        updates as filings are accepted.
+        """
+        params = {'action': 'getcurrent', 'type': filing_type,
+                  'owner': 'include', 'count': count, 'output': 'atom'}
+        page = self.get('/cgi-bin/browse-edgar', params).decode(
+            'utf-8', errors='replace')
+
+        out = []
+        for entry in re.findall(r'<entry>(.*?)</entry>', page, re.S):
+            link = re.search(r'<link[^>]*href="([^"]+)"', entry)
+            form = re.search(r'<category[^>]*term="([^"]+)"', entry)
+            updated = re.search(r'<updated>\s*([^<]*?)\s*</updated>', entry)
+            if link is None or form is None or \
+                    form.group(1) != filing_type:
+                continue
+            link = link.group(1)
+            url = link[:link.rfind('-')].strip() + '.txt'
+            out.append({'accession': url.split('/')[-1][:-len('.txt')],
+                        'cik': int(url.split('/')[-3]),
+                        'type': form.group(1),
+                        'url': url,
+                        'updated': updated.group(1) if updated else ''})
+        return out
@@ -11,6 +11,8 @@ from html.parser import HTMLParser
 
 from .metadata_manager import metadata_manager
 from .document import DocumentType
+from .journal import Journal
+from . import storage
 
 
 class Parser:
@@ -125,6 +127,8 @@ class Parser:
             self.metadata = metadata_manager(data_dir=self.data_dir)
         else:
             self.metadata = metadata
+        self.journal = Journal(os.path.join(
+            self.data_dir, DocumentType.JOURNAL_DIR_NAME))
 
         self._annotation_preparation()
 
@@ -163,21 +167,24 @@ class Parser:
             pattern -- a list of two strings, corresponding to start
                             and end of an element, ex. '['<span', '</span>']'.
                                 The tags to be find and extract
-            txt -- the string that containing some html code
+            txt -- the string that containing some html code, or its
+                        bytes, e.g. the buffer of a storage.Document
 
             Returns
             --------
             A list of set of two numbers, representing
                 the beginning and end position of an element.
         """
-        starts = list(re.finditer(pattern[0], txt))
-        ends = list(re.finditer(pattern[1], txt))
+        if not isinstance(txt, str):
+            pattern = [i.encode('utf-8') for i in pattern]
+        starts = list(re.finditer(pattern[0], txt, flags=re.I))
+        ends = list(re.finditer(pattern[1], txt, flags=re.I))
         tag_finds = sorted(starts + ends, key=lambda x: x.span()[0])
 
         result = []
         unmatched_start = []
         for mo in tag_finds:
-            if mo.group()[1] != '/':  # begin
+            if mo.group()[1:2] not in ('/', b'/'):  # begin
                 unmatched_start += [mo]
             else:
                 result += [(unmatched_start[-1], mo)]
@@ -226,8 +233,7 @@ class Parser:
             save -- save htm copy (with/without highlighting) to out_path
         """
 
-        with open(driver_path, encoding='utf-8') as file:
-            f = file.read()
+        f = self.metadata.get_storage().read_text(driver_path)
         found_range = []
         found_range += self.find_all_pattern(self.unannot_search_pattern[0], f)
         found = []
@@ -261,24 +267,39 @@ class Parser:
                 fname)).absolute()
 
     def _parse_annotated_text(
-            self, driver_path: str, **kwargs):
+            self, driver_path: str, text: str = None,
+            document: storage.Document = None, **kwargs):
         """
         Parses some documents 2020+ at least
 
             driver_path -- path of file to open as a file path format
+            text -- contents of the file, if already loaded
+            document -- the file opened as a storage.Document, if already
+                            open; it is left open
             highlight -- add red box around detected fields
             save -- save htm copy (with/without highlighting) to out_path
+
+        Tags are found in the document's bytes, and only the spans found
+        are decoded, so ranges are byte offsets.
         """
 
-        with open(driver_path, encoding='utf-8') as file:
-            f = file.read()
+        if document is None:
+            if text is not None:
+                document = storage.Document(text.encode('utf-8'))
+            else:
+                document = self.metadata.get_storage().open_document(
+                    driver_path)
+            with document:
+                return self._parse_annotated_text(driver_path,
+                                                  document=document)
+        f = document
         found_range = []
-        found_range += self.find_all_pattern(self.span_search_key, f)
+        found_range += self.find_all_pattern(self.span_search_key, f.buffer)
         found = []
         annotation_dict = dict()
         for pair in found_range:
             elem_parser = self.Span_Parser()
-            elem_parser.feed(f[pair[0]:pair[1]])
+            elem_parser.feed(f.text(pair[0], pair[1]))
             root, annotation_found = elem_parser.wrapper()
             root_element = self.Element(root + (pair,))
             found += [root_element]
@@ -293,7 +314,7 @@ class Parser:
         for i in found:
             annotation_dict2[i] = annotation_dict[i]
 
-        table_range = self.find_all_pattern(self.table_search_key, f)
+        table_range = self.find_all_pattern(self.table_search_key, f.buffer)
         in_table = self.labels_in_table([i.range for i in found], table_range)
         return found, annotation_dict, in_table
 
@@ -384,7 +405,7 @@ class Parser:
         if is_annotated is not None:
             return is_annotated
         else:
-            return self.metadata._gen_submission_metadata(
+            return self.metadata._gen_submission_attrs(
                 tikr, submission, silent=silent)
 
     # -----------get attribute-----------------------------------------------#
@@ -579,6 +600,7 @@ class Parser:
         one is generated for each iXBRL annotation on that text field.
         """
         out = None
+        tikr = self.metadata.canonical(tikr)
         document_type = self.metadata.get_doctype(tikr, submission, filename)
         f_anno_file = pathlib.Path(
             os.path.join(
@@ -589,9 +611,11 @@ class Parser:
                 submission,
                 filename)).absolute()
 
-        # Try to load from cache
+        # Try to load from cache, unless evicted by the disk quota
         if not force and self.metadata.file_was_processed(
-                tikr, submission, filename):
+                tikr, submission, filename) and \
+                self.metadata.get_storage().exists(self._processed_path(
+                    tikr, submission, filename, document_type)):
             out = self.load_processed(tikr, submission,
                                       filename, document_type=document_type)
         # Regenerate data
@@ -603,22 +627,31 @@ class Parser:
             # TODO make process_file detect and work on unannotated files
             if not self._contains_annotations(tikr, submission, silent=silent):
                 raise NotImplementedError('Not annotated')
-            if not (os.path.exists(f_anno_file)):
+            # Mapped from files/ or the raw dump, or derived again if
+            #   evicted
+            try:
+                document = self.metadata.open_document(
+                    tikr, submission, filename, document_type=document_type)
+            except FileNotFoundError:
                 warnings.warn('File not loaded locally', RuntimeWarning)
                 return
-            elems, annotation_dict, in_table = self._parse_annotated_text(
-                f_anno_file)
+            with document:
+                elems, annotation_dict, in_table = \
+                    self._parse_annotated_text(f_anno_file,
+                                               document=document)
             features = self.get_annotation_features(
                 elems, annotation_dict, in_table)
             self.save_processed(tikr, submission, filename,
                                 document_type, features)
             self.metadata.save_tikr_metadata(tikr)
+            if filename == self.metadata.get_primary_doc_name(
+                    tikr, submission):
+                self.journal.record(tikr, submission, 'featurized')
             out = features
 
         if remove_raw:
             # Try remove the file
-            if os.path.exists(f_anno_file):
-                os.remove(f_anno_file)
+            self.metadata.get_storage().remove(f_anno_file)
 
             # Try remove documentType/submission/file
             parent_dir = pathlib.Path(
@@ -662,17 +695,17 @@ class Parser:
             filename: str,
             document_type,
             features):
-        path = os.path.join(self.data_dir, DocumentType.PARSED_FILE_DIR_NAME,
-                            tikr, f'{submission}',
-                            f'{document_type}', filename)
-        if not os.path.exists(path):
-            os.system(f'mkdir -p {path}')
-        with open(os.path.join(path, 'features.pkl'), 'wb') as f:
+        with self.metadata.get_storage().open_write(self._processed_path(
+                tikr, submission, filename, document_type)) as f:
             pkl.dump(features, f)
         self.metadata.file_set_processed(tikr, submission, filename, True)
 
     def load_processed(self, tikr, submission, filename, document_type):
-        path = os.path.join(self.data_dir, DocumentType.PARSED_FILE_DIR_NAME,
-                            tikr, submission, f'{document_type}', filename)
-        with open(os.path.join(path, 'features.pkl'), 'rb') as f:
+        with self.metadata.get_storage().open_read(self._processed_path(
+                tikr, submission, filename, document_type)) as f:
             return pkl.load(f)
+
+    def _processed_path(self, tikr, submission, filename, document_type):
+        return os.path.join(self.data_dir, DocumentType.PARSED_FILE_DIR_NAME,
+                            tikr, f'{submission}', f'{document_type}',
+                            filename, 'features.pkl')
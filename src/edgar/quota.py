@@ -0,0 +1,439 @@
+"""Keep a data directory within a disk budget by evicting what is unused."""
+import os
+import json
+import time
+import threading
+from typing import List
+
+from .document import DocumentType
+from .journal import Journal
+from . import storage
+
+
+def artifact_of(root: str, path: str) -> str:
+    """
+    Return the artifact a logical path under a data directory belongs to,
+    or None.
+    """
+    rel = os.path.relpath(os.path.abspath(os.fspath(path)), root)
+    parts = storage.strip_suffix(rel).split(os.sep)
+    # .rawcache/<tikr>/<type>/<submission>.txt,
+    #   files/<tikr>/<type>/<submission>/... and
+    #   parsed/<tikr>/<submission>/...
+    if parts[0] in (DocumentType.RAW_FILE_DIR_NAME,
+                    DocumentType.EXTRACTED_FILE_DIR_NAME) and \
+            len(parts) >= 4:
+        return '/'.join(parts[:4])
+    if parts[0] == DocumentType.PARSED_FILE_DIR_NAME and len(parts) >= 3:
+        return '/'.join(parts[:3])
+    return None
+
+
+def _size(path: str) -> tuple:
+    """Return the total size and latest mtime of a file or directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path), os.path.getmtime(path)
+    size, mtime = 0, os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for file in files:
+            stat = os.stat(os.path.join(root, file))
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+def scan_artifacts(root: str) -> dict:
+    """
+    Return the stored size and last modification time of every artifact
+    stored as files under a root, as {artifact: [size, mtime]}.
+    """
+    out = dict()
+    # The depth below the root at which artifacts are stored
+    for area, depth in ((DocumentType.RAW_FILE_DIR_NAME, 4),
+                        (DocumentType.EXTRACTED_FILE_DIR_NAME, 4),
+                        (DocumentType.PARSED_FILE_DIR_NAME, 3)):
+        level = [os.path.join(root, area)]
+        for _ in range(depth - 1):
+            level = [os.path.join(i, j) for i in level
+                     if os.path.isdir(i) for j in sorted(os.listdir(i))]
+        for path in level:
+            if path.endswith('.part'):
+                continue
+            size, mtime = _size(path)
+            entry = out.setdefault(artifact_of(root, path), [0, 0])
+            entry[0] += size
+            entry[1] = max(entry[1], mtime)
+    out.pop(None, None)
+    return out
+
+
+class AccessLog:
+    """
+    When each raw dump, extracted submission and feature set was last \
+    read or written.
+
+    Notes
+    -----
+    An artifact is one raw dump in the raw cache, the extracted documents
+    of one submission under files/, or the features of one submission
+    under parsed/. Accesses are appended to '.metadata/.access.jsonl', at
+    most once a minute per artifact and process, and artifacts never
+    recorded count as used when they were last modified. Forgotten
+    artifacts are appended too, and the log is read incrementally, so it
+    is only rewritten once it has grown well past what it tracks.
+    """
+
+    # Seconds within which repeated accesses of an artifact are recorded once
+    RESOLUTION = 60
+    # Bytes the log grows to before forget compacts it, at the least
+    COMPACT_BYTES = 1 << 20
+
+    def __init__(self, data_dir: str):
+        """
+        Open the access log of a data directory.
+
+        Parameters
+        ----------
+        data_dir: str
+            The data directory whose artifacts are tracked
+        """
+        self.data_dir = os.path.abspath(data_dir)
+        self.log_path = os.path.join(self.data_dir,
+                                     DocumentType.META_FILE_DIR_NAME,
+                                     '.access.jsonl')
+        self.lock = threading.Lock()
+        self._recorded = dict()
+        # Accesses read so far, up to an offset into the log file whose
+        #   (device, inode) is the generation
+        self._access = dict()
+        self._offset = 0
+        self._generation = None
+        self._compacted = 0
+
+    def artifact_of(self, path: str) -> str:
+        """Return the artifact a logical path belongs to, or None."""
+        return artifact_of(self.data_dir, path)
+
+    def touch(self, path: str):
+        """Record that a logical path was read or written now."""
+        artifact = self.artifact_of(path)
+        if artifact is None:
+            return
+        now = time.time()
+        with self.lock:
+            if now - self._recorded.get(artifact, 0) < self.RESOLUTION:
+                return
+            self._recorded[artifact] = now
+        self._append([[artifact, now]])
+
+    def _append(self, records: list):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        data = ''.join(json.dumps(i) + '\n' for i in records)
+        with open(self.log_path, 'ab+') as f:
+            # Start afresh after a line torn by a crash
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    data = '\n' + data
+            f.write(data.encode('utf-8'))
+
+    def load(self) -> dict:
+        """Return the last recorded access time of each artifact."""
+        with self.lock:
+            try:
+                f = open(self.log_path, 'rb')
+            except FileNotFoundError:
+                self._access, self._offset = dict(), 0
+                self._generation = None
+                return dict()
+            with f:
+                stat = os.fstat(f.fileno())
+                # Compacted since it was last read
+                if (stat.st_dev, stat.st_ino) != self._generation or \
+                        stat.st_size < self._offset:
+                    self._access, self._offset = dict(), 0
+                    self._generation = (stat.st_dev, stat.st_ino)
+                f.seek(self._offset)
+                data = f.read()
+            # A line still being written is read next time
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                try:
+                    artifact, when = json.loads(line)
+                except ValueError:
+                    continue
+                if when is None:
+                    self._access.pop(artifact, None)
+                else:
+                    self._access[artifact] = max(
+                        when, self._access.get(artifact, 0))
+            self._offset += end
+            return dict(self._access)
+
+    def last_used(self, artifacts: dict, access: dict = None) -> dict:
+        """Return when each of the artifacts, as scan_artifacts lists \
+        them, was last read or written."""
+        if access is None:
+            access = self.load()
+        return {i: max(access.get(i, 0), artifacts[i][1])
+                for i in artifacts}
+
+    def forget(self, artifacts):
+        """
+        Drop the recorded accesses of artifacts, e.g. once evicted.
+
+        Notes
+        -----
+        Appended to the log as accesses with no time. The log is compacted
+        once it is over COMPACT_BYTES and twice its size after the last
+        compaction.
+        """
+        artifacts = sorted(set(artifacts))
+        if not artifacts:
+            return
+        with self.lock:
+            for i in artifacts:
+                self._recorded.pop(i, None)
+        self._append([[i, None] for i in artifacts])
+        if os.path.getsize(self.log_path) > \
+                max(self.COMPACT_BYTES, 2 * self._compacted):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with the last access of each artifact alone."""
+        access = self.load()
+        with self.lock:
+            with open(f'{self.log_path}.part', 'w') as f:
+                f.write(''.join(f'{json.dumps([i, when])}\n'
+                                for i, when in access.items()))
+            os.replace(f'{self.log_path}.part', self.log_path)
+            stat = os.stat(self.log_path)
+            self._access = access
+            self._offset = self._compacted = stat.st_size
+            self._generation = (stat.st_dev, stat.st_ino)
+
+
+class DiskQuota:
+    """
+    Evict the least recently used artifacts of a data directory once it \
+    is over budget.
+
+    Notes
+    -----
+    Artifacts and their last use are tracked by an AccessLog. Only
+    artifacts that can be derived again are evicted: a raw dump must have
+    been split, and a submission keeps its extracted documents, its raw
+    dump or a journaled url to fetch them from. See
+    metadata_manager.restore_document, which derives documents again on
+    request. Features are recomputed by Parser.featurize_file.
+
+    With colder tiers, see Tiers, artifacts are demoted to the next tier
+    instead of evicted, and the quota bounds the data directory alone.
+
+    Usage is measured in full once, then kept up to date by measuring
+    again only the artifacts the AccessLog saw written or read since, and
+    subtracting those evicted. It is measured in full again every RESCAN
+    seconds, for changes made around the log.
+    """
+
+    # Seconds after which usage is measured afresh
+    RESCAN = 3600
+
+    def __init__(self, data_dir: str, max_bytes: int,
+                 log: AccessLog = None, tiers=None):
+        """
+        Create a disk quota.
+
+        Parameters
+        ----------
+        data_dir: str
+            The data directory to keep within budget
+        max_bytes: int
+            The budget for the raw cache, files/ and parsed/ together
+        log: AccessLog, Optional
+            Where accesses are recorded. Defaults to the data directory's.
+        tiers: Tiers, Optional
+            Colder roots to demote artifacts to rather than evict them
+        """
+        self.data_dir = os.path.abspath(data_dir)
+        self.max_bytes = max_bytes
+        self.log = log if log is not None else AccessLog(data_dir)
+        self.tiers = tiers
+        # {artifact: [size, mtime]} and their total, as of measured
+        self._artifacts = None
+        self._used = 0
+        self._measured = 0
+
+    def artifacts(self, backend: storage.FileStorage = None) -> dict:
+        """
+        Return the stored size and last modification time of every \
+        artifact, as {artifact: [size, mtime]}.
+
+        Parameters
+        ----------
+        backend: FileStorage, Optional
+            The storage backend, whose shards are counted if it is a
+            ShardStorage.
+        """
+        from .shards import ShardStorage
+        out = scan_artifacts(self.data_dir)
+        if isinstance(backend, ShardStorage):
+            for path, size, mtime in backend.records():
+                entry = out.setdefault(
+                    artifact_of(self.data_dir, path), [0, 0])
+                entry[0] += size
+                entry[1] = max(entry[1], mtime)
+            out.pop(None, None)
+        return out
+
+    def usage(self, backend: storage.FileStorage = None) -> int:
+        """Return the bytes used by every artifact."""
+        return sum(i[0] for i in self.artifacts(backend).values())
+
+    def measure(self, artifact: str,
+                backend: storage.FileStorage = None) -> list:
+        """
+        Return the stored [size, mtime] of one artifact, or None if it is
+        not stored in the data directory.
+        """
+        from .shards import ShardStorage
+        path = os.path.join(self.data_dir, *artifact.split('/'))
+        entry = None
+        for stored in [path] + [path + i for i in storage.SUFFIXES.values()]:
+            if os.path.exists(stored):
+                size, mtime = _size(stored)
+                entry = entry or [0, 0]
+                entry[0] += size
+                entry[1] = max(entry[1], mtime)
+        if isinstance(backend, ShardStorage):
+            for path, size, mtime in backend.records(artifact.split('/')[1]):
+                if artifact_of(self.data_dir, path) == artifact:
+                    entry = entry or [0, 0]
+                    entry[0] += size
+                    entry[1] = max(entry[1], mtime)
+        return entry
+
+    def _set(self, artifact: str, entry: list):
+        """Replace the size of an artifact in the usage, None to drop."""
+        old = self._artifacts.pop(artifact, None)
+        if old is not None:
+            self._used -= old[0]
+        if entry is not None:
+            self._artifacts[artifact] = entry
+            self._used += entry[0]
+
+    def _update(self, backend: storage.FileStorage):
+        """Bring the size of each artifact up to date."""
+        now = time.time()
+        if self._artifacts is None or now - self._measured > self.RESCAN:
+            self._artifacts = self.artifacts(backend)
+            self._used = sum(i[0] for i in self._artifacts.values())
+        else:
+            # Writes after the last measure are logged after it, or
+            #   within a RESOLUTION of an access logged before it
+            since = self._measured - self.log.RESOLUTION
+            for artifact, when in self.log.load().items():
+                if when >= since:
+                    self._set(artifact, self.measure(artifact, backend))
+        self._measured = now
+
+    def _evictable(self, artifact: str, present: set,
+                   journal: Journal) -> bool:
+        """
+        Return True if an artifact can be derived again once evicted.
+
+        Notes
+        -----
+        A submission must keep a way back to its documents: they stay
+        extracted, or their raw dump is kept, or its url was journaled.
+        """
+        parts = artifact.split('/')
+        if parts[0] == DocumentType.PARSED_FILE_DIR_NAME:
+            return True
+        if parts[0] == DocumentType.RAW_FILE_DIR_NAME:
+            accession = parts[3][:-len('.txt')]
+            other = '/'.join([DocumentType.EXTRACTED_FILE_DIR_NAME,
+                              *parts[1:3], accession])
+            if not journal.has_reached(parts[1], accession, 'split'):
+                return False
+        else:
+            accession = parts[3]
+            other = '/'.join([DocumentType.RAW_FILE_DIR_NAME, *parts[1:3],
+                              f'{accession}.txt'])
+        return other in present or \
+            journal.get_filing(parts[1], accession) is not None
+
+    def evict(self, artifact: str, backend: storage.FileStorage):
+        """Remove an artifact from disk, and empty folders above it."""
+        path = os.path.join(self.data_dir, *artifact.split('/'))
+        if artifact.startswith(DocumentType.RAW_FILE_DIR_NAME):
+            storage.remove(path)
+        else:
+            backend.remove_dir(path)
+        remove_empty_parents(self.data_dir, artifact)
+
+    def enforce(self, backend: storage.FileStorage) -> List[str]:
+        """
+        Evict least recently used artifacts until usage is within budget.
+
+        Parameters
+        ----------
+        backend: FileStorage
+            The storage backend documents and features are stored through
+
+        Returns
+        -------
+        evicted: list[str]
+            The artifacts evicted or demoted, oldest first, e.g.
+            'files/aapl/10-Q/0000320193-20-000052'.
+        """
+        if self.max_bytes is None:
+            return []
+        self._update(backend)
+        if self._used <= self.max_bytes:
+            return []
+
+        artifacts = dict(self._artifacts)
+        last_used = self.log.last_used(artifacts)
+        journal = Journal(os.path.join(self.data_dir,
+                                       DocumentType.JOURNAL_DIR_NAME))
+        evicted = []
+        present = set(artifacts)
+        for artifact in sorted(artifacts, key=last_used.get):
+            if self._used <= self.max_bytes:
+                break
+            # Moved or removed meanwhile by another process
+            self._set(artifact, self.measure(artifact, backend))
+            if artifact not in self._artifacts:
+                present.discard(artifact)
+                continue
+            # Shard records have no files of their own to demote
+            if self.tiers is not None and self.tiers.holds(artifact, 0):
+                self.tiers.move(artifact, 0, 1)
+            elif self._evictable(artifact, present, journal):
+                self.evict(artifact, backend)
+            else:
+                continue
+            self._set(artifact, None)
+            evicted.append(artifact)
+            present.discard(artifact)
+
+        # Evicted records only give their space back once shards are
+        #   rewritten without them
+        from .shards import ShardStorage
+        if isinstance(backend, ShardStorage):
+            for tikr in sorted({i.split('/')[1] for i in evicted}):
+                backend.compact(tikr)
+
+        self.log.forget(evicted)
+        return evicted
+
+
+def remove_empty_parents(root: str, artifact: str):
+    """Remove the folders left empty above an artifact moved off a root."""
+    area = os.path.join(root, artifact.split('/')[0])
+    parent = os.path.dirname(os.path.join(root, *artifact.split('/')))
+    while parent != area and os.path.isdir(parent) and \
+            not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
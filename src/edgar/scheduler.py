@@ -0,0 +1,439 @@
+"""Concurrent download of filings for many companies at once."""
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List
+
+from tqdm.auto import tqdm
+
+from .document import DocumentType
+from .journal import Checkpointer
+from .submission import TypeFilter, parse_index_headers
+from . import storage
+from .network import EDGARClient, TokenBucket, EDGAR_BASE_URL, \
+    SEC_MAX_REQUESTS_PER_SECOND
+
+
+class TickerProgress:
+    """Download progress of the filings under one company."""
+
+    def __init__(self, tikr: str):
+        """Start tracking a company."""
+        self.tikr = tikr
+        self.total = None
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.fetched = []
+        self.fetched_types = dict()
+        self.document_types = []
+        self.counts = dict()
+        self.failed_types = set()
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def remaining(self) -> int:
+        """Filings not yet downloaded, or None if not yet listed."""
+        if self.total is None:
+            return None
+        return self.total - self.done - self.skipped - self.failed
+
+    @property
+    def is_finished(self) -> bool:
+        """Return True once every listed filing has been handled."""
+        return self.remaining == 0
+
+    def eta(self, now: float = None) -> float:
+        """
+        Estimate seconds until this company finishes downloading.
+
+        Returns
+        -------
+        eta: float or None
+            None until at least one filing has been downloaded.
+        """
+        if self.is_finished:
+            return 0.0
+        if self.remaining is None or self.done == 0:
+            return None
+        now = time.monotonic() if now is None else now
+        rate = self.done / max(now - self.started, 1e-9)
+        return self.remaining / rate
+
+    def __repr__(self):
+        """Represent progress as a single status line."""
+        total = '?' if self.total is None else self.total
+        eta = self.eta()
+        eta = '?' if eta is None else f'{eta:.0f}s'
+        return (f'{self.tikr}: {self.done + self.skipped}/{total} filings, '
+                f'{self.failed} failed, {self.bytes / 1e6:.1f}MB, eta {eta}')
+
+
+class DownloadScheduler:
+    """
+    Download filings for many companies concurrently under a shared \
+    request-rate limit.
+
+    Notes
+    -----
+    Listing a company and downloading each of its filings are separate
+    tasks in one worker pool, so the filings of a large filer are fetched
+    in parallel with those of other companies. Every request waits on the
+    same TokenBucket, which keeps the process within the SEC's fair access
+    limit regardless of the number of workers.
+
+    Metadata is only updated from the calling thread, once a company has
+    finished downloading.
+    """
+
+    def __init__(self, downloader, workers: int = 8,
+                 rate: float = SEC_MAX_REQUESTS_PER_SECOND,
+                 base_url: str = EDGAR_BASE_URL,
+                 client: EDGARClient = None,
+                 callback: Callable[[TickerProgress], None] = None,
+                 loading_bar: bool = True, listing: str = 'json',
+                 documents: str = 'full', include_types: List[str] = None,
+                 exclude_types: List[str] = None):
+        """
+        Create a scheduler.
+
+        Parameters
+        ----------
+        downloader: Downloader
+            Provides the data directory, metadata and API header.
+        workers: int
+            Number of requests allowed in flight at once.
+        rate: float
+            Maximum requests per second across all workers.
+        base_url: str
+            Server to query. Point this at a LocalEDGARServer for testing.
+        client: EDGARClient, Optional
+            Use an existing client instead of creating one.
+        callback: Callable[[TickerProgress], None], Optional
+            Called with a company's progress after each of its filings.
+        loading_bar: bool
+            if True, will show a tqdm bar with overall progress and eta.
+        listing: str
+            How filings are listed: 'json' reads each company's filing
+            list from the submissions JSON API in one request, 'browse'
+            pages through the browse-edgar company listing.
+        documents: str
+            'full' downloads each full submission .txt dump to the raw
+            cache. 'primary' reads the filing's -index-headers.html and
+            fetches only the primary document, and any exhibits matching
+            include_types, directly into files/ with their metadata.
+        include_types: list[str], Optional
+            Patterns on the <TYPE> of exhibits to fetch in 'primary' mode.
+        exclude_types: list[str], Optional
+            Patterns on the <TYPE> of exhibits to skip in 'primary' mode.
+        """
+        assert listing in ('json', 'browse'), 'Unknown listing method'
+        assert documents in ('full', 'primary'), 'Unknown documents mode'
+        self.downloader = downloader
+        self.metadata = downloader.metadata
+        self.workers = workers
+        if client is None:
+            client = downloader.get_client(
+                base_url=base_url, rate_limiter=TokenBucket(rate))
+        self.client = client
+        self.callback = callback
+        self.loading_bar = loading_bar
+        self.listing = listing
+        self.documents = documents
+        self.type_filter = TypeFilter(include_types, exclude_types)
+
+        self.journal = downloader.journal
+        self.checkpoint = Checkpointer(self.metadata, self.journal)
+        # Files are written compressed as the data directory is set up to
+        self.compression, self.level = self.metadata.get_compression()
+
+        self.progress = dict()
+        self.refreshed = set()
+        self.started = None
+
+    def eta(self) -> float:
+        """Estimate seconds until all listed companies are downloaded."""
+        done = sum(i.done for i in self.progress.values())
+        remaining = sum(i.remaining or 0 for i in self.progress.values())
+        if remaining == 0:
+            return 0.0
+        if done == 0 or self.started is None:
+            return None
+        rate = done / max(time.monotonic() - self.started, 1e-9)
+        return remaining / rate
+
+    def report(self) -> str:
+        """Return one progress line per company."""
+        return '\n'.join(repr(i) for i in self.progress.values())
+
+    def _raw_path(self, tikr, document_type, accession):
+        return os.path.join(self.downloader.raw_dir, f'{tikr}',
+                            f'{document_type}', f'{accession}.txt')
+
+    def _query(self, start_date=None, **kwargs) -> dict:
+        """The listing arguments a journaled listing must match."""
+        return {'listing': self.listing, 'start_date': start_date,
+                'end_date': kwargs.get('end_date', None),
+                'max_num_filings': kwargs.get('max_num_filings', None)}
+
+    def _list(self, tikr, document_types, journaled=(), start_date=None,
+              **kwargs):
+        out = list(journaled)
+        filing_types = [i.dtype for i in document_types]
+        if not filing_types:
+            return out
+        kwargs = dict(start_date=start_date,
+                      end_date=kwargs.get('end_date', None),
+                      max_num_filings=kwargs.get('max_num_filings', None))
+        if self.listing == 'json':
+            # Every form type comes from the same submissions document
+            return out + self.client.list_filings_json(
+                tikr, filing_types, **kwargs)
+        for filing_type in filing_types:
+            out += self.client.list_filings(tikr, filing_type, **kwargs)
+        return out
+
+    def _fetch(self, tikr, document_type, filing, path):
+        if self.documents == 'primary':
+            return self._fetch_primary(tikr, document_type, filing)
+        size = self.client.download(
+            filing['url'], path, compression=self.compression,
+            level=self.level)
+        self.metadata.touch(path)
+        return size
+
+    def _fetch_primary(self, tikr, document_type, filing):
+        """
+        Fetch the selected documents of one filing into files/.
+
+        Notes
+        -----
+        Runs on a worker thread, so the parsed headers are left on the
+        filing for the calling thread to record in metadata.
+        """
+        folder = filing['url'][:filing['url'].rfind('/')]
+        accession = filing['accession']
+        kind, header, documents = parse_index_headers(
+            self.client.get(f'{folder}/{accession}-index-headers.html'))
+
+        out_dir = os.path.join(
+            self.downloader.data_dir, DocumentType.EXTRACTED_FILE_DIR_NAME,
+            f'{tikr}', f'{document_type}', accession)
+        size = 0
+        extracted = []
+        for doc in documents if kind == 'SEC-DOCUMENT' else []:
+            # Only html documents are unpacked, as in unpack_file
+            if '.htm' not in doc.filename:
+                continue
+            if not DocumentType.is_valid_type(doc.type) and not (
+                    self.type_filter.is_restrictive and
+                    self.type_filter(doc.type)):
+                continue
+            size += self.client.download(
+                f'{folder}/{doc.filename}',
+                os.path.join(out_dir, doc.filename),
+                backend=self.metadata.get_storage())
+            extracted.append(doc.filename)
+        filing['documents'] = (kind, header, documents, extracted)
+        return size
+
+    def _finish(self, tikr, is_filtered):
+        progress = self.progress[tikr]
+        progress.finished = time.monotonic()
+        if self.documents == 'primary':
+            self.checkpoint.flush()
+            self.metadata.save_tikr_metadata(tikr)
+        for document_type in progress.document_types:
+            count = progress.counts.get(document_type.dtype, 0)
+            if document_type.dtype in progress.failed_types:
+                continue
+            if count == 0 and tikr in self.refreshed:
+                # Nothing new since the last refresh
+                continue
+            if count == 0:
+                self.metadata.set_downloaded(
+                    tikr, True, document_type=document_type)
+                self.metadata.set_unpacked(
+                    tikr, document_type=document_type, value=True)
+                warnings.warn(f'No {document_type} Filings Under {tikr}',
+                              RuntimeWarning)
+            elif not is_filtered:
+                self.metadata.set_downloaded(
+                    tikr, True, document_type=document_type)
+                if self.documents == 'primary':
+                    self.metadata.set_unpacked(
+                        tikr, document_type=document_type, value=True)
+
+    def run(self, tikrs: List[str], document_type: str = '10-Q',
+            force: bool = False, refresh: bool = False,
+            **kwargs) -> Dict[str, TickerProgress]:
+        """
+        Download the filings of each company to the raw cache.
+
+        Parameters
+        ----------
+        tikrs: list[str]
+            The companies to download filings for
+        document_type: str, DocumentType or list
+            The type of filings to download: 10-Q, 8-K, a list of both, or
+            'all'. Every type is listed in one pass over each company.
+        force: bool
+            if (True), then ignore locally downloaded files and
+            overwrite them.
+        refresh: bool
+            if (True), only list filings made on or after the latest filing
+            date already in each company's metadata, even for companies
+            marked as downloaded. Known submissions are never refetched.
+        start_date: optional
+            The earliest date to look for filings
+        end_date: optional
+            The latest filing date retrievable
+        max_num_filings: optional
+            The maximum number of filings to retrieve per company.
+
+        Returns
+        -------
+        progress: dict[str, TickerProgress]
+            Final progress of each company.
+        """
+        if isinstance(document_type, (str, DocumentType)):
+            document_type = [document_type]
+        document_types = []
+        for target in document_type:
+            for dtype in self.metadata._document_types(target):
+                if dtype.dtype not in {'10-Q', '8-K'}:
+                    raise NotImplementedError(
+                        'Query does not support this doctype')
+                if dtype.dtype not in [i.dtype for i in document_types]:
+                    document_types.append(dtype)
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        # Share classes of one company are downloaded once, under one ticker
+        tikrs = self.downloader.resolve_tikrs(tikrs, client=self.client)
+        is_filtered = any(kwargs.get(i, None) is not None for i in
+                          ['start_date', 'end_date', 'max_num_filings'])
+
+        # Only the form types not yet downloaded are listed per company
+        pending_types = dict()
+        for tikr in tikrs:
+            pending_types[tikr] = [
+                i for i in document_types if force or refresh or
+                not self.metadata.is_downloaded(tikr, document_type=i)]
+        tikrs = [i for i in tikrs if pending_types[i]]
+
+        bar = None
+        if self.loading_bar:
+            bar = tqdm(total=0, desc='Downloading', leave=False)
+
+        self.started = time.monotonic()
+        listed_types, queries = dict(), dict()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = dict()
+            for tikr in tikrs:
+                self.progress[tikr] = TickerProgress(tikr)
+                self.progress[tikr].document_types = pending_types[tikr]
+                list_kwargs = dict(kwargs)
+                if refresh:
+                    latest = [self.metadata.get_latest_filing_date(
+                        tikr, document_type=i) for i in pending_types[tikr]]
+                    if None not in latest:
+                        list_kwargs['start_date'] = min(latest)
+                        self.refreshed.add(tikr)
+
+                # An interrupted run's listings are reused, not requested
+                queries[tikr] = self._query(**list_kwargs)
+                journaled, listed_types[tikr] = [], []
+                for dtype in pending_types[tikr]:
+                    listing = None if force or refresh else \
+                        self.journal.get_listing(tikr, dtype, queries[tikr])
+                    if listing is None:
+                        listed_types[tikr].append(dtype)
+                    else:
+                        journaled += listing
+                future = pool.submit(self._list, tikr, listed_types[tikr],
+                                     journaled, **list_kwargs)
+                pending[future] = (tikr, None)
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    tikr, filing = pending.pop(future)
+                    progress = self.progress[tikr]
+
+                    # Listing task, queue up each filing
+                    if filing is None:
+                        try:
+                            filings = future.result()
+                        except Exception as e:
+                            warnings.warn(f'Could not list filings under '
+                                          f'{tikr}: {e}', RuntimeWarning)
+                            filings = []
+                            progress.failed += 1
+                            progress.failed_types.update(
+                                i.dtype for i in progress.document_types)
+                        else:
+                            for dtype in listed_types[tikr]:
+                                self.journal.set_listed(
+                                    tikr, dtype, queries[tikr],
+                                    [i for i in filings
+                                     if i['type'] == dtype.dtype])
+                        progress.total = len(filings) + progress.failed
+                        known = set(self.metadata.get_submissions(tikr))
+                        for filing in filings:
+                            dtype = DocumentType(filing['type'])
+                            progress.counts[dtype.dtype] = \
+                                progress.counts.get(dtype.dtype, 0) + 1
+                            path = self._raw_path(
+                                tikr, dtype, filing['accession'])
+                            if not force and (
+                                    filing['accession'] in known or
+                                    storage.exists(path)):
+                                progress.skipped += 1
+                                continue
+                            pending[pool.submit(
+                                self._fetch, tikr, dtype, filing,
+                                path)] = (tikr, filing)
+                        if bar is not None:
+                            bar.total += len(filings)
+                            bar.update(progress.skipped)
+                    # Download task
+                    else:
+                        try:
+                            progress.bytes += future.result()
+                            progress.done += 1
+                            progress.fetched.append(filing['accession'])
+                            progress.fetched_types[filing['accession']] = \
+                                filing['type']
+                            self.journal.record(
+                                tikr, filing['accession'], 'fetched')
+                            if 'documents' in filing:
+                                self.downloader._record_submission(
+                                    tikr, filing['accession'],
+                                    *filing['documents'])
+                                self.checkpoint.add(
+                                    tikr, filing['accession'])
+                        except Exception as e:
+                            warnings.warn(f'Failed to download '
+                                          f'{filing["url"]}: {e}',
+                                          RuntimeWarning)
+                            progress.failed += 1
+                            progress.failed_types.add(filing['type'])
+                        if bar is not None:
+                            bar.update(1)
+
+                    if progress.is_finished:
+                        self._finish(tikr, is_filtered)
+                    if self.callback is not None:
+                        self.callback(progress)
+
+                if bar is not None:
+                    eta = self.eta()
+                    bar.set_postfix(
+                        eta='?' if eta is None else f'{eta:.0f}s')
+
+        if bar is not None:
+            bar.close()
+        return self.progress
@@ -0,0 +1,526 @@
+"""Pack documents and features into append-only shards per company."""
+import io
+import os
+import re
+import json
+import mmap
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Tuple
+
+from .document import DocumentType
+from .storage import FileStorage, Document, compress_bytes, \
+    decompress_bytes, locality
+
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where appenders lock the first byte of the data file instead
+    fcntl = None
+    import msvcrt
+
+
+# Accession numbers are '<filer CIK>-<two digit year>-<sequence>'
+_ACCESSION = re.compile(r'^\d{10}-(\d{2})-\d{6}$')
+
+
+def _lock(f: BinaryIO):
+    """Take an exclusive lock on an open file, shared by every process."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # Gave up after retrying for ten seconds; keep waiting
+            continue
+
+
+def _unlock(f: BinaryIO):
+    """Release a lock taken by _lock."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _open_read(path: str) -> int:
+    """Open a file descriptor to read a data file with _pread."""
+    return os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+
+
+def _pread(fd: int, length: int, offset: int) -> bytes:
+    """
+    Read `length` bytes at `offset` of a file descriptor.
+
+    Notes
+    -----
+    Without os.pread, as on Windows, this seeks, so callers must hold the
+    shard's lock.
+    """
+    if hasattr(os, 'pread'):
+        return os.pread(fd, length, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    out = []
+    while length > 0:
+        piece = os.read(fd, length)
+        if not piece:
+            break
+        out.append(piece)
+        length -= len(piece)
+    return b''.join(out)
+
+
+def period_of(submission: str) -> str:
+    """
+    Return the year a submission was filed in, from its accession number.
+
+    Notes
+    -----
+    Submissions not named by an accession number share the period 'other'.
+    """
+    match = _ACCESSION.match(submission)
+    if match is None:
+        return 'other'
+    year = int(match.group(1))
+    # EDGAR accession numbers start in 1993
+    return f'{1900 + year if year >= 93 else 2000 + year}'
+
+
+class Shard:
+    """
+    One append-only data file of records and its index.
+
+    Notes
+    -----
+    Each record is appended to '<name>.shard', then a JSON line
+    [key, offset, length, compression] is appended to '<name>.idx'. A
+    removed key is indexed with a null offset. Appends and compaction
+    from every thread and process hold an exclusive lock on '<name>.lock',
+    and the index is read incrementally, so records written by other
+    processes are found without reloading it. A compaction replaces both
+    files, which readers notice by the index file's identity, and they
+    then reopen the data file and reread the index under the lock. A
+    record whose index line was never written, or was torn by a crash, is
+    ignored.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a shard.
+
+        Parameters
+        ----------
+        path: str
+            The shard's path, without extension
+        """
+        self.data_path = f'{path}.shard'
+        self.index_path = f'{path}.idx'
+        self.lock_path = f'{path}.lock'
+        self.index = dict()
+        self.lock = threading.Lock()
+        self._consumed = 0
+        self._fd = None
+        # The (device, inode) of the index the entries were read from
+        self._generation = None
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock file shared by every process using the shard."""
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, 'ab') as f:
+            _lock(f)
+            try:
+                yield
+            finally:
+                _unlock(f)
+
+    def _open_generation(self):
+        """
+        Reopen the data file, and forget the index if the shard was \
+        compacted since it was read. Needs the lock file.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = _open_read(self.data_path)
+        stat = os.stat(self.index_path)
+        if (stat.st_dev, stat.st_ino) != self._generation:
+            self._generation = (stat.st_dev, stat.st_ino)
+            self.index = dict()
+            self._consumed = 0
+
+    def _read_index(self) -> bool:
+        """
+        Read index lines appended since the last read.
+
+        Returns
+        -------
+        bool
+            False if the index was replaced by a compaction meanwhile
+        """
+        with open(self.index_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_dev, stat.st_ino) != self._generation:
+                return False
+            f.seek(self._consumed)
+            data = f.read(max(stat.st_size - self._consumed, 0))
+        # A line still being written is read on a later refresh
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                key, offset, length, compression = json.loads(line)
+            except ValueError:
+                continue
+            if offset is None:
+                self.index.pop(key, None)
+            else:
+                self.index[key] = (offset, length, compression)
+        self._consumed += end
+        return True
+
+    def _refresh(self):
+        """
+        Catch up with records appended since the last refresh.
+
+        Notes
+        -----
+        A shard compacted by another process is reopened under the lock
+        file, so its data file and index always belong to one compaction.
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return
+        current = (stat.st_dev, stat.st_ino) == self._generation
+        if current and self._fd is not None:
+            if stat.st_size <= self._consumed or self._read_index():
+                return
+        with self._locked():
+            self._open_generation()
+            self._read_index()
+
+    def _append(self, key: str, payload: bytes, compression: str):
+        """Append a record, or a removal if payload is None."""
+        with self.lock:
+            with self._locked(), open(self.data_path, 'ab') as f:
+                offset = length = None
+                if payload is not None:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(payload)
+                    f.flush()
+                    length = len(payload)
+                line = json.dumps([key, offset, length, compression])
+                with open(self.index_path, 'ab+') as idx:
+                    # Start afresh after a line torn by a crash
+                    if idx.seek(0, os.SEEK_END) > 0:
+                        idx.seek(-1, os.SEEK_END)
+                        if idx.read(1) != b'\n':
+                            line = '\n' + line
+                    idx.write(f'{line}\n'.encode())
+            self._refresh()
+
+    def has(self, key: str) -> bool:
+        """Return True if a key is stored."""
+        with self.lock:
+            self._refresh()
+            return key in self.index
+
+    def get(self, key: str) -> bytes:
+        """Return the contents stored under a key, or None."""
+        with self.lock:
+            self._refresh()
+            if key not in self.index:
+                return None
+            offset, length, compression = self.index[key]
+            data = _pread(self._fd, length, offset)
+        return decompress_bytes(data, compression)
+
+    def locate(self, key: str) -> tuple:
+        """Return the offset, stored length and compression of a key's \
+        record, or None."""
+        with self.lock:
+            self._refresh()
+            return self.index.get(key, None)
+
+    def open_document(self, key: str) -> Document:
+        """
+        Open the contents stored under a key as a Document, or None.
+
+        Notes
+        -----
+        Uncompressed records are memory mapped out of the data file.
+        """
+        with self.lock:
+            self._refresh()
+            if key not in self.index:
+                return None
+            offset, length, compression = self.index[key]
+            if compression is not None:
+                data = _pread(self._fd, length, offset)
+            elif length == 0:
+                return Document(b'')
+            else:
+                mapping = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+                return Document(
+                    memoryview(mapping)[offset:offset + length], mapping)
+        return Document(decompress_bytes(data, compression))
+
+    def put(self, key: str, data: bytes, compression: str = None,
+            level: int = None):
+        """Store contents under a key, replacing any stored before."""
+        self._append(key, compress_bytes(data, compression, level),
+                     compression)
+
+    def delete(self, key: str):
+        """Remove a key, if stored."""
+        if self.has(key):
+            self._append(key, None, None)
+
+    def keys(self, prefix: str = '') -> List[str]:
+        """Return the stored keys starting with a prefix."""
+        with self.lock:
+            self._refresh()
+            return [i for i in self.index if i.startswith(prefix)]
+
+    def compact(self):
+        """
+        Rewrite the shard with only its live records.
+
+        Notes
+        -----
+        Replaced and removed records are left in place by appends, so a
+        shard that was rewritten often can be compacted to reclaim space.
+        Appends from other processes wait on the lock file meanwhile, and
+        their readers reopen the shard once it is replaced.
+        """
+        with self.lock, self._locked():
+            if not os.path.exists(self.index_path):
+                return
+            # Every record appended so far, whoever appended it
+            self._open_generation()
+            self._read_index()
+            os.close(self._fd)
+            self._fd = None
+            index, lines = dict(), []
+            with open(self.data_path, 'rb') as src, \
+                    open(f'{self.data_path}.part', 'wb') as dst:
+                for key, (offset, length, compression) in \
+                        self.index.items():
+                    src.seek(offset)
+                    index[key] = (dst.tell(), length, compression)
+                    dst.write(src.read(length))
+                    lines.append(json.dumps([key, *index[key]]))
+            with open(f'{self.index_path}.part', 'w') as f:
+                f.write(''.join(f'{i}\n' for i in lines))
+            os.replace(f'{self.data_path}.part', self.data_path)
+            os.replace(f'{self.index_path}.part', self.index_path)
+            self.index = index
+            stat = os.stat(self.index_path)
+            self._generation = (stat.st_dev, stat.st_ino)
+            self._consumed = stat.st_size
+            self._fd = _open_read(self.data_path)
+
+    def close(self):
+        """Close the shard's read handle."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ShardStorage(FileStorage):
+    """
+    Store extracted documents and features in shards, not single files.
+
+    Notes
+    -----
+    Paths under files/ and parsed/ are packed into one shard per company
+    and filing year, at 'shards/<tikr>/<year>.shard' with its '.idx'
+    offset index, so unpacking and featurizing create no directories and
+    no small files. Keys are the paths relative to the data directory, so
+    the existing APIs address documents exactly as they do on disk.
+    Records are compressed one by one with the configured compression.
+    Any other path, and any document stored as a file before the layout
+    was switched, is read from disk as by FileStorage.
+    """
+
+    PARTITIONS = (DocumentType.EXTRACTED_FILE_DIR_NAME,
+                  DocumentType.PARSED_FILE_DIR_NAME)
+
+    def __init__(self, data_dir: str, compression: str = None,
+                 level: int = None):
+        """
+        Create a shard backend.
+
+        Parameters
+        ----------
+        data_dir: str
+            The data directory holding 'shards/'
+        compression: str, Optional
+            'gzip', 'zstd' or None, for records written
+        level: int, Optional
+            The compression level
+        """
+        super().__init__(compression=compression, level=level)
+        self.data_dir = os.path.abspath(data_dir)
+        self.shard_dir = os.path.join(self.data_dir,
+                                      DocumentType.SHARD_DIR_NAME)
+        self.shards = dict()
+        self.lock = threading.Lock()
+
+    def _locate(self, path: str):
+        """Return the shard and key of a path, or (None, None)."""
+        key = os.path.relpath(os.path.abspath(path), self.data_dir)
+        parts = key.split(os.sep)
+        # files/<tikr>/<type>/<submission>/... and
+        #   parsed/<tikr>/<submission>/<type>/...
+        if parts[0] not in self.PARTITIONS or len(parts) < 4:
+            return None, None
+        submission = parts[3] \
+            if parts[0] == DocumentType.EXTRACTED_FILE_DIR_NAME else parts[2]
+        name = os.path.join(self.shard_dir, parts[1], period_of(submission))
+        with self.lock:
+            if name not in self.shards:
+                self.shards[name] = Shard(name)
+            return self.shards[name], '/'.join(parts)
+
+    def exists(self, path: str) -> bool:
+        """Return True if a logical path is stored."""
+        shard, key = self._locate(path)
+        if shard is not None and shard.has(key):
+            return True
+        return super().exists(path)
+
+    def open_read(self, path: str) -> BinaryIO:
+        """Open a logical path for binary reading."""
+        shard, key = self._locate(path)
+        if shard is not None:
+            self._accessed(path)
+            data = shard.get(key)
+            if data is not None:
+                return io.BytesIO(data)
+        return super().open_read(path)
+
+    def open_document(self, path: str) -> Document:
+        """Open a logical path as a Document, mapped out of its shard \
+        when uncompressed."""
+        shard, key = self._locate(path)
+        if shard is not None:
+            document = shard.open_document(key)
+            if document is not None:
+                self._accessed(path)
+                return document
+        return super().open_document(path)
+
+    def locality(self, path: str) -> tuple:
+        """Return where a logical path is stored, by shard and offset."""
+        shard, key = self._locate(path)
+        if shard is not None:
+            record = shard.locate(key)
+            if record is not None:
+                return locality(shard.data_path, record[0])
+        return super().locality(path)
+
+    @contextmanager
+    def _write(self, shard: Shard, key: str):
+        buffer = io.BytesIO()
+        yield buffer
+        shard.put(key, buffer.getvalue(), self.compression, self.level)
+
+    def open_write(self, path: str):
+        """Write a logical path, appended to its shard when sharded."""
+        shard, key = self._locate(path)
+        if shard is None:
+            return super().open_write(path)
+        self._accessed(path)
+        return self._write(shard, key)
+
+    def remove(self, path: str):
+        """Remove a logical path, if stored."""
+        shard, key = self._locate(path)
+        if shard is not None:
+            shard.delete(key)
+        super().remove(path)
+
+    def remove_dir(self, path: str):
+        """Remove a directory of logical paths, such as a submission."""
+        shard, key = self._locate(path)
+        if shard is not None:
+            for i in shard.keys(f'{key}/'):
+                shard.delete(i)
+        super().remove_dir(path)
+
+    def _shards(self, tikr: str = None) -> Iterator[Shard]:
+        """Yield the shards on disk, of every company or of one."""
+        if not os.path.exists(self.shard_dir):
+            return
+        tikrs = [tikr] if tikr is not None else os.listdir(self.shard_dir)
+        for tikr in tikrs:
+            folder = os.path.join(self.shard_dir, tikr)
+            if not os.path.isdir(folder):
+                continue
+            for file in sorted(os.listdir(folder)):
+                if file.endswith('.shard'):
+                    name = os.path.join(folder, file[:-len('.shard')])
+                    with self.lock:
+                        shard = self.shards.setdefault(name, Shard(name))
+                    yield shard
+
+    def move_tikr(self, source: str, dest: str) -> List[str]:
+        """
+        Move every record of one company's shards under another ticker.
+
+        Returns
+        -------
+        left: list[str]
+            The keys left under `source`, because `dest` already stored
+            them.
+        """
+        left = []
+        for shard in list(self._shards(source)):
+            for key in shard.keys():
+                parts = key.split('/')
+                parts[1] = dest
+                path = os.path.join(self.data_dir, *parts)
+                if self.exists(path):
+                    left.append(key)
+                    continue
+                self.write_bytes(path, shard.get(key))
+                shard.delete(key)
+        return left
+
+    def records(self, tikr: str = None) -> Iterator[Tuple[str, int, float]]:
+        """
+        Yield the path, stored size and shard modification time of every \
+        record, e.g. for DiskQuota.
+
+        Parameters
+        ----------
+        tikr: str, Optional
+            Only yield this company's records. Defaults to every record.
+        """
+        for shard in self._shards(tikr):
+            mtime = os.path.getmtime(shard.data_path)
+            with shard.lock:
+                shard._refresh()
+                items = [(key, length) for key, (_, length, _) in
+                         shard.index.items()]
+            for key, length in items:
+                yield os.path.join(self.data_dir, *key.split('/')), \
+                    length, mtime
+
+    def compact(self, tikr: str = None):
+        """
+        Reclaim space held by replaced and removed records.
+
+        Parameters
+        ----------
+        tikr: str, Optional
+            Only compact this company's shards. Defaults to every shard.
+        """
+        for shard in self._shards(tikr):
+            shard.compact()
@@ -0,0 +1,534 @@
+"""Transparently compressed files for the raw cache, files/ and parsed/."""
+import io
+import os
+import re
+import gzip
+import mmap
+import shutil
+from contextlib import contextmanager
+from typing import BinaryIO
+
+from .submission import read_slice as _read_mapped_slice
+
+
+# Suffix appended to the name of a file stored with each compression
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+# Level used when none is configured
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+
+# Colder roots that mirror the layout of each data directory, from the
+#   warmest down, see set_tiers
+_tiers = dict()
+
+
+def _zstandard():
+    """Import the optional zstandard package."""
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd compression requires the zstandard package, '
+                          'install it with `pip install zstandard`')
+    return zstandard
+
+
+def check_compression(compression: str):
+    """Raise ValueError for an unknown compression, ImportError if absent."""
+    if compression is None:
+        return
+    if compression not in SUFFIXES:
+        raise ValueError(f'Unknown compression {compression}, '
+                         f'expected one of {list(SUFFIXES)} or None')
+    if compression == 'zstd':
+        _zstandard()
+
+
+def compression_of(path: str) -> str:
+    """Return the compression a stored file name implies, or None."""
+    path = os.fspath(path)
+    for compression, suffix in SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def strip_suffix(path: str) -> str:
+    """Return a stored file's logical name, without compression suffix."""
+    compression = compression_of(path)
+    if compression is None:
+        return path
+    return path[:-len(SUFFIXES[compression])]
+
+
+def set_tiers(root: str, roots: list = None):
+    """
+    Look for files missing under a data directory in colder roots.
+
+    Parameters
+    ----------
+    root: str
+        The data directory, which is the hot tier every file is written to
+    roots: list[str], Optional
+        Roots laid out like `root`, from the warmest down. None or an
+        empty list stops looking beyond `root`.
+    """
+    root = os.path.abspath(root)
+    if roots:
+        _tiers[root] = [os.path.abspath(i) for i in roots]
+    else:
+        _tiers.pop(root, None)
+
+
+def colder(path: str) -> list:
+    """Return where a path under a tiered data directory sits in each \
+    colder root, warmest first."""
+    if not _tiers:
+        return []
+    path = os.path.abspath(os.fspath(path))
+    for root, roots in _tiers.items():
+        if path.startswith(root + os.sep):
+            rel = os.path.relpath(path, root)
+            return [os.path.join(i, rel) for i in roots]
+    return []
+
+
+def _variants(path: str) -> list:
+    return [path] + [path + i for i in SUFFIXES.values()]
+
+
+def find(path: str) -> str:
+    """
+    Return the stored file for a logical path, or None if there is none.
+
+    Notes
+    -----
+    The uncompressed file is preferred, then each compressed variant.
+    Files not under the data directory are then looked for in its colder
+    roots, see set_tiers.
+    """
+    path = os.fspath(path)
+    for tier in [path] + colder(path):
+        for stored in _variants(tier):
+            if os.path.exists(stored):
+                return stored
+    return None
+
+
+def exists(path: str) -> bool:
+    """Return True if a logical path is stored, compressed or not."""
+    return find(path) is not None
+
+
+def promote(path: str) -> str:
+    """
+    Return the stored file for a logical path, first moving it up to the \
+    data directory if it is in a colder root, or None if there is none.
+    """
+    path = os.fspath(path)
+    stored = find(path)
+    if stored is None or stored in _variants(path):
+        return stored
+    tier = next(i for i in colder(path) if stored in _variants(i))
+    hot = path + stored[len(tier):]
+    os.makedirs(os.path.dirname(os.path.abspath(hot)), exist_ok=True)
+    try:
+        # Copied across devices, so only renamed into place once complete
+        shutil.move(stored, hot + '.part')
+    except FileNotFoundError:
+        # Promoted meanwhile by another reader
+        return find(path)
+    os.replace(hot + '.part', hot)
+    return hot
+
+
+def remove(path: str):
+    """Remove every stored variant of a logical path, in every tier."""
+    path = os.fspath(path)
+    for tier in [path] + colder(path):
+        for stored in _variants(tier):
+            if os.path.exists(stored):
+                os.remove(stored)
+
+
+def listdir(path: str) -> list:
+    """List a directory of the data directory across every tier."""
+    out = set()
+    for tier in [os.fspath(path)] + colder(path):
+        if os.path.isdir(tier):
+            out.update(os.listdir(tier))
+    return sorted(out)
+
+
+def open_read(path: str) -> BinaryIO:
+    """
+    Open a logical path for binary reading, decompressing as a stream.
+
+    Parameters
+    ----------
+    path: str
+        The file as named uncompressed, e.g. 'x.txt', or any stored
+        variant of it, e.g. 'x.txt.zst'
+
+    Returns
+    -------
+    fp: BinaryIO
+        A buffered stream supporting read, readline(limit) and iteration.
+    """
+    stored = promote(path)
+    if stored is None:
+        raise FileNotFoundError(f'{path}')
+    compression = compression_of(stored)
+    if compression == 'gzip':
+        return gzip.open(stored, 'rb')
+    if compression == 'zstd':
+        reader = _zstandard().ZstdDecompressor().stream_reader(
+            open(stored, 'rb'), closefd=True)
+        return io.BufferedReader(reader)
+    return open(stored, 'rb')
+
+
+def wrap_read(fp: BinaryIO, compression: str) -> BinaryIO:
+    """
+    Decompress an open binary stream, such as an archive member.
+
+    Notes
+    -----
+    Closing the returned stream leaves `fp` open.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fp, mode='rb')
+    if compression == 'zstd':
+        return io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(
+            fp, closefd=False))
+    return fp
+
+
+def read_bytes(path: str) -> bytes:
+    """Return the decompressed contents of a logical path."""
+    with open_read(path) as f:
+        return f.read()
+
+
+def decode_text(data, errors: str = 'replace') -> str:
+    """
+    Decode the bytes of a document as every reader does.
+
+    Notes
+    -----
+    Documents are decoded as UTF-8 with undecodable bytes, e.g. cp1252
+    quotes, replaced, and with '\\r\\n' and '\\r' newlines read as '\\n', so
+    a document reads the same whether it was extracted, compressed,
+    sharded or left in its raw dump.
+    """
+    out = str(data, 'utf-8', errors)
+    if '\r' in out:
+        out = out.replace('\r\n', '\n').replace('\r', '\n')
+    return out
+
+
+def read_text(path: str, errors: str = 'replace') -> str:
+    """Return the decompressed contents of a logical path as text, see \
+    decode_text."""
+    return decode_text(read_bytes(path), errors=errors)
+
+
+def read_slice(path: str, offset: int, length: int) -> bytes:
+    """
+    Read `length` bytes at `offset` of a logical path's contents.
+
+    Notes
+    -----
+    Uncompressed files are memory mapped. Compressed files are decompressed
+    as a stream up to the slice, so ranges late in a large compressed dump
+    cost a read of everything before them.
+    """
+    stored = promote(path)
+    if stored is None:
+        raise FileNotFoundError(f'{path}')
+    if compression_of(stored) is None:
+        return _read_mapped_slice(stored, offset, length)
+    with open_read(stored) as f:
+        while offset > 0:
+            skipped = len(f.read(min(offset, 1 << 20)))
+            if not skipped:
+                return b''
+            offset -= skipped
+        return f.read(length)
+
+
+class Document:
+    """
+    A read-only bytes view of a stored document.
+
+    Notes
+    -----
+    Uncompressed documents, whole files or byte ranges of a raw dump or
+    shard, are memory mapped: scanning one with bytes regular expressions
+    and slicing it only bring the pages touched into memory, and nothing
+    is decoded until asked for. Compressed documents are decompressed into
+    memory once, still undecoded. Offsets are byte offsets into the
+    document.
+    """
+
+    def __init__(self, data, mapping: mmap.mmap = None):
+        """
+        Wrap the contents of a document.
+
+        Parameters
+        ----------
+        data: bytes-like
+            The document's contents, e.g. bytes or a memoryview of a map
+        mapping: mmap, Optional
+            The memory map `data` views, closed along with the document
+        """
+        self._mapping = mapping
+        self.buffer = memoryview(data)
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __getitem__(self, key) -> bytes:
+        if isinstance(key, slice):
+            return bytes(self.buffer[key])
+        return self.buffer[key]
+
+    def finditer(self, pattern, flags: int = 0):
+        """Iterate over the matches of a regular expression, as bytes."""
+        if isinstance(pattern, str):
+            pattern = pattern.encode('utf-8')
+        return re.finditer(pattern, self.buffer, flags=flags)
+
+    def search(self, pattern, flags: int = 0):
+        """Return the first match of a regular expression, or None."""
+        if isinstance(pattern, str):
+            pattern = pattern.encode('utf-8')
+        return re.search(pattern, self.buffer, flags=flags)
+
+    def decode(self, start: int = 0, end: int = None,
+               errors: str = 'strict') -> str:
+        """Decode a byte range of the document as UTF-8, unchanged."""
+        return str(self.buffer[start:end], 'utf-8', errors)
+
+    def text(self, start: int = 0, end: int = None,
+             errors: str = 'replace') -> str:
+        """Decode a byte range as every reader does, see decode_text."""
+        return decode_text(self.buffer[start:end], errors=errors)
+
+    def close(self):
+        """Release the document, and unmap it if it was mapped."""
+        self.buffer.release()
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_document(path: str, offset: int = 0,
+                  length: int = None) -> Document:
+    """
+    Open a logical path, or `length` bytes at `offset` of it, as a \
+    Document.
+
+    Notes
+    -----
+    Uncompressed files are memory mapped rather than read.
+    """
+    stored = promote(path)
+    if stored is None:
+        raise FileNotFoundError(f'{path}')
+    if compression_of(stored) is not None:
+        if length is None:
+            return Document(read_bytes(stored)[offset:])
+        return Document(read_slice(stored, offset, length))
+    with open(stored, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if length is None:
+            length = max(size - offset, 0)
+        # Empty files cannot be mapped
+        if length == 0 or offset >= size:
+            return Document(b'')
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Document(memoryview(mapping)[offset:offset + length], mapping)
+
+
+def locality(path: str, offset: int = 0) -> tuple:
+    """
+    Return a key sorting stored files, and offsets within them, roughly \
+    in the order they lie on disk, or None if the path is not stored.
+    """
+    stored = find(path)
+    if stored is None:
+        return None
+    stat = os.stat(stored)
+    return stat.st_dev, stat.st_ino, offset
+
+
+@contextmanager
+def open_write(path: str, compression: str = None, level: int = None):
+    """
+    Write a logical path, compressed if asked, replacing any stored copy.
+
+    Parameters
+    ----------
+    path: str
+        The file as named uncompressed, e.g. 'x.htm'
+    compression: str, Optional
+        'gzip', 'zstd' or None. The file is stored with the matching
+        suffix, e.g. 'x.htm.gz'.
+    level: int, Optional
+        The compression level. Defaults to DEFAULT_LEVELS.
+
+    Yields
+    ------
+    fp: BinaryIO
+        A binary file to write the uncompressed contents to.
+
+    Notes
+    -----
+    The file is written under a temporary name and renamed once complete,
+    and other stored variants of the path are then removed, so a reader
+    never sees a partial file or a stale copy.
+    """
+    check_compression(compression)
+    path = os.fspath(path)
+    if compression is not None and level is None:
+        level = DEFAULT_LEVELS[compression]
+    stored = path + SUFFIXES.get(compression, '')
+    tmp = stored + '.part'
+    try:
+        with open(tmp, 'wb') as raw:
+            if compression == 'gzip':
+                with gzip.GzipFile(fileobj=raw, mode='wb',
+                                   compresslevel=level, mtime=0) as f:
+                    yield f
+            elif compression == 'zstd':
+                compressor = _zstandard().ZstdCompressor(level=level)
+                with compressor.stream_writer(raw, closefd=False) as f:
+                    yield f
+            else:
+                yield raw
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, stored)
+    for other in _variants(path) + [j for i in colder(path)
+                                    for j in _variants(i)]:
+        if other != stored and os.path.exists(other):
+            os.remove(other)
+
+
+def write_bytes(path: str, data: bytes, compression: str = None,
+                level: int = None):
+    """Store the contents of a logical path; see open_write."""
+    with open_write(path, compression=compression, level=level) as f:
+        f.write(data)
+
+
+def compress_bytes(data: bytes, compression: str = None,
+                   level: int = None) -> bytes:
+    """Compress a whole record, as open_write would a file."""
+    if compression is None:
+        return data
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return _zstandard().ZstdCompressor(level=level).compress(data)
+
+
+def decompress_bytes(data: bytes, compression: str = None) -> bytes:
+    """Undo compress_bytes."""
+    if compression is None:
+        return data
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    return _zstandard().ZstdDecompressor().decompress(data)
+
+
+class FileStorage:
+    """
+    Store each document and feature file as its own file.
+
+    Notes
+    -----
+    Paths are the logical, uncompressed names such as
+    'files/aapl/10-Q/<submission>/<file>'. Files are written with the
+    configured compression and read however they were stored.
+    """
+
+    def __init__(self, compression: str = None, level: int = None):
+        """
+        Create a file backend.
+
+        Parameters
+        ----------
+        compression: str, Optional
+            'gzip', 'zstd' or None, for files written
+        level: int, Optional
+            The compression level
+        """
+        check_compression(compression)
+        self.compression = compression
+        self.level = level
+        # Called with each path read or written, see DiskQuota.touch
+        self.on_access = None
+
+    def _accessed(self, path: str):
+        if self.on_access is not None:
+            self.on_access(path)
+
+    def exists(self, path: str) -> bool:
+        """Return True if a logical path is stored."""
+        return exists(path)
+
+    def open_read(self, path: str) -> BinaryIO:
+        """Open a logical path for binary reading."""
+        self._accessed(path)
+        return open_read(path)
+
+    def read_bytes(self, path: str) -> bytes:
+        """Return the contents of a logical path."""
+        with self.open_read(path) as f:
+            return f.read()
+
+    def read_text(self, path: str, errors: str = 'replace') -> str:
+        """Return the contents of a logical path as text, see \
+        decode_text."""
+        return decode_text(self.read_bytes(path), errors=errors)
+
+    def open_document(self, path: str) -> Document:
+        """Open a logical path as a Document, memory mapped if possible."""
+        self._accessed(path)
+        return open_document(path)
+
+    def locality(self, path: str) -> tuple:
+        """Return where a logical path is stored, see the module's \
+        locality."""
+        return locality(path)
+
+    def open_write(self, path: str):
+        """Write a logical path; see the module's open_write."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._accessed(path)
+        return open_write(path, self.compression, self.level)
+
+    def write_bytes(self, path: str, data: bytes):
+        """Store the contents of a logical path."""
+        with self.open_write(path) as f:
+            f.write(data)
+
+    def remove(self, path: str):
+        """Remove a logical path, if stored."""
+        remove(path)
+
+    def remove_dir(self, path: str):
+        """Remove a directory of logical paths, such as a submission."""
+        path = os.fspath(path)
+        for tier in [path] + colder(path):
+            if os.path.isdir(tier):
+                shutil.rmtree(tier)
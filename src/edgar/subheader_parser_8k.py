@@ -35,25 +35,27 @@ class Parser_8K(Parser):
 
     _document_type = DocumentType('8-K')
 
+    # The item titles of Form 8-K, as the SEC words them
     section_names = {
         '1.01': 'entry into a material definitive agreement',
         '1.02': 'termination of a material definitive agreement',
         '1.03': 'bankruptcy or receivership',
         '1.04': ('mine safety - reporting of shutdowns '
                  'and patterns of violations'),
-        '2.01': 'acquisition or disposition of assets',
+        '1.05': 'material cybersecurity incidents',
+        '2.01': 'completion of acquisition or disposition of assets',
         '2.02': 'results of operations and financial condition',
         '2.03': ('creation of a direct financial obligation or an obligation '
                  'under an off-balance sheet arrangement of a registrant'),
         '2.04': ('triggering events that accelerate or increase a direct '
                  'financial obligation or an obligation under an off-balance '
                  'sheet arrangement'),
-        '2.05': 'cost associated with exit or disposal activities',
+        '2.05': 'costs associated with exit or disposal activities',
         '2.06': 'material impairments',
         '3.01': ('notice of delisting or failure to satisfy a continued '
                  'listing rule or standard; transfer of listing'),
         '3.02': 'unregistered sales of equity securities',
-        '3.03': 'material modifications to rights of security holders',
+        '3.03': 'material modification to rights of security holders',
         '4.01': "changes in registrant's certifying accountant",
         '4.02': ('non-reliance on previously issued financial statements or '
                  'a related audit report or completed interim review'),
@@ -76,16 +78,57 @@ class Parser_8K(Parser):
         '6.03': 'change in credit enhancement or other external support',
         '6.04': 'failure to make a required distribution',
         '6.05': 'securities act updating disclosure',
+        '6.06': 'static pool',
         '7.01': 'regulation fd disclosure',
         '8.01': 'other events',
         '9.01': 'financial statements and exhibits'}
 
-    sections = list(section_names.submissions())
+    sections = list(section_names.keys())
 
     def __init__(self):
         """Class constructor."""
         super().__init__()
 
+    @staticmethod
+    def _normalize_name(name: str) -> str:
+        words = re.findall(r'[a-z0-9]+', name.lower())
+        # Singular and plural forms name the same item
+        return ' '.join(re.sub(r'(?<=[a-z]{3})s$', '', i) for i in words)
+
+    @classmethod
+    def item_number(cls, description: str) -> str:
+        """
+        Return the item number, e.g. '2.02', for an item description.
+
+        Notes
+        -----
+        Matches the 'ITEM INFORMATION' lines of an 8-K <SEC-HEADER>, which
+        name items by description only. A description is matched to the
+        title it starts, or that starts it, if that is the only such title
+        and the description has at least half of its words. Otherwise it
+        is matched to the title sharing the most words with it, if at
+        least three in four. Returns None if no item, or more than one,
+        matches.
+        """
+        words = cls._normalize_name(description).split()
+        if not words:
+            return None
+        starts, best, score = [], None, 0
+        for section, name in cls.section_names.items():
+            name = cls._normalize_name(name).split()
+            if name[:len(words)] == words or words[:len(name)] == name:
+                starts.append((section, name))
+            shared = len(set(words) & set(name)) / \
+                max(len(set(words)), len(set(name)))
+            if shared > score:
+                best, score = section, shared
+            elif shared == score:
+                # Tied titles are ambiguous
+                best = None
+        if len(starts) == 1 and 2 * len(words) >= len(starts[0][1]):
+            return starts[0][0]
+        return best if score >= 0.75 else None
+
     def clean_text(self, doctext: str) -> str:
         """Clean the text before parsing."""
         f = html.remove_tags(doctext)
@@ -0,0 +1,480 @@
+"""Streaming splitter for raw SEC-EDGAR submission dumps."""
+import os
+import re
+import mmap
+import binascii
+import fnmatch
+from html import unescape
+from typing import BinaryIO, Iterator, List
+
+
+# Tags that open document metadata lines, e.g. '<TYPE>10-Q'
+DOCUMENT_FIELDS = ('type', 'sequence', 'filename', 'description')
+
+_TAG = re.compile(rb'<(/?[A-Za-z][A-Za-z0-9-]*)>')
+
+
+class TypeFilter:
+    """
+    Select documents by shell-style patterns on their <TYPE> field.
+
+    Notes
+    -----
+    Patterns are matched case-insensitively, e.g. 'EX-99.*' or 'EX-10*'.
+    A type is kept if it matches an include pattern and no exclude pattern.
+    With no include patterns, every type not excluded is kept.
+    """
+
+    def __init__(self, include: List[str] = None, exclude: List[str] = None):
+        """Compile include and exclude pattern lists."""
+        if isinstance(include, str):
+            include = [include]
+        if isinstance(exclude, str):
+            exclude = [exclude]
+        self.include = None if include is None else [
+            re.compile(fnmatch.translate(i.upper())) for i in include]
+        self.exclude = [] if exclude is None else [
+            re.compile(fnmatch.translate(i.upper())) for i in exclude]
+
+    @property
+    def is_restrictive(self) -> bool:
+        """Return True if any include patterns were given."""
+        return self.include is not None
+
+    def __call__(self, doc_type: str) -> bool:
+        """Return True if a document of this type should be kept."""
+        doc_type = doc_type.strip().upper()
+        if any(i.match(doc_type) for i in self.exclude):
+            return False
+        if self.include is None:
+            return True
+        return any(i.match(doc_type) for i in self.include)
+
+
+class SubmissionDocument:
+    """
+    One <DOCUMENT> of a submission dump, positioned in the stream.
+
+    Notes
+    -----
+    The document's body is the verbatim bytes between its <TEXT> and
+    </TEXT> lines. It can only be read while the reader is positioned on
+    this document; moving to the next document skips any unread body.
+    """
+
+    def __init__(self, reader, fields: dict, offset: int):
+        """Wrap a document whose body starts at byte `offset`."""
+        self.fields = fields
+        self.offset = offset
+        self.length = None
+        self._reader = reader
+        self._consumed = False
+
+    @property
+    def sequence(self) -> str:
+        """The document's numerical index within the submission."""
+        return self.fields.get('sequence', '')
+
+    @property
+    def type(self) -> str:
+        """The document's form or exhibit type, e.g. 10-Q or EX-99.1."""
+        return self.fields.get('type', '')
+
+    @property
+    def filename(self) -> str:
+        """The document's file name, or a sentinel if not listed."""
+        filename = self.fields.get('filename', '')
+        # Sentinel for missing fields in early 2000s
+        if filename == '':
+            filename = f'h{self.sequence}.htm'
+        return filename
+
+    @property
+    def description(self) -> str:
+        """The document's description, or '' if not listed."""
+        return self.fields.get('description', '')
+
+    def iter_body(self) -> Iterator[bytes]:
+        """Yield the body of the document in bounded-size pieces."""
+        assert not self._consumed, 'Document body was already read'
+        self._consumed = True
+        self.length = 0
+        for piece in self._reader._iter_body():
+            self.length += len(piece)
+            yield piece
+
+    def copy_to(self, f: BinaryIO) -> int:
+        """Write the body of the document to a binary file object."""
+        for piece in self.iter_body():
+            f.write(piece)
+        return self.length
+
+    def skip(self) -> int:
+        """Advance past the body of the document without keeping it."""
+        if not self._consumed:
+            for _ in self.iter_body():
+                pass
+        return self.length
+
+
+class SubmissionReader:
+    """
+    Single forward pass over a submission dump, with bounded memory.
+
+    Notes
+    -----
+    Boundaries are found with a linear scan for tag lines such as
+    <DOCUMENT>, <TYPE>, <SEQUENCE>, <FILENAME> and <TEXT>. The file is read
+    in pieces of at most `chunk_size` bytes, so arbitrarily long lines of
+    embedded HTML never need to be held in memory at once.
+    """
+
+    def __init__(self, fp: BinaryIO, chunk_size: int = 1 << 16):
+        """
+        Start reading a submission.
+
+        Parameters
+        ----------
+        fp: BinaryIO
+            The dump, opened in binary mode and positioned at its start.
+        chunk_size: int
+            The largest piece of the file held in memory at once. At least
+            256 bytes, so that tag lines are never split.
+        """
+        self.fp = fp
+        self.chunk_size = max(chunk_size, 256)
+        self.offset = 0
+        self._at_line_start = True
+        self._pushback = None
+        self._current = None
+
+        self.kind = None
+        self.header = None
+        self._read_header()
+
+    def _next(self):
+        """Return (piece, at_line_start) or (None, None) at end of file."""
+        if self._pushback is not None:
+            out, self._pushback = self._pushback, None
+            self.offset += len(out[0])
+            return out
+        piece = self.fp.readline(self.chunk_size)
+        if not piece:
+            return None, None
+        at_line_start = self._at_line_start
+        self._at_line_start = piece.endswith(b'\n')
+        self.offset += len(piece)
+        return piece, at_line_start
+
+    def _unread(self, piece, at_line_start):
+        self._pushback = (piece, at_line_start)
+        self.offset -= len(piece)
+
+    @staticmethod
+    def _tag(piece, at_line_start):
+        """Return the upper-cased tag opening a line, if any."""
+        if not at_line_start:
+            return None
+        match = _TAG.match(piece)
+        if match is None:
+            return None
+        return match.group(1).decode('ascii').upper()
+
+    def _read_header(self):
+        """Find the outer document tag and collect the <SEC-HEADER> text."""
+        while True:
+            piece, at_line_start = self._next()
+            if piece is None:
+                return
+            tag = self._tag(piece, at_line_start)
+            if tag in ('SEC-DOCUMENT', 'IMS-DOCUMENT'):
+                self.kind = tag
+            elif tag in ('SEC-HEADER', 'IMS-HEADER'):
+                break
+            elif tag == 'DOCUMENT':
+                self._unread(piece, at_line_start)
+                self.header = []
+                return
+
+        lines = [piece]
+        while True:
+            piece, at_line_start = self._next()
+            if piece is None:
+                break
+            tag = self._tag(piece, at_line_start)
+            if tag in ('/SEC-HEADER', '/IMS-HEADER'):
+                break
+            if tag == 'DOCUMENT':
+                self._unread(piece, at_line_start)
+                break
+            lines.append(piece)
+        self.header = [
+            re.sub('<[^>]*>', '', i.decode('utf-8', errors='replace'))
+            for i in lines]
+
+    def header_lines(self) -> List[str]:
+        """Return the lines of the <SEC-HEADER> block, with tags removed."""
+        return self.header
+
+    def _iter_body(self):
+        """Yield body pieces of the current document up to </TEXT>."""
+        while True:
+            piece, at_line_start = self._next()
+            if piece is None:
+                return
+            tag = self._tag(piece, at_line_start)
+            if tag in ('/TEXT', '/DOCUMENT'):
+                self._unread(piece, at_line_start)
+                return
+            yield piece
+
+    def __iter__(self) -> Iterator[SubmissionDocument]:
+        """Yield each document in the submission, in file order."""
+        while True:
+            if self._current is not None:
+                self._current.skip()
+                self._current = None
+
+            # Find the next <DOCUMENT>
+            while True:
+                piece, at_line_start = self._next()
+                if piece is None:
+                    return
+                if self._tag(piece, at_line_start) == 'DOCUMENT':
+                    break
+
+            # Read its metadata lines up to <TEXT>
+            fields = dict()
+            offset = None
+            while True:
+                piece, at_line_start = self._next()
+                if piece is None:
+                    return
+                tag = self._tag(piece, at_line_start)
+                if tag == 'TEXT':
+                    # Body starts on the next line unless text follows <TEXT>
+                    rest = piece[piece.index(b'>') + 1:]
+                    if rest.strip():
+                        self._unread(rest, False)
+                    offset = self.offset
+                    break
+                if tag == '/DOCUMENT':
+                    self._unread(piece, at_line_start)
+                    offset = self.offset
+                    break
+                if tag is not None and tag.lower() in DOCUMENT_FIELDS:
+                    value = piece.split(b'>', 1)[1]
+                    fields[tag.lower()] = value.decode(
+                        'utf-8', errors='replace').strip()
+
+            self._current = SubmissionDocument(self, fields, offset)
+            yield self._current
+
+
+# Header keys that may repeat, and are kept as a list of every value
+HEADER_LIST_KEYS = ('ITEM INFORMATION',)
+
+
+def parse_header(lines: List[str]) -> dict:
+    """
+    Turn <SEC-HEADER> lines into a dict of 'KEY': 'value' attributes.
+
+    Notes
+    -----
+    Keys in HEADER_LIST_KEYS map to a list of all their values, in order.
+    For any other repeated key, the last value is kept.
+    """
+    lines = [i.replace('\t', '').rstrip('\r\n') for i in lines]
+    out = dict()
+    for key, value in (i.split(':', 1) for i in lines if ':' in i):
+        if key in HEADER_LIST_KEYS:
+            out.setdefault(key, []).append(value.strip())
+        else:
+            out[key] = value
+    return out
+
+
+def scan_submission(path: str, documents: bool = True):
+    """
+    Read the header block and document headers of a dump, skipping bodies.
+
+    Parameters
+    ----------
+    path: str
+        The raw submission dump
+    documents: bool
+        If False, stop after the <SEC-HEADER> block.
+
+    Returns
+    -------
+    kind: str or None
+        'SEC-DOCUMENT', 'IMS-DOCUMENT', or None if neither tag is found.
+    header: list[str]
+        The lines of the <SEC-HEADER> block, with tags removed.
+    documents: list[SubmissionDocument]
+        Each document's fields, body offset and body length.
+
+    Notes
+    -----
+    Unlike SubmissionReader, the scanner jumps between tag lines with
+    mmap searches, so document bodies are never decoded or copied. It
+    expects the upper-case tags EDGAR writes.
+    """
+    if os.path.getsize(path) == 0:
+        return None, [], []
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan(mm, documents)
+
+
+def scan_stream(fp: BinaryIO, documents: bool = True):
+    """
+    Read the header block and document headers of a dump from a stream.
+
+    Notes
+    -----
+    Returns what scan_submission does, for dumps that cannot be memory
+    mapped, such as compressed ones. Bodies are read through, not kept.
+    """
+    reader = SubmissionReader(fp)
+    if reader.kind is None:
+        return None, [], []
+    docs = []
+    if documents:
+        for doc in reader:
+            doc.skip()
+            docs.append(doc)
+    return reader.kind, reader.header_lines(), docs
+
+
+def parse_index_headers(page: bytes, documents: bool = True):
+    """
+    Read a filing's -index-headers.html page like a submission dump.
+
+    Returns
+    -------
+    kind, header, documents:
+        As scan_submission. Document offsets refer to the page and every
+        body is empty.
+
+    Notes
+    -----
+    EDGAR publishes the header and document headers of every filing,
+    without bodies, as escaped text at
+    Archives/edgar/data/<cik>/<accession>/<accession>-index-headers.html.
+    """
+    text = unescape(re.sub(r'<[^>]*>', '', page.decode(
+        'utf-8', errors='replace')))
+    return _scan(text.encode('utf-8'), documents)
+
+
+def _scan(mm, documents: bool = True):
+    """Scan a dump held in an mmap or bytes, see scan_submission."""
+    match = re.search(rb'<(SEC|IMS)-DOCUMENT>', mm[:4096], re.I)
+    kind = None if match is None else \
+        match.group(0)[1:-1].decode('ascii').upper()
+
+    header = []
+    for tag in (b'SEC-HEADER', b'IMS-HEADER'):
+        start = mm.find(b'<' + tag + b'>')
+        if start != -1:
+            break
+    pos = 0
+    if start != -1:
+        end = mm.find(b'\n</' + tag + b'>', start)
+        next_doc = mm.find(b'\n<DOCUMENT>', start)
+        if end == -1 or (next_doc != -1 and next_doc < end):
+            end = next_doc if next_doc != -1 else len(mm) - 1
+        header = [
+            re.sub('<[^>]*>', '', i.decode('utf-8', errors='replace'))
+            for i in mm[start:end + 1].splitlines(keepends=True)]
+        pos = end + 1
+
+    out = []
+    while documents:
+        i = mm.find(b'\n<DOCUMENT>', pos - 1 if pos > 0 else 0)
+        if i == -1:
+            break
+        doc_end = mm.find(b'\n</DOCUMENT>', i + 1)
+        if doc_end == -1:
+            doc_end = len(mm)
+        text = mm.find(b'\n<TEXT>', i + 1, doc_end)
+
+        fields = dict()
+        block = mm[i + 1:text if text != -1 else doc_end]
+        for line in block.splitlines():
+            match = _TAG.match(line)
+            if match is None:
+                continue
+            tag = match.group(1).decode('ascii').lower()
+            if tag in DOCUMENT_FIELDS:
+                fields[tag] = line[match.end():].decode(
+                    'utf-8', errors='replace').strip()
+
+        if text == -1:
+            offset, length = doc_end + 1, 0
+        else:
+            line_end = mm.find(b'\n', text + 1)
+            # Body starts on the next line unless text follows <TEXT>
+            if mm[text + 7:line_end].strip():
+                offset = text + 7
+            else:
+                offset = line_end + 1
+            body_end = mm.find(b'\n</TEXT>', offset - 1, doc_end + 1)
+            if body_end == -1:
+                body_end = doc_end
+            length = max(body_end + 1 - offset, 0)
+
+        doc = SubmissionDocument(None, fields, offset)
+        doc.length = length
+        doc._consumed = True
+        out.append(doc)
+        pos = doc_end + 1
+    return kind, header, out
+
+
+def read_slice(path: str, offset: int, length: int) -> bytes:
+    """
+    Read `length` bytes at `offset` of a file through a memory map.
+
+    Notes
+    -----
+    Only the pages covering the slice are brought into memory, so reading
+    one document out of a very large submission dump stays cheap.
+    """
+    if length == 0:
+        return b''
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[offset:offset + length]
+
+
+def uudecode(data: bytes) -> bytes:
+    """
+    Decode a uuencoded document body, as used for binary exhibits.
+
+    Notes
+    -----
+    Images, PDFs, spreadsheets and zip archives are embedded in submission
+    dumps between 'begin <mode> <name>' and 'end' lines.
+    """
+    lines = iter(data.splitlines())
+    for line in lines:
+        if line.startswith(b'begin '):
+            break
+    else:
+        raise ValueError('No uuencoded data found')
+
+    out = []
+    for line in lines:
+        if line.strip() == b'end':
+            break
+        if not line:
+            continue
+        try:
+            out.append(binascii.a2b_uu(line))
+        except binascii.Error:
+            # Some encoders pad lines with extra characters
+            nbytes = (((line[0] - 32) & 63) * 4 + 5) // 3
+            out.append(binascii.a2b_uu(line[:nbytes]))
+    return b''.join(out)
@@ -0,0 +1,202 @@
+"""A local, refreshable index of the companies listed on EDGAR."""
+import os
+import json
+import time
+import bisect
+import threading
+import urllib.error
+from typing import List
+
+
+# Ticker, CIK, name and exchange of every listed company
+TICKERS_EXCHANGE_PATH = '/files/company_tickers_exchange.json'
+# Ticker, CIK and name only, the fallback if the above is unavailable
+TICKERS_PATH = '/files/company_tickers.json'
+
+
+class TickerIndex:
+    """
+    Map company tickers to their CIK, name and exchange.
+
+    Notes
+    -----
+    The SEC ticker file is fetched once and kept on disk, so looking a
+    company up is a dictionary hit rather than a request. Tickers are
+    matched case-insensitively. Lookups by ticker or CIK take constant
+    time; prefix searches bisect sorted lists of tickers and names.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Create an empty index.
+
+        Parameters
+        ----------
+        path: str, Optional
+            The file the index is saved to and loaded from. The index is
+            kept in memory only if not provided.
+        """
+        self.path = path
+        self.updated = None
+        self.lock = threading.Lock()
+        self._set_rows([])
+
+    def _set_rows(self, rows: list):
+        """Rebuild the lookup tables from (cik, name, ticker, exchange)."""
+        companies, by_cik = dict(), dict()
+        for cik, name, tikr, exchange in rows:
+            if not tikr:
+                continue
+            tikr = str(tikr).lower()
+            if tikr in companies:
+                continue
+            companies[tikr] = {'ticker': tikr, 'cik': int(cik),
+                               'name': name, 'exchange': exchange}
+            by_cik.setdefault(int(cik), []).append(tikr)
+        self.companies = companies
+        self._by_cik = by_cik
+        self._tickers = sorted(companies)
+        self._names = sorted(((str(i['name'] or '').lower(), i['ticker'])
+                              for i in companies.values()))
+
+    @staticmethod
+    def _parse(data: dict) -> list:
+        """Read rows out of either SEC ticker file format."""
+        if 'fields' in data:
+            fields = data['fields']
+            return [(row[fields.index('cik')], row[fields.index('name')],
+                     row[fields.index('ticker')],
+                     row[fields.index('exchange')])
+                    for row in data['data']]
+        return [(i['cik_str'], i.get('title', None), i['ticker'], None)
+                for i in data.values()]
+
+    def load(self) -> bool:
+        """
+        Load the index from its file.
+
+        Returns
+        -------
+        loaded: bool
+            False if there is no saved index.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        with self.lock:
+            self._set_rows(self._parse(data))
+            self.updated = os.path.getmtime(self.path)
+        return True
+
+    def update(self, client):
+        """
+        Fetch the SEC ticker file and rebuild the index.
+
+        Parameters
+        ----------
+        client: EDGARClient
+            Client used to fetch the file. With an HTTP cache, an unchanged
+            file is revalidated rather than downloaded again.
+        """
+        try:
+            body = client.get(TICKERS_EXCHANGE_PATH)
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+            body = client.get(TICKERS_PATH)
+        data = json.loads(body)
+        with self.lock:
+            self._set_rows(self._parse(data))
+            self.updated = time.time()
+        if self.path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, self.path)
+
+    def age(self) -> float:
+        """Seconds since the index was fetched, or None if it never was."""
+        if self.updated is None:
+            return None
+        return time.time() - self.updated
+
+    def __len__(self):
+        """Return the number of tickers indexed."""
+        return len(self.companies)
+
+    def __contains__(self, tikr: str):
+        """Return True if a ticker is indexed."""
+        return str(tikr).lower() in self.companies
+
+    def get(self, tikr: str) -> dict:
+        """
+        Return the ticker, cik, name and exchange of a company, or None.
+
+        Parameters
+        ----------
+        tikr: str
+            a company identifier
+        """
+        return self.companies.get(str(tikr).lower(), None)
+
+    def get_cik(self, tikr: str) -> int:
+        """
+        Return the CIK of a ticker.
+
+        Raises
+        ------
+        KeyError
+            If the ticker is not indexed.
+        """
+        company = self.get(tikr)
+        if company is None:
+            raise KeyError(f'No CIK found for {tikr}')
+        return company['cik']
+
+    def get_tickers(self, cik: int) -> List[str]:
+        """Return every ticker listed under a CIK, e.g. share classes."""
+        return list(self._by_cik.get(int(cik), []))
+
+    def tickers(self) -> List[str]:
+        """Return every indexed ticker, in upper case."""
+        return [i.upper() for i in self.companies]
+
+    def search(self, prefix: str, limit: int = None) -> List[dict]:
+        """
+        Find companies whose ticker or name starts with a prefix.
+
+        Parameters
+        ----------
+        prefix: str
+            The start of a ticker or company name, in any case.
+        limit: int, Optional
+            The maximum number of companies to return.
+
+        Returns
+        -------
+        companies: list[dict]
+            Ticker matches in alphabetical order, then name matches.
+        """
+        prefix = prefix.lower()
+        out = []
+        start = bisect.bisect_left(self._tickers, prefix)
+        for tikr in self._tickers[start:]:
+            if not tikr.startswith(prefix):
+                break
+            out.append(tikr)
+        start = bisect.bisect_left(self._names, (prefix, ''))
+        for name, tikr in self._names[start:]:
+            if not name.startswith(prefix):
+                break
+            if tikr not in out:
+                out.append(tikr)
+        if limit is not None:
+            out = out[:limit]
+        return [self.companies[i] for i in out]
+
+    def __repr__(self):
+        """Summarize the index."""
+        return f'TickerIndex({len(self)} tickers, path={self.path!r})'
@@ -0,0 +1,157 @@
+"""Spread a data directory over hot and cold roots."""
+import os
+import time
+import shutil
+import threading
+from typing import List
+
+from .quota import AccessLog, scan_artifacts, remove_empty_parents
+from . import storage
+
+
+class Tiers:
+    """
+    A data directory backed by colder roots laid out like it.
+
+    Notes
+    -----
+    Tier 0 is the data directory itself, e.g. on local NVMe, and each
+    further root is colder, e.g. a bulk disk or network mount. Raw dumps,
+    files/ and parsed/ are written to tier 0 and found in whichever tier
+    holds them; a read moves a file back up to tier 0 (see
+    storage.promote), so what is in use stays hot. `demote` moves
+    artifacts that were not used for a while down a tier, on demand or
+    from a background thread started with `start`. Metadata, the journal,
+    the HTTP cache and shards stay in the data directory.
+    """
+
+    def __init__(self, data_dir: str, roots: List[str],
+                 log: AccessLog = None):
+        """
+        Create a tiered data directory.
+
+        Parameters
+        ----------
+        data_dir: str
+            The hot tier, where metadata is kept and files are written
+        roots: list[str]
+            The colder tiers, warmest first
+        log: AccessLog, Optional
+            Where accesses are recorded. Defaults to the data directory's.
+        """
+        self.roots = [os.path.abspath(data_dir)] + \
+            [os.path.abspath(i) for i in roots]
+        self.log = log if log is not None else AccessLog(data_dir)
+        self._thread = None
+        self._stop = threading.Event()
+        storage.set_tiers(self.roots[0], self.roots[1:])
+
+    def holds(self, artifact: str, tier: int) -> bool:
+        """Return True if a tier stores an artifact as files."""
+        path = os.path.join(self.roots[tier], *artifact.split('/'))
+        return os.path.isdir(path) or any(
+            os.path.exists(path + i)
+            for i in [''] + list(storage.SUFFIXES.values()))
+
+    def move(self, artifact: str, source: int, dest: int):
+        """
+        Move an artifact from one tier to another.
+
+        Notes
+        -----
+        Each file is copied under a temporary name and renamed into place
+        before the original is removed, so it can always be found in one
+        tier or the other. Files already in the destination are replaced.
+        """
+        path = os.path.join(self.roots[source], *artifact.split('/'))
+        files = [path + i for i in [''] + list(storage.SUFFIXES.values())
+                 if os.path.isfile(path + i)]
+        if os.path.isdir(path):
+            files = [os.path.join(root, i)
+                     for root, _, names in os.walk(path) for i in names]
+        for file in files:
+            if file.endswith('.part'):
+                continue
+            out = os.path.join(self.roots[dest], os.path.relpath(
+                file, self.roots[source]))
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            shutil.copy2(file, out + '.part')
+            os.replace(out + '.part', out)
+            os.remove(file)
+            # A copy stored with other compression would shadow this one
+            for other in [storage.strip_suffix(out) + i for i in
+                          [''] + list(storage.SUFFIXES.values())]:
+                if other != out and os.path.exists(other):
+                    os.remove(other)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        remove_empty_parents(self.roots[source], artifact)
+
+    def usage(self) -> List[int]:
+        """Return the bytes stored in each tier."""
+        return [sum(i[0] for i in scan_artifacts(root).values())
+                for root in self.roots]
+
+    def demote(self, ages) -> List[tuple]:
+        """
+        Move artifacts left unused down a tier.
+
+        Parameters
+        ----------
+        ages: float or list[float]
+            Seconds an artifact in each tier may go unused before it is
+            moved to the next, e.g. [7 * 86400, 90 * 86400] with two cold
+            roots. A single number applies to every tier.
+
+        Returns
+        -------
+        moved: list[tuple]
+            The (artifact, tier) each artifact was moved to.
+        """
+        if not isinstance(ages, (list, tuple)):
+            ages = [ages] * (len(self.roots) - 1)
+        access = self.log.load()
+        now = time.time()
+        moved = []
+        # Coldest first, so nothing is moved twice in one pass
+        for tier in reversed(range(min(len(ages), len(self.roots) - 1))):
+            artifacts = scan_artifacts(self.roots[tier])
+            last_used = self.log.last_used(artifacts, access)
+            for artifact in sorted(artifacts, key=last_used.get):
+                if now - last_used[artifact] <= ages[tier]:
+                    break
+                self.move(artifact, tier, tier + 1)
+                moved.append((artifact, tier + 1))
+        return moved
+
+    def start(self, ages, interval: float = 3600):
+        """
+        Demote unused artifacts in the background.
+
+        Parameters
+        ----------
+        ages: float or list[float]
+            As for demote
+        interval: float
+            Seconds between passes
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self.demote(ages)
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, daemon=True,
+                                        name='edgar-demotion')
+        self._thread.start()
+
+    def stop(self):
+        """Stop background demotion, waiting for a pass under way."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,279 @@
+"""Ingest new filings as soon as EDGAR publishes them."""
+import os
+import time
+import datetime
+import warnings
+import threading
+from typing import Callable, List
+
+from .document import DocumentType
+from .network import EDGARClient, TokenBucket, EDGAR_BASE_URL, \
+    SEC_MAX_REQUESTS_PER_SECOND
+from .parser import Parser
+from .subheader_parser_8k import Parser_8K
+
+
+class FilingEvent:
+    """A filing picked up by a FilingWatcher, with its timings."""
+
+    def __init__(self, tikr: str, filing: dict):
+        """Start tracking a filing seen on the feed."""
+        self.tikr = tikr
+        self.accession = filing['accession']
+        self.form_type = filing['type']
+        self.url = filing['url']
+        self.published = _parse_timestamp(filing.get('updated', ''))
+        self.detected = time.time()
+        self.downloaded = None
+        self.unpacked = None
+        self.parsed = None
+        self.finished = None
+        self.features = None
+        self.sections = None
+        self.error = None
+
+    @property
+    def latency(self) -> float:
+        """Seconds from publication (or detection) until fully handled."""
+        if self.finished is None:
+            return None
+        start = self.published if self.published is not None \
+            else self.detected
+        return self.finished - start
+
+    @property
+    def stages(self) -> dict:
+        """Seconds spent in each stage of ingestion."""
+        out = dict()
+        last = self.detected
+        if self.published is not None:
+            out['detect'] = self.detected - self.published
+        for attr, stage in (('downloaded', 'download'),
+                            ('unpacked', 'unpack'), ('parsed', 'parse')):
+            now = getattr(self, attr)
+            if now is not None:
+                out[stage] = now - last
+                last = now
+        return out
+
+    def __repr__(self):
+        """Represent the event as a single status line."""
+        latency = '?' if self.latency is None else f'{self.latency:.2f}s'
+        status = 'failed' if self.error is not None else 'ok'
+        return (f'{self.tikr} {self.form_type} {self.accession}: {status}, '
+                f'latency {latency}')
+
+
+def _parse_timestamp(value: str) -> float:
+    """Convert an ISO 8601 feed timestamp to epoch seconds, or None."""
+    try:
+        return datetime.datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        return None
+
+
+class FilingWatcher:
+    """
+    Poll EDGAR's latest-filings feed and ingest new filings of the \
+    companies being followed.
+
+    Notes
+    -----
+    Each poll reads the getcurrent atom feed once, however many companies
+    are followed. Every new accession is downloaded straight away,
+    unpacked, optionally featurized and split into 8-K sections, and then
+    passed to the callback as a FilingEvent. Accessions already in the
+    metadata are never fetched again.
+    """
+
+    def __init__(self, downloader, tikrs: List[str],
+                 document_type: str = '8-K', interval: float = 1.0,
+                 callback: Callable[[FilingEvent], None] = None,
+                 featurize: bool = False, sections: bool = False,
+                 parser=None, count: int = 100,
+                 rate: float = SEC_MAX_REQUESTS_PER_SECOND,
+                 base_url: str = EDGAR_BASE_URL,
+                 client: EDGARClient = None):
+        """
+        Create a watcher.
+
+        Parameters
+        ----------
+        downloader: Downloader
+            Provides the data directory, metadata and API header.
+        tikrs: list[str]
+            The companies to follow
+        document_type: str
+            The form type to ingest, 10-Q or 8-K
+        interval: float
+            Seconds between polls of the feed.
+        callback: Callable[[FilingEvent], None], Optional
+            Called with each filing once it has been ingested.
+        featurize: bool
+            if (True), run Parser.featurize_file over the primary document.
+        sections: bool
+            if (True), split the primary document with
+            Parser_8K.get_sections.
+        parser: Parser, Optional
+            Parser used when featurize is set. Created if not provided.
+        count: int
+            The number of latest filings read from the feed on each poll.
+        rate: float
+            Maximum requests per second.
+        base_url: str
+            Server to query. Point this at a LocalEDGARServer for testing.
+        client: EDGARClient, Optional
+            Use an existing client instead of creating one.
+        """
+        if isinstance(tikrs, str):
+            tikrs = [tikrs]
+        self.downloader = downloader
+        self.metadata = downloader.metadata
+        self.tikrs = list(tikrs)
+        self.document_type = DocumentType(document_type)
+        self.interval = interval
+        self.callback = callback
+        self.featurize = featurize
+        self.sections = sections
+        self.parser = parser
+        self.count = count
+        if client is None:
+            client = downloader.get_client(
+                base_url=base_url, rate_limiter=TokenBucket(rate))
+        self.client = client
+
+        self.events = []
+        self._ciks = None
+        self._seen = set()
+        self._stop = threading.Event()
+
+    def _followed(self) -> dict:
+        """Map the CIK of each followed company to its ticker."""
+        if self._ciks is None:
+            self._ciks = dict()
+            for tikr in self.tikrs:
+                try:
+                    cik = self.client.get_cik(tikr)
+                except KeyError as e:
+                    warnings.warn(str(e), RuntimeWarning)
+                    continue
+                # Filings of share classes are kept under one ticker
+                tikr = self.metadata.set_cik(tikr, cik)
+                self._ciks[cik] = tikr
+                self._seen.update(self.metadata.get_submissions(tikr))
+        return self._ciks
+
+    def _ingest(self, event: FilingEvent):
+        """Download, unpack and parse one filing."""
+        tikr = event.tikr
+        file = f'{event.accession}.txt'
+        path = os.path.join(self.downloader.raw_dir, f'{tikr}',
+                            f'{self.document_type}', file)
+        journal = self.downloader.journal
+        compression, level = self.downloader.metadata.get_compression()
+        self.client.download(event.url, path, compression=compression,
+                             level=level)
+        self.metadata.touch(path)
+        journal.record(tikr, event.accession, 'fetched')
+        event.downloaded = time.time()
+
+        self.downloader.unpack_file(
+            tikr, file, document_type=self.document_type)
+        journal.record(tikr, event.accession, 'split')
+        event.unpacked = time.time()
+
+        if not (self.featurize or self.sections):
+            return
+        filename = self.metadata.get_primary_doc_name(tikr, event.accession)
+        if filename is None:
+            return
+        if self.featurize:
+            if self.parser is None:
+                self.parser = Parser(metadata=self.metadata,
+                                     data_dir=self.downloader.data_dir)
+            event.features = self.parser.featurize_file(
+                tikr, event.accession, filename, silent=True)
+        if self.sections:
+            text = self.metadata.read_document(tikr, event.accession,
+                                               filename)
+            texts, types = Parser_8K().get_sections(text, return_types=True)
+            event.sections = dict(zip(types, texts))
+        event.parsed = time.time()
+
+    def poll(self) -> List[FilingEvent]:
+        """
+        Read the feed once and ingest any new filings.
+
+        Returns
+        -------
+        events: list[FilingEvent]
+            The filings ingested by this poll, oldest first.
+        """
+        ciks = self._followed()
+        try:
+            filings = self.client.list_current_filings(
+                self.document_type.dtype, count=self.count)
+        except Exception as e:
+            warnings.warn(f'Could not read the filings feed: {e}',
+                          RuntimeWarning)
+            return []
+
+        out = []
+        for filing in reversed(filings):
+            if filing['cik'] not in ciks or \
+                    filing['accession'] in self._seen:
+                continue
+            self._seen.add(filing['accession'])
+            event = FilingEvent(ciks[filing['cik']], filing)
+            try:
+                self._ingest(event)
+            except Exception as e:
+                warnings.warn(f'Failed to ingest {event.accession}: {e}',
+                              RuntimeWarning)
+                event.error = e
+            event.finished = time.time()
+            self.events.append(event)
+            out.append(event)
+            if self.callback is not None:
+                self.callback(event)
+        return out
+
+    def run(self, duration: float = None, max_events: int = None):
+        """
+        Poll the feed until stopped.
+
+        Parameters
+        ----------
+        duration: float, Optional
+            Stop after this many seconds.
+        max_events: int, Optional
+            Stop once this many filings have been ingested.
+
+        Returns
+        -------
+        events: list[FilingEvent]
+            Every filing ingested by this watcher.
+        """
+        self._stop.clear()
+        end = None if duration is None else time.monotonic() + duration
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                self.poll()
+                if max_events is not None and \
+                        len(self.events) >= max_events:
+                    break
+                if end is not None and time.monotonic() >= end:
+                    break
+                wait = self.interval - (time.monotonic() - started)
+                if end is not None:
+                    wait = min(wait, end - time.monotonic())
+                if wait > 0:
+                    self._stop.wait(wait)
+        except KeyboardInterrupt:
+            pass
+        return self.events
+
+    def stop(self):
+        """Stop a running watcher after its current poll."""
+        self._stop.set()
@@ -34,7 +34,10 @@ def _relative_to_abs_path(relative_p):
 def load_files(tikrs: str, data_dir: str = DEFAULT_DATA_DIR,
                document_type: str = '10-Q', force: bool = False,
                remove_raw: bool = False, force_remove_raw: bool = False,
-               silent: bool = False, include_supplementary: bool = False):
+               silent: bool = False, include_supplementary: bool = False,
+               workers: int = 1, refresh: bool = False,
+               virtual: bool = False, include_types: list = None,
+               exclude_types: list = None):
     """
     Download local copies of document_type files pertaining to a company.
 
@@ -57,6 +60,21 @@ def load_files(tikrs: str, data_dir: str = DEFAULT_DATA_DIR,
         even if some are not unpacked.
     silent: bool, Optional
         If True, will silence all warnings
+    workers: int, Optional
+        If greater than 1, downloads filings for all companies concurrently
+        with this many requests in flight, under the SEC rate limit, then
+        unpacks their submissions on a pool of processes.
+    refresh: bool, Optional
+        If True, only download and unpack filings newer than the latest
+        filing already available locally for each company.
+    virtual: bool, Optional
+        If True, documents are not copied out of the raw submission dumps.
+        They are read from their byte range in the dump when requested.
+    include_types: list[str], Optional
+        Patterns on the <TYPE> of supplementary documents to unpack, e.g.
+        ['EX-99.*']. The primary form is always unpacked.
+    exclude_types: list[str], Optional
+        Patterns on the <TYPE> of supplementary documents to skip.
     """
     data_dir = _relative_to_abs_path(data_dir)
     if type(tikrs) is str:
@@ -67,27 +85,60 @@ def load_files(tikrs: str, data_dir: str = DEFAULT_DATA_DIR,
     loader = pipeline.singleton._get_downloader(data_dir=data_dir)
 #    parser = edgar_global._get_parser(data_dir=data_dir)
 
-    for tikr in tikrs:
-        if force or not metadata.is_unpacked(tikr,
-                                             document_type=document_type):
-            if force or not metadata.is_downloaded(tikr):
-                loader.query_server(tikr, force=force,
-                                    document_type=document_type,
-                                    silent=silent)
-
-            loader.unpack_bulk(
-                tikr,
-                force=force,
-                document_type=document_type,
-                desc=f'{tikr} :Inflating HTM',
-                remove_raw=remove_raw,
-                force_remove_raw=force_remove_raw,
-                silent=silent,
-                include_supplementary=include_supplementary)
+    # Evictions wait until everything is downloaded and unpacked
+    with metadata.deferred_quota():
+        if refresh:
+            loader.refresh(tikrs, document_type=document_type,
+                           workers=max(workers, 1), remove_raw=remove_raw,
+                           force_remove_raw=force_remove_raw,
+                           loading_bar=not silent,
+                           include_supplementary=include_supplementary,
+                           virtual=virtual, include_types=include_types,
+                           exclude_types=exclude_types)
+            return
+
+        if workers > 1:
+            pending = [tikr for tikr in tikrs
+                       if force or not metadata.is_unpacked(
+                           tikr, document_type=document_type)]
+            loader.query_server_bulk(
+                pending, document_type=document_type, force=force,
+                workers=workers, loading_bar=not silent)
+            loader.unpack_bulk_many(
+                pending, force=force, document_type=document_type,
+                loading_bar=not silent, remove_raw=remove_raw,
+                force_remove_raw=force_remove_raw, silent=silent,
+                include_supplementary=include_supplementary,
+                workers=min(workers, os.cpu_count() or 1), virtual=virtual,
+                include_types=include_types, exclude_types=exclude_types)
+            return
+
+        for tikr in tikrs:
+            if force or not metadata.is_unpacked(tikr,
+                                                 document_type=document_type):
+                if force or not metadata.is_downloaded(
+                        tikr, document_type=document_type):
+                    loader.query_server(tikr, force=force,
+                                        document_type=document_type,
+                                        silent=silent)
+
+                loader.unpack_bulk(
+                    tikr,
+                    force=force,
+                    document_type=document_type,
+                    desc=f'{tikr} :Inflating HTM',
+                    remove_raw=remove_raw,
+                    force_remove_raw=force_remove_raw,
+                    silent=silent,
+                    include_supplementary=include_supplementary,
+                    virtual=virtual,
+                    include_types=include_types,
+                    exclude_types=exclude_types)
 
 
 def read_file(tikr: str, submission: str, file: str = None,
-              document_type: str = '10-Q', data_dir=DEFAULT_DATA_DIR):
+              document_type: str = '10-Q', data_dir=DEFAULT_DATA_DIR,
+              metadata=None):
     """
     Load the contents of a file in a company filing submission.
 
@@ -102,11 +153,19 @@ def read_file(tikr: str, submission: str, file: str = None,
         supplementary information
     data_dir: str
         The directory that filings are stored in
+    metadata: Metadata, Optional
+        Used to resolve ticker aliases and to locate files unpacked with
+        `virtual=True`, which are read from their raw submission dump.
+        Files evicted by the disk quota are derived again through it.
     """
     document_type = DocumentType(document_type)
     submission = submission.split('.')[0]
     if file is None:
         raise NotImplementedError()
+    if metadata is None:
+        metadata = pipeline.Metadata(data_dir=data_dir)
+    # Files of share-class tickers are stored under one of them
+    tikr = metadata.canonical(tikr)
     path = pathlib.Path(os.path.join(data_dir,
                                      DocumentType.EXTRACTED_FILE_DIR_NAME,
                                      tikr,
@@ -114,14 +173,90 @@ def read_file(tikr: str, submission: str, file: str = None,
                                      submission,
                                      file)).absolute()
 
-    if not os.path.exists(path):
-        raise FileNotFoundError(f'{path}')
+    # Compressed or sharded files are read through the storage backend
+    backend = metadata.get_storage()
+    if not backend.exists(path):
+        if metadata.is_virtual(tikr, submission, file):
+            return metadata.read_document(tikr, submission, file,
+                                          document_type=document_type)
+        # Evicted by the disk quota, or never extracted
+        return metadata.restore_document(tikr, submission, file, path)
+
+    with backend.open_document(path) as document:
+        return document.text()
+
+
+def read_files(files, document_type: str = '10-Q',
+               data_dir=DEFAULT_DATA_DIR, metadata=None) -> list:
+    """
+    Load the contents of many files, reading them in the order they are \
+    stored on disk.
+
+    Parameters
+    ----------
+    files: list[tuple]
+        The (tikr, submission, file) of each file to load
+    document_type: str
+        The document type the submissions were unpacked under
+    data_dir: str
+        The directory that filings are stored in
+    metadata: Metadata, Optional
+        As for read_file
+
+    Returns
+    -------
+    texts: list[str]
+        The contents of each file, in the order they were requested.
+
+    Notes
+    -----
+    Files are read grouped by the raw dump, shard or file holding them and
+    by offset within it, so a batch sweeps each dump and shard once, front
+    to back, rather than seeking back and forth. Files that have to be
+    derived again are read last.
+    """
+    document_type = DocumentType(document_type)
+    if metadata is None:
+        metadata = pipeline.Metadata(data_dir=data_dir)
+    files = [(metadata.canonical(tikr), submission.split('.')[0], file)
+             for tikr, submission, file in files]
+
+    def locate(n):
+        where = metadata.locate_document(*files[n],
+                                         document_type=document_type)
+        return (0, where) if where is not None else (1,)
+
+    out = [None] * len(files)
+    for n in sorted(range(len(files)), key=locate):
+        out[n] = read_file(*files[n], document_type=document_type,
+                           data_dir=data_dir, metadata=metadata)
+    return out
+
 
-    out_text = None
-    with open(path, 'r') as f:
-        out_text = f.read()
+def read_exhibit(tikr: str, submission: str, file: str,
+                 data_dir=DEFAULT_DATA_DIR, metadata=None) -> bytes:
+    """
+    Decode a binary exhibit, such as an image, PDF or spreadsheet.
+
+    Parameters
+    ----------
+    tikr: str
+        A company to load the exhibit for
+    submission: str
+        The filing to load the exhibit from
+    file: str
+        The name of the exhibit, e.g. 'g1.jpg'
+    data_dir: str
+        The directory that filings are stored in
 
-    return out_text
+    Notes
+    -----
+    Exhibits are decoded from the raw submission dump only when requested,
+    so the raw dump must still be available.
+    """
+    if metadata is None:
+        metadata = pipeline.Metadata(data_dir=data_dir)
+    return metadata.read_exhibit(tikr, submission.split('.')[0], file)
 
 
 def get_files(tikrs, submissions=None,
@@ -148,6 +283,9 @@ def get_files(tikrs, submissions=None,
     if submissions is not None:
         submissions = set(submissions)
 
+    # Share-class tickers of one company hold the same submissions
+    tikrs = list(dict.fromkeys(metadata.canonical(i) for i in tikrs))
+
     out = []
     for tikr in tikrs:
         for submission in metadata.get_submissions(tikr):
@@ -161,3 +299,95 @@ def get_files(tikrs, submissions=None,
             for file in sub:
                 out.append(sub[file]['filename'])
     return out
+
+
+def find_8k_filings(tikrs, item: str, start_date: str = None,
+                    end_date: str = None, data_dir: str = DEFAULT_DATA_DIR,
+                    metadata=None):
+    """
+    Find locally loaded 8-K submissions that report an item.
+
+    Parameters
+    ----------
+    tikrs: list[str] or str
+        The companies to search
+    item: str
+        The item number, e.g. '2.02', or its description
+    start_date: str, Optional
+        The earliest filing date to include, as YYYYMMDD or YYYY-MM-DD
+    end_date: str, Optional
+        The latest filing date to include, as YYYYMMDD or YYYY-MM-DD
+
+    Returns
+    -------
+    filings: list[tuple[str, str]]
+        (tikr, submission) pairs, oldest first under each company.
+
+    Notes
+    -----
+    Answered from the 'ITEM INFORMATION' lines of each submission header,
+    so no document is opened.
+    """
+    if metadata is None:
+        metadata = pipeline.Metadata(data_dir=data_dir)
+    if type(tikrs) is str:
+        tikrs = [tikrs]
+
+    tikrs = list(dict.fromkeys(metadata.canonical(i) for i in tikrs))
+
+    out = []
+    for tikr in tikrs:
+        for submission in metadata.find_filings_by_item(
+                tikr, item, start_date=start_date, end_date=end_date):
+            out.append((tikr, submission))
+    return out
+
+
+def get_cover_facts(tikrs, submissions=None,
+                    data_dir: str = DEFAULT_DATA_DIR, metadata=None):
+    """
+    Get the ix:hidden and dei:* cover facts of locally loaded filings.
+
+    Parameters
+    ----------
+    tikrs: list[str] or str
+        The companies to get facts for
+    submissions: list[str] or None
+        if None, return facts for all submissions, otherwise only for
+        submissions in the list
+
+    Returns
+    -------
+    facts: dict[str, dict[str, dict]]
+        The facts of each submission under each company, e.g.
+        facts['aapl'][submission]['dei:DocumentPeriodEndDate']
+
+    Notes
+    -----
+    Facts are kept in metadata once extracted, so screening filings by
+    period or entity does not read any document after the first pass.
+    """
+    if metadata is None:
+        metadata = pipeline.Metadata(data_dir=data_dir)
+    if type(tikrs) is str:
+        tikrs = [tikrs]
+
+    if type(submissions) is str:
+        submissions = [submissions]
+    if submissions is not None:
+        submissions = set(submissions)
+
+    out = dict()
+    for tikr in tikrs:
+        out[tikr] = dict()
+        is_changed = False
+        for submission in metadata.get_submissions(tikr):
+            if submissions is not None and submission not in submissions:
+                continue
+            is_changed = is_changed or 'facts' not in \
+                metadata._get_submission(tikr, submission)
+            out[tikr][submission] = metadata.get_cover_facts(
+                tikr, submission)
+        if is_changed:
+            metadata.save_tikr_metadata(tikr)
+    return out
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+from edgar.localserver import LocalEDGARServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    """A running LocalEDGARServer with no filings registered."""
+    with LocalEDGARServer() as server:
+        yield server
+
+
+@pytest.fixture
+def make_data_dir(tmp_path_factory):
+    """Create empty data directories whose API keys are already saved."""
+    def make():
+        path = tmp_path_factory.mktemp('data')
+        with open(path / '.keys.yaml', 'w') as f:
+            yaml.dump({'edgar_agent': 'Test',
+                       'edgar_email': 'test@example.com'}, f)
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def data_dir(make_data_dir):
+    """An empty data directory whose API keys are already saved."""
+    return make_data_dir()
@@ -0,0 +1,177 @@
+import os
+
+import pytest
+
+from edgar.downloader import Downloader
+from edgar.localserver import synthetic_submission
+
+
+def add_10q(server, tikr, n, date):
+    cik = server.add_company(tikr)
+    accession = f'{cik:010d}-20-{n:06d}'
+    server.add_filing(tikr, '10-Q', accession, synthetic_submission(
+        accession, date=date, size=5000, cik=cik), date=date)
+    return accession
+
+
+def dumps_fetched(server):
+    return sorted(os.path.basename(path) for _, path in server.request_log
+                  if path.endswith('.txt'))
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_refresh_fetches_only_new_filings(server, data_dir, workers):
+    first = add_10q(server, 'aapl', 1, '2020-01-01')
+    second = add_10q(server, 'aapl', 2, '2020-04-01')
+    loader = Downloader(data_dir=data_dir)
+    assert loader.refresh('aapl', workers=workers, base_url=server.base_url,
+                          loading_bar=False, virtual=True) == \
+        {'aapl': [first, second]}
+
+    third = add_10q(server, 'aapl', 3, '2020-07-01')
+    server.request_log.clear()
+    assert loader.refresh('aapl', workers=workers, base_url=server.base_url,
+                          loading_bar=False, virtual=True) == \
+        {'aapl': [third]}
+    assert dumps_fetched(server) == [f'{third}.txt']
+
+    # Documents are read from their byte range in the raw dump
+    metadata = loader.metadata
+    assert list(metadata.get_submissions('aapl')) == [first, second, third]
+    assert not os.path.exists(os.path.join(data_dir, 'files', 'aapl'))
+    filename = metadata.get_primary_doc_name('aapl', third)
+    assert b'<html>' in metadata.open_document('aapl', third, filename)[:]
+    assert metadata.is_unpacked('aapl', '10-Q')
+
+    server.request_log.clear()
+    assert loader.refresh('aapl', workers=workers, base_url=server.base_url,
+                          loading_bar=False) == {'aapl': []}
+    assert dumps_fetched(server) == []
+
+
+def test_process_pool_unpacks_as_serial(server, make_data_dir):
+    tikrs = server.add_synthetic(['aapl', 'msft'], form_types=['10-Q'],
+                                 filings_per_type=3, size=8000)
+    loaders = []
+    for _ in range(2):
+        loader = Downloader(data_dir=make_data_dir())
+        loader.query_server_bulk(tikrs, '10-Q', rate=1000,
+                                 base_url=server.base_url, loading_bar=False)
+        loaders.append(loader)
+    serial, pooled = loaders
+    for tikr in tikrs:
+        serial.unpack_bulk(tikr, document_type='10-Q',
+                           include_supplementary=True)
+    pooled.unpack_bulk_many(tikrs, document_type='10-Q', workers=2,
+                            include_supplementary=True)
+
+    for tikr in tikrs:
+        expected = serial.metadata._get_tikr(tikr)
+        assert pooled.metadata._get_tikr(tikr) == expected
+        assert list(pooled.metadata.get_submissions(tikr)) == \
+            list(expected['submissions'])
+        assert pooled.metadata.is_unpacked(tikr, '10-Q')
+        for submission in expected['submissions']:
+            for filename in ['10-q.htm', 'ex991.htm']:
+                assert pooled.metadata.read_document(
+                    tikr, submission, filename) == \
+                    serial.metadata.read_document(tikr, submission, filename)
+
+
+@pytest.mark.parametrize('include_types,fetched', [
+    (None, ['10-q.htm']),
+    (['EX-99.*'], ['10-q.htm', 'ex991.htm']),
+])
+def test_primary_mode_fetches_only_primary_documents(
+        server, data_dir, include_types, fetched):
+    server.add_synthetic(['aapl'], filings_per_type=2, size=5000)
+    loader = Downloader(data_dir=data_dir)
+    loader.query_server_bulk(['aapl'], '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False,
+                             documents='primary', include_types=include_types)
+
+    metadata = loader.metadata
+    assert metadata.is_unpacked('aapl', '10-Q')
+    assert not os.path.exists(os.path.join(data_dir, '.rawcache'))
+    submissions = metadata.get_submissions('aapl')
+    archives = sorted(path for _, path in server.request_log
+                      if path.startswith('/Archives/'))
+    assert sorted(os.path.basename(i) for i in archives) == sorted(
+        [f'{i}-index-headers.html' for i in submissions] +
+        fetched * len(submissions))
+
+    for submission in submissions:
+        assert metadata.get_primary_doc_name('aapl', submission) == \
+            '10-q.htm'
+        assert metadata.get_cover_facts('aapl', submission)
+    # Written to files/ as served
+    names = {i.replace('-', ''): i for i in submissions}
+    for path in archives:
+        folder, filename = os.path.split(path)
+        if not filename.endswith('-index-headers.html'):
+            assert metadata.read_document(
+                'aapl', names[os.path.basename(folder)], filename
+            ).encode() == server.documents[path]
+
+
+@pytest.mark.parametrize('document_type', ['all', ['10-Q', '8-K']])
+def test_form_types_are_listed_in_one_pass(server, data_dir, document_type):
+    tikrs = server.add_synthetic(['aapl', 'msft'], form_types=['10-Q', '8-K'],
+                                 filings_per_type=2, size=3000)
+    loader = Downloader(data_dir=data_dir)
+    loader.query_server_bulk(tikrs, document_type, rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+
+    listings = [path for _, path in server.request_log
+                if path.startswith('/submissions/')]
+    assert sorted(listings) == ['/submissions/CIK0001000000.json',
+                                '/submissions/CIK0001000001.json']
+    loader.scan_raw(tikrs, documents=False)
+    for tikr in tikrs:
+        assert loader.metadata.is_downloaded(tikr, 'all')
+        # Each filing is stored under its own form type
+        for form_type in ['10-Q', '8-K']:
+            files = loader.get_unpackable_files(tikr, form_type)
+            assert len(files) == 2
+            for file in files:
+                assert loader.metadata._get_submission(
+                    tikr, file.split('.txt')[0])['attrs']['FORM TYPE'] == \
+                    form_type
+
+
+def test_share_classes_are_stored_once(server, data_dir):
+    server.add_synthetic(['goog'], filings_per_type=2, size=3000)
+    cik = server.add_company('googl', cik=server.add_company('goog'))
+    # Unpacked under googl before it was known to be an alias
+    old = f'{cik:010d}-19-000001'
+    raw = os.path.join(data_dir, '.rawcache', 'googl', '10-Q')
+    os.makedirs(raw)
+    with open(os.path.join(raw, f'{old}.txt'), 'wb') as f:
+        f.write(synthetic_submission(old, date='2019-01-01', size=3000,
+                                     cik=cik))
+    loader = Downloader(data_dir=data_dir)
+    loader.unpack_file('googl', f'{old}.txt', document_type='10-Q')
+    loader.metadata.save_tikr_metadata('googl')
+
+    loader.query_server_bulk(['goog', 'googl'], '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+    loader.unpack_bulk('googl', document_type='10-Q')
+
+    metadata = loader.metadata
+    assert metadata.canonical('googl') == 'goog'
+    assert sorted(metadata.get_aliases('googl')) == ['goog', 'googl']
+    assert [path for _, path in server.request_log
+            if path.startswith('/submissions/')] == \
+        [f'/submissions/CIK{cik:010d}.json']
+    for area in ['.rawcache', 'files']:
+        assert os.listdir(os.path.join(data_dir, area)) == ['goog']
+    assert not os.path.exists(os.path.join(data_dir, '.metadata',
+                                           'googl.pkl'))
+
+    submissions = metadata.get_submissions('goog')
+    assert metadata.get_submissions('googl') == submissions
+    assert len(submissions) == 3 and old in submissions
+    for submission in submissions:
+        filename = metadata.get_primary_doc_name('googl', submission)
+        assert metadata.read_document('googl', submission, filename) == \
+            metadata.read_document('goog', submission, filename)
@@ -0,0 +1,57 @@
+import os
+
+from edgar import html
+from edgar.downloader import Downloader
+from edgar.localserver import synthetic_submission
+from edgar.metadata_manager import metadata_manager
+
+COVER = '''<html><body>
+<div style="display:none"><ix:header><ix:hidden>
+<ix:nonNumeric name="dei:AmendmentFlag" contextRef="c1">false</ix:nonNumeric>
+<IX:NONNUMERIC NAME="us-gaap:FiscalPeriod" contextRef="c1">Q1</IX:NONNUMERIC>
+<ix:nonFraction name="us-gaap:ProfitLoss" contextRef="c1" sign="-">3
+</ix:nonFraction>
+</ix:hidden></ix:header></div>
+<p>For the quarter ended <ix:nonNumeric name="dei:DocumentPeriodEndDate"
+ contextRef="c1" format="ixt:date"><b>March&nbsp;28,</b> 2020</ix:nonNumeric>
+</p><p><ix:nonNumeric name="dei:EntityRegistrantName" contextRef="c1">
+Smith &amp; Sons</ix:nonNumeric></p>
+<p><ix:nonFraction name="dei:EntityCommonStockSharesOutstanding"
+ contextRef="a">100</ix:nonFraction> Class A and
+<ix:nonFraction name="dei:EntityCommonStockSharesOutstanding"
+ contextRef="b">5</ix:nonFraction> Class B shares</p>
+<p>Net loss <ix:nonFraction name="us-gaap:NetIncomeLoss" contextRef="c1"
+ sign="-">7</ix:nonFraction></p>
+</body></html>'''
+
+
+def test_cover_facts_are_read_from_hidden_and_dei_tags():
+    # Other facts in the body are left to the full parse
+    assert html.get_cover_facts(COVER) == {
+        'dei:AmendmentFlag': 'false',
+        'us-gaap:FiscalPeriod': 'Q1',
+        'us-gaap:ProfitLoss': '-3',
+        'dei:DocumentPeriodEndDate': 'March 28, 2020',
+        'dei:EntityRegistrantName': 'Smith & Sons',
+        # Reported once per share class
+        'dei:EntityCommonStockSharesOutstanding': ['100', '5'],
+    }
+    assert html.get_cover_facts('<html><p>No facts</p></html>') == {}
+
+
+def test_cover_facts_are_kept_in_metadata(data_dir):
+    accession = '0001000000-20-000001'
+    raw = os.path.join(data_dir, '.rawcache', 'aapl', '10-Q')
+    os.makedirs(raw)
+    with open(os.path.join(raw, f'{accession}.txt'), 'wb') as f:
+        f.write(synthetic_submission(accession, date='2020-03-28',
+                                     size=5000))
+    metadata = metadata_manager(data_dir=data_dir)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.unpack_file('aapl', f'{accession}.txt', document_type='10-Q')
+
+    facts = {'dei:DocumentPeriodEndDate': '2020-03-28',
+             'dei:EntityCentralIndexKey': '0001000000'}
+    assert metadata._get_submission('aapl', accession)['facts'] == facts
+    assert metadata.get_cover_facts('aapl', accession) == facts
+    assert metadata.get_cover_facts('aapl', accession, refresh=True) == facts
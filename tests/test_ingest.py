@@ -0,0 +1,81 @@
+import io
+import os
+import gzip
+import tarfile
+import zipfile
+
+import pytest
+
+from edgar.downloader import Downloader
+from edgar.localserver import synthetic_submission
+
+# Accession, form type and CIK of each dump, by archive
+ARCHIVES = {
+    'q1.zip': [('0001000000-20-000001', '10-Q', 1000000),
+               ('0001000000-20-000002', '8-K', 1000000)],
+    'q2.tar': [('0001000000-20-000003', '10-Q', 1000000),
+               ('0001000001-20-000004', '8-K', 1000001)],
+    'q3.tar.gz': [('0001000000-20-000005', '8-K', 1000000),
+                  ('0001000002-20-000006', '10-Q', 1000002)],
+}
+
+
+def write_archive(path, members):
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path, 'w') as f:
+            for name, data in members.items():
+                f.writestr(name, data)
+        return
+    with tarfile.open(path, 'w:gz' if path.endswith('.gz') else 'w') as f:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            f.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def archives(tmp_path):
+    dumps, paths = dict(), []
+    for archive, filings in ARCHIVES.items():
+        members = {'README': b'not a submission'}
+        for n, (accession, form_type, cik) in enumerate(filings):
+            data = synthetic_submission(accession, form_type, size=3000,
+                                        cik=cik)
+            dumps[accession] = data
+            # Members may be compressed themselves
+            if n % 2:
+                members[f'{cik}/{accession}.txt.gz'] = gzip.compress(data)
+            else:
+                members[f'{cik}/{accession}.txt'] = data
+        paths.append(str(tmp_path / archive))
+        write_archive(paths[-1], members)
+    return paths, dumps
+
+
+def test_archives_are_ingested(data_dir, archives):
+    paths, dumps = archives
+    loader = Downloader(data_dir=data_dir)
+    loader.metadata.set_cik('aapl', 1000000)
+    assert loader.ingest(paths, workers=2, keep_raw=True) == 6
+
+    metadata = loader.metadata
+    # Filers with no known ticker are stored under their CIK
+    assert sorted(os.listdir(os.path.join(data_dir, 'files'))) == \
+        ['1000001', '1000002', 'aapl']
+    assert metadata.get_submissions('aapl') == [
+        '0001000000-20-000001', '0001000000-20-000002',
+        '0001000000-20-000003', '0001000000-20-000005']
+    for filings in ARCHIVES.values():
+        for accession, form_type, cik in filings:
+            tikr = 'aapl' if cik == 1000000 else str(cik)
+            filename = metadata.get_primary_doc_name(tikr, accession)
+            assert filename == f'{form_type.lower()}.htm'
+            assert metadata.read_document(tikr, accession, filename)
+            with open(os.path.join(data_dir, '.rawcache', tikr, form_type,
+                                   f'{accession}.txt'), 'rb') as f:
+                assert f.read() == dumps[accession]
+
+    # Nothing is redone, and only the requested companies are ingested
+    assert loader.ingest(paths, workers=2) == 0
+    other = Downloader(data_dir=data_dir)
+    assert other.ingest(paths, tikrs=['aapl'], force=True) == 4
@@ -0,0 +1,71 @@
+import os
+import json
+
+from edgar.downloader import Downloader
+from edgar.journal import Journal
+
+
+def tear_last_line(path):
+    """Cut a journal's last line in half, as a crash mid-write would."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    start = data.rstrip(b'\n').rfind(b'\n') + 1
+    with open(path, 'wb') as f:
+        f.write(data[:start + (len(data) - start) // 2])
+    return json.loads(data[start:])['accession']
+
+
+def test_torn_lines_are_ignored(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.record('aapl', ['a', 'b'], 'queued')
+    journal.record('aapl', ['a', 'b'], 'fetched')
+    assert tear_last_line(tmp_path / 'aapl.jsonl') == 'b'
+
+    journal = Journal(str(tmp_path))
+    assert journal.state('aapl', 'a') == 'fetched'
+    assert journal.state('aapl', 'b') == 'queued'
+    # Appended after the torn line, and read back past it
+    journal.record('aapl', 'b', 'split')
+    assert Journal(str(tmp_path)).get_accessions('aapl', 'split') == ['b']
+
+
+def test_interrupted_runs_resume(server, data_dir):
+    tikrs = server.add_synthetic(['aapl'], filings_per_type=3, size=3000)
+    journal = os.path.join(data_dir, '.journal', 'aapl.jsonl')
+    raw = os.path.join(data_dir, '.rawcache', 'aapl', '10-Q')
+
+    # Killed as the last download finished, before anything else was saved
+    loader = Downloader(data_dir=data_dir)
+    loader.query_server_bulk(tikrs, '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+    torn = tear_last_line(journal)
+    os.remove(os.path.join(raw, f'{torn}.txt'))
+    os.remove(os.path.join(data_dir, '.metadata', 'aapl.pkl'))
+
+    server.request_log.clear()
+    loader = Downloader(data_dir=data_dir)
+    loader.query_server_bulk(tikrs, '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+    # Neither listed again nor fetched again, but for the torn filing
+    assert [os.path.basename(i) for _, i in server.request_log] == \
+        [f'{torn}.txt']
+    assert len(os.listdir(raw)) == 3
+
+    # Killed as the last submission was split
+    loader.unpack_bulk_many(tikrs, document_type='10-Q', workers=2)
+    torn = tear_last_line(journal)
+    loader.metadata.set_unpacked('aapl', '10-Q', False)
+    loader.metadata.save_tikr_metadata('aapl')
+    files = os.path.join(data_dir, 'files', 'aapl', '10-Q')
+    for submission in os.listdir(files):
+        for filename in os.listdir(os.path.join(files, submission)):
+            os.remove(os.path.join(files, submission, filename))
+
+    loader = Downloader(data_dir=data_dir)
+    loader.unpack_bulk_many(tikrs, document_type='10-Q', workers=2)
+    assert {i: os.listdir(os.path.join(files, i))
+            for i in os.listdir(files)
+            if os.listdir(os.path.join(files, i))} == {torn: ['10-q.htm']}
+    assert sorted(loader.journal.get_accessions('aapl', 'split')) == \
+        sorted(i.split('.txt')[0] for i in os.listdir(raw))
+    assert loader.metadata.is_unpacked('aapl', '10-Q')
@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from edgar import network
+from edgar.network import EDGARClient, HTTPCache, TokenBucket
+from edgar.localserver import LocalEDGARServer, synthetic_submission
+
+ACCESSION = '0001000000-20-000001'
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Record backoff delays instead of waiting them out."""
+    delays = []
+    monkeypatch.setattr(network.time, 'sleep', delays.append)
+    return delays
+
+
+def make_client(url, **kwargs):
+    return EDGARClient('Test test@example.com', base_url=url,
+                       rate_limiter=TokenBucket(rate=1000, capacity=1000),
+                       **kwargs)
+
+
+def filing_path(server):
+    cik = server.add_company('aapl')
+    server.add_filing('aapl', '10-Q', ACCESSION,
+                      synthetic_submission(ACCESSION, size=2000))
+    return f'/Archives/edgar/data/{cik}/{ACCESSION.replace("-", "")}/' \
+        f'{ACCESSION}.txt'
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate=20)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.45
+
+
+def test_token_bucket_is_shared_between_threads():
+    bucket = TokenBucket(rate=40)
+    bucket.acquire()
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire()
+                                                for _ in range(5)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.45
+
+
+def test_throttled_requests_back_off_as_told(no_sleep):
+    with LocalEDGARServer(throttle_rate=1.0, retry_after=7) as server:
+        path = filing_path(server)
+        client = make_client(server.base_url, max_retries=2)
+        with pytest.raises(urllib.error.HTTPError) as e:
+            client.get(path)
+        assert e.value.code == 429
+        assert server.num_throttled == 3 and no_sleep == [7, 7]
+
+        server.throttle_rate = 0.0
+        assert client.get(path) == server.documents[path]
+
+
+def test_server_errors_back_off_exponentially(no_sleep):
+    with LocalEDGARServer(error_rate=1.0) as server:
+        path = filing_path(server)
+        client = make_client(server.base_url, max_retries=3)
+        with pytest.raises(urllib.error.HTTPError):
+            client.get(path)
+        assert no_sleep == [1, 2, 4]
+
+
+def test_client_errors_are_not_retried(no_sleep, server):
+    client = make_client(server.base_url)
+    with pytest.raises(urllib.error.HTTPError) as e:
+        client.get('/Archives/missing.txt')
+    assert e.value.code == 404
+    assert client.num_requests == 1 and no_sleep == []
+
+
+def test_json_listing_reads_pagination_files():
+    with LocalEDGARServer(recent_limit=3) as server:
+        for n in range(8):
+            accession = f'0001000000-20-{n:06d}'
+            server.add_filing(
+                'aapl', '10-Q' if n % 2 else '8-K', accession,
+                synthetic_submission(accession), date=f'2020-01-{n + 1:02d}',
+                primary_document=f'doc{n}.htm')
+        client = make_client(server.base_url)
+
+        filings = client.list_filings_json('aapl', ['10-Q', '8-K'])
+        assert [i['date'] for i in filings] == \
+            [f'2020-01-{n:02d}' for n in range(8, 0, -1)]
+        assert filings[-1]['primary_document'] == 'doc0.htm'
+        pages = sorted({i for _, i in server.request_log
+                        if '-submissions-' in i})
+        assert [i[-8:] for i in pages] == ['001.json', '002.json']
+
+        # Older pages are left alone when their dates are not wanted
+        del server.request_log[:]
+        filings = client.list_filings_json('aapl', '10-Q',
+                                           start_date='20200106')
+        assert [i['accession'][-2:] for i in filings] == ['07', '05']
+        assert [i for _, i in server.request_log] == \
+            ['/submissions/CIK0001000000.json']
+
+
+def test_responses_are_revalidated(tmp_path, server):
+    path = filing_path(server)
+    cache = HTTPCache(str(tmp_path / 'cache'))
+    client = make_client(server.base_url, cache=cache)
+    body = client.get(path)
+    assert client.get(path) == body
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.bytes_saved == len(body)
+
+    out = str(tmp_path / 'dump.txt')
+    assert client.download(path, out) > 0
+    assert client.download(path, out) == 0
+    assert (cache.hits, cache.misses) == (2, 2)
+    with open(out, 'rb') as f:
+        assert f.read() == body
+
+    # A changed document is fetched in full again
+    server.documents[path] += b'\n'
+    server.last_modified = 'Thu, 01 Jan 2099 00:00:00 GMT'
+    assert client.get(path) == body + b'\n'
+    assert client.download(path, out) > 0
+
+
+def test_dropped_connections_are_retried(no_sleep):
+    with LocalEDGARServer(drop_rate=1.0) as server:
+        path = filing_path(server)
+        client = make_client(server.base_url, max_retries=2)
+        with pytest.raises(OSError):
+            client.get(path)
+        assert server.num_dropped == 3
+        assert no_sleep == [1, 2]
+
+        server.drop_rate = 0.0
+        assert client.get(path) == server.documents[path]
+
+
+def test_timeouts_are_retried(no_sleep):
+    slow = [True]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            # Not time.sleep, which the no_sleep fixture replaces
+            if slow.pop() if slow else False:
+                threading.Event().wait(1)
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        client = make_client(f'http://127.0.0.1:{httpd.server_address[1]}',
+                             timeout=0.2)
+        assert client.get('/slow') == b'ok'
+        assert client.num_requests == 2 and no_sleep == [1]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_not_modified_without_cached_body_fetches_again(tmp_path):
+    with LocalEDGARServer() as server:
+        path = filing_path(server)
+        cache = HTTPCache(str(tmp_path / 'cache'))
+        client = make_client(server.base_url, cache=cache)
+        body = client.get(path)
+        assert client.get(path) == body and cache.hits == 1
+
+        os.remove(cache._path(client.url(path)))
+        assert client.get(path) == body
+        assert client.num_requests == 4 and cache.hits == 1
+
+
+def test_not_modified_without_downloaded_file_fetches_again(tmp_path):
+    with LocalEDGARServer() as server:
+        path = filing_path(server)
+        cache = HTTPCache(str(tmp_path / 'cache'))
+        client = make_client(server.base_url, cache=cache)
+        out = str(tmp_path / 'dump.txt')
+        assert client.download(path, out) > 0
+        assert client.download(path, out) == 0
+
+        # Removed between the lookup and the server's answer
+        exists = network.storage.FileStorage.exists
+        calls = []
+
+        def vanish(self, p):
+            calls.append(p)
+            if len(calls) == 1:
+                return exists(self, p)
+            os.remove(out)
+            return False
+
+        network.storage.FileStorage.exists = vanish
+        try:
+            assert client.download(path, out) > 0
+        finally:
+            network.storage.FileStorage.exists = exists
+        with open(out, 'rb') as f:
+            assert f.read() == server.documents[path]
@@ -0,0 +1,135 @@
+import os
+import json
+
+import pytest
+
+from edgar import quota as quota_module
+from edgar import wrappers
+from edgar.downloader import Downloader
+from edgar.metadata_manager import metadata_manager
+from edgar.quota import AccessLog, DiskQuota
+from edgar.storage import FileStorage
+
+
+def write_features(backend, data_dir, submission, size):
+    path = os.path.join(data_dir, 'parsed', 'aapl', submission, 'f.pkl')
+    with backend.open_write(path) as f:
+        f.write(b'x' * size)
+
+
+@pytest.fixture
+def tracked(tmp_path, monkeypatch):
+    """A data directory whose writes are logged, counting full scans."""
+    log = AccessLog(str(tmp_path))
+    backend = FileStorage()
+    backend.on_access = log.touch
+    scans = []
+    scan = quota_module.scan_artifacts
+    monkeypatch.setattr(quota_module, 'scan_artifacts',
+                        lambda root: scans.append(root) or scan(root))
+    return str(tmp_path), log, backend, scans
+
+
+def test_least_recently_used_are_evicted_first(tracked):
+    data_dir, log, backend, _ = tracked
+    for n in range(4):
+        write_features(backend, data_dir, f's{n}', 1000)
+    # Used again since, so it outlives younger artifacts
+    log._recorded.clear()
+    log.touch(os.path.join(data_dir, 'parsed', 'aapl', 's0', 'f.pkl'))
+
+    quota = DiskQuota(data_dir, 2000, log=log)
+    assert quota.enforce(backend) == ['parsed/aapl/s1', 'parsed/aapl/s2']
+    assert sorted(os.listdir(os.path.join(data_dir, 'parsed', 'aapl'))) == \
+        ['s0', 's3']
+    assert quota.usage(backend) == 2000
+
+
+def test_usage_is_tracked_without_rescanning(tracked):
+    data_dir, log, backend, scans = tracked
+    for n in range(3):
+        write_features(backend, data_dir, f's{n}', 1000)
+    quota = DiskQuota(data_dir, 10 ** 6, log=log)
+    assert quota.enforce(backend) == [] and len(scans) == 1
+
+    write_features(backend, data_dir, 's3', 5000)
+    quota.max_bytes = 6000
+    evicted = quota.enforce(backend)
+    assert evicted == ['parsed/aapl/s0', 'parsed/aapl/s1']
+    assert len(scans) == 1
+    assert quota._used == quota.usage(backend) == 6000
+
+
+def test_unsplit_raw_dumps_are_kept(tracked):
+    data_dir, log, backend, _ = tracked
+    raw = os.path.join(data_dir, '.rawcache', 'aapl', '10-Q')
+    os.makedirs(raw)
+    with open(os.path.join(raw, '0001000000-20-000001.txt'), 'wb') as f:
+        f.write(b'x' * 5000)
+    write_features(backend, data_dir, 's0', 1000)
+    quota = DiskQuota(data_dir, 0, log=log)
+    assert quota.enforce(backend) == ['parsed/aapl/s0']
+    assert os.listdir(raw) == ['0001000000-20-000001.txt']
+
+
+def test_forgetting_appends_to_the_log(tracked, monkeypatch):
+    data_dir, log, backend, _ = tracked
+    for n in range(3):
+        write_features(backend, data_dir, f's{n}', 10)
+    inode = os.stat(log.log_path).st_ino
+    log.forget(['parsed/aapl/s0'])
+    assert os.stat(log.log_path).st_ino == inode
+    with open(log.log_path) as f:
+        assert json.loads(f.readlines()[-1]) == ['parsed/aapl/s0', None]
+    assert sorted(log.load()) == ['parsed/aapl/s1', 'parsed/aapl/s2']
+
+    # Rewritten with one line per artifact once it grows too large
+    monkeypatch.setattr(AccessLog, 'COMPACT_BYTES', 1)
+    log.forget(['parsed/aapl/s1'])
+    with open(log.log_path) as f:
+        assert [json.loads(i)[0] for i in f] == ['parsed/aapl/s2']
+    assert sorted(AccessLog(data_dir).load()) == ['parsed/aapl/s2']
+
+
+def test_accesses_after_a_torn_line_are_kept(tracked):
+    data_dir, log, backend, _ = tracked
+    write_features(backend, data_dir, 's0', 10)
+    with open(log.log_path, 'ab') as f:
+        f.write(b'["parsed/aapl/s1", 17')
+
+    log = AccessLog(data_dir)
+    log.touch(os.path.join(data_dir, 'parsed', 'aapl', 's2', 'f.pkl'))
+    assert sorted(log.load()) == ['parsed/aapl/s0', 'parsed/aapl/s2']
+
+
+def test_evicted_documents_are_derived_again(server, data_dir):
+    tikrs = server.add_synthetic(['aapl'], form_types=['10-Q'],
+                                 filings_per_type=4, size=20000)
+    metadata = metadata_manager(data_dir=data_dir)
+    metadata.set_quota(10 ** 9)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.query_server_bulk(tikrs, '10-Q', base_url=server.base_url,
+                             loading_bar=False)
+    loader.unpack_bulk('aapl', document_type='10-Q')
+    submissions = metadata.get_submissions('aapl')
+    texts = {i: wrappers.read_file(
+        'aapl', i, metadata.get_primary_doc_name('aapl', i),
+        data_dir=data_dir, metadata=metadata) for i in submissions}
+
+    usage = metadata.get_quota().usage(metadata.get_storage())
+    metadata.set_quota(usage // 3)
+    with metadata.deferred_quota():
+        # Held back until the outermost block exits
+        assert metadata.enforce_quota() == []
+        with metadata.deferred_quota():
+            pass
+        assert metadata.get_quota().usage(metadata.get_storage()) == usage
+    assert metadata.get_quota().usage(metadata.get_storage()) <= usage // 3
+
+    metadata = metadata_manager(data_dir=data_dir)
+    metadata.base_url = server.base_url
+    for submission, text in texts.items():
+        assert wrappers.read_file(
+            'aapl', submission,
+            metadata.get_primary_doc_name('aapl', submission),
+            data_dir=data_dir, metadata=metadata) == text
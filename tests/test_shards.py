@@ -0,0 +1,124 @@
+import os
+import multiprocessing
+
+import pytest
+
+from edgar.shards import Shard, ShardStorage
+
+ACCESSION = '0001000000-20-000001'
+
+
+def document(data_dir, name, accession=ACCESSION):
+    return os.path.join(data_dir, 'files', 'aapl', '10-Q', accession, name)
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'zstd'])
+def test_records_round_trip(tmp_path, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    backend = ShardStorage(str(tmp_path), compression=compression)
+    data = {f'doc{i}.htm': os.urandom(100) + b'x' * (1000 * i)
+            for i in range(5)}
+    for name, body in data.items():
+        with backend.open_write(document(tmp_path, name)) as f:
+            f.write(body)
+
+    # Nothing but the shard, its index and its lock file is written
+    assert not os.path.exists(tmp_path / 'files')
+    assert sorted(os.listdir(tmp_path / 'shards' / 'aapl')) == \
+        ['2020.idx', '2020.lock', '2020.shard']
+
+    # A second backend reads what the first wrote
+    for reader in (backend, ShardStorage(str(tmp_path))):
+        for name, body in data.items():
+            assert reader.exists(document(tmp_path, name))
+            assert reader.read_bytes(document(tmp_path, name)) == body
+            with reader.open_document(document(tmp_path, name)) as doc:
+                assert bytes(doc.buffer) == body
+    assert not backend.exists(document(tmp_path, 'missing.htm'))
+
+
+def test_removed_and_replaced_records(tmp_path):
+    backend = ShardStorage(str(tmp_path))
+    backend.write_bytes(document(tmp_path, 'a.htm'), b'first')
+    backend.write_bytes(document(tmp_path, 'a.htm'), b'second')
+    backend.write_bytes(document(tmp_path, 'b.htm'), b'other')
+    backend.remove(document(tmp_path, 'b.htm'))
+    assert backend.read_bytes(document(tmp_path, 'a.htm')) == b'second'
+    assert not backend.exists(document(tmp_path, 'b.htm'))
+
+    backend.remove_dir(os.path.dirname(document(tmp_path, 'a.htm')))
+    assert not ShardStorage(str(tmp_path)).exists(
+        document(tmp_path, 'a.htm'))
+
+
+def test_torn_index_line_is_ignored(tmp_path):
+    shard = Shard(str(tmp_path / 'x'))
+    shard.put('a', b'kept')
+    with open(shard.index_path, 'ab') as f:
+        f.write(b'["b", 4, 1')
+    shard.put('c', b'after')
+    reader = Shard(str(tmp_path / 'x'))
+    assert sorted(reader.keys()) == ['a', 'c']
+    assert reader.get('c') == b'after'
+
+
+def test_compaction_keeps_live_records(tmp_path):
+    backend = ShardStorage(str(tmp_path), compression='gzip')
+    for n in range(20):
+        backend.write_bytes(document(tmp_path, f'{n % 4}.htm'),
+                            os.urandom(2000))
+    backend.remove(document(tmp_path, '3.htm'))
+    live = {i: backend.read_bytes(document(tmp_path, f'{i}.htm'))
+            for i in range(3)}
+    data_path = tmp_path / 'shards' / 'aapl' / '2020.shard'
+    before = os.path.getsize(data_path)
+
+    backend.compact()
+    assert os.path.getsize(data_path) < before / 4
+    for reader in (backend, ShardStorage(str(tmp_path))):
+        for i, body in live.items():
+            assert reader.read_bytes(document(tmp_path, f'{i}.htm')) == body
+        assert not reader.exists(document(tmp_path, '3.htm'))
+    records = sorted(os.path.basename(path) for path, _, _ in
+                     ShardStorage(str(tmp_path)).records())
+    assert records == ['0.htm', '1.htm', '2.htm']
+
+
+def _compact_elsewhere(path, done):
+    shard = Shard(path)
+    for n in range(50):
+        shard.put(f'b{n}', b'B' * n)
+    shard.compact()
+    shard.put('b50', b'late')
+    shard.compact()
+    done.set()
+
+
+def test_compaction_by_another_process(tmp_path):
+    path = str(tmp_path / 'x')
+    shard = Shard(path)
+    for n in range(20):
+        shard.put(f'a{n}', b'A' * n)
+    for n in range(0, 20, 2):
+        shard.delete(f'a{n}')
+    # The read handle and index offset predate the other compactions
+    assert shard.get('a1') == b'A'
+
+    done = multiprocessing.Event()
+    other = multiprocessing.Process(target=_compact_elsewhere,
+                                    args=(path, done))
+    other.start()
+    for n in range(20, 60):
+        shard.put(f'a{n}', b'A' * n)
+    other.join()
+    assert done.is_set()
+
+    expected = {f'a{n}': b'A' * n for n in list(range(1, 20, 2)) +
+                list(range(20, 60))}
+    expected.update({f'b{n}': b'B' * n for n in range(50)})
+    expected['b50'] = b'late'
+    assert sorted(shard.keys()) == sorted(expected)
+    assert all(shard.get(k) == v for k, v in expected.items())
+    shard.compact()
+    assert sorted(Shard(path).keys()) == sorted(expected)
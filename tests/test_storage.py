@@ -0,0 +1,139 @@
+import os
+import mmap
+
+import pytest
+
+from edgar import storage, wrappers
+from edgar.downloader import Downloader
+from edgar.metadata_manager import metadata_manager
+
+COMPRESSIONS = [None, 'gzip', 'zstd']
+DATA = b''.join(b'line %d of a document\r\n' % i for i in range(5000))
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_compressed_files_round_trip(tmp_path, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    path = str(tmp_path / 'doc.htm')
+    with storage.open_write(path, compression=compression) as f:
+        f.write(DATA[:1000])
+        f.write(DATA[1000:])
+
+    stored = path + storage.SUFFIXES.get(compression, '')
+    assert os.listdir(tmp_path) == [os.path.basename(stored)]
+    assert storage.find(path) == stored
+    assert storage.compression_of(stored) == compression
+    if compression is not None:
+        assert os.path.getsize(stored) < len(DATA) // 4
+    # Read by its uncompressed name, as a stream
+    with storage.open_read(path) as f:
+        assert f.readline() == b'line 0 of a document\r\n'
+        assert f.readline(4) == b'line'
+        assert f.read() == DATA[26:]
+    assert storage.read_bytes(stored) == DATA
+    assert storage.read_slice(path, 100000, 50) == DATA[100000:100050]
+
+    # Rewritten with another compression, leaving one copy
+    storage.write_bytes(path, b'new', compression='gzip')
+    assert os.listdir(tmp_path) == ['doc.htm.gz']
+    assert storage.read_bytes(path) == b'new'
+    storage.remove(path)
+    assert os.listdir(tmp_path) == [] and not storage.exists(path)
+
+
+def test_unknown_compressions_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        storage.check_compression('lzma')
+    with pytest.raises(ValueError):
+        with storage.open_write(str(tmp_path / 'x'), compression='lzma'):
+            pass
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_compressed_data_directory(server, data_dir, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    tikrs = server.add_synthetic(['aapl'], filings_per_type=2, size=20000)
+    metadata = metadata_manager(data_dir=data_dir)
+    metadata.set_compression(compression)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.query_server_bulk(tikrs, '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+    loader.unpack_bulk('aapl', document_type='10-Q',
+                       include_supplementary=True)
+
+    suffix = storage.SUFFIXES.get(compression, '')
+    for submission in metadata.get_submissions('aapl'):
+        raw = os.path.join(data_dir, '.rawcache', 'aapl', '10-Q',
+                           f'{submission}.txt')
+        assert os.path.exists(raw + suffix)
+        files = os.path.join(data_dir, 'files', 'aapl', '10-Q', submission)
+        assert sorted(os.listdir(files)) == \
+            [f'10-q.htm{suffix}', f'ex991.htm{suffix}']
+
+        dump = next(path for _, path in server.request_log
+                    if path.endswith(f'/{submission}.txt'))
+        assert storage.read_bytes(raw) == server.documents[dump]
+        for filename in ['10-q.htm', 'ex991.htm']:
+            assert metadata.read_document('aapl', submission, filename) == \
+                server.documents[os.path.join(os.path.dirname(dump),
+                                              filename)].decode()
+        assert metadata.get_cover_facts('aapl', submission)
+
+
+def test_documents_are_memory_mapped(tmp_path):
+    path = str(tmp_path / 'doc.htm')
+    storage.write_bytes(path, DATA)
+    with storage.open_document(path) as doc:
+        assert isinstance(doc._mapping, mmap.mmap)
+        assert len(doc) == len(DATA) and doc[:4] == b'line'
+        assert doc.search(r'line (\d+) of').group(1) == b'0'
+        assert len(list(doc.finditer(rb'document\r\n'))) == 5000
+        # Decoded only as far as asked, as every reader decodes
+        assert doc.text(0, 22) == 'line 0 of a document\n'
+        assert doc.decode(0, 22) == 'line 0 of a document\r\n'
+    with storage.open_document(path, offset=22, length=22) as doc:
+        assert doc[:] == b'line 1 of a document\r\n'
+
+    storage.write_bytes(path, b'')
+    assert storage.open_document(path)[:] == b''
+    # Compressed documents are decompressed into memory instead
+    storage.write_bytes(path, DATA, compression='gzip')
+    with storage.open_document(path, offset=22, length=22) as doc:
+        assert doc._mapping is None
+        assert doc[:] == b'line 1 of a document\r\n'
+
+
+@pytest.mark.parametrize('layout,virtual', [('shards', False),
+                                            ('files', True)])
+def test_documents_are_mapped_where_stored(server, data_dir, layout,
+                                           virtual):
+    tikrs = server.add_synthetic(['aapl'], filings_per_type=3, size=5000)
+    metadata = metadata_manager(data_dir=data_dir)
+    metadata.set_layout(layout)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.query_server_bulk(tikrs, '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+    loader.unpack_bulk('aapl', document_type='10-Q',
+                       include_supplementary=True, virtual=virtual)
+    assert not os.path.exists(os.path.join(data_dir, 'files'))
+
+    files, served = [], []
+    for submission in metadata.get_submissions('aapl'):
+        dump = next(path for _, path in server.request_log
+                    if path.endswith(f'/{submission}.txt'))
+        for filename in ['ex991.htm', '10-q.htm']:
+            data = server.documents[os.path.join(os.path.dirname(dump),
+                                                 filename)]
+            with metadata.open_document('aapl', submission,
+                                        filename) as doc:
+                assert isinstance(doc._mapping, mmap.mmap)
+                assert doc[:] == data
+            files.append(('aapl', submission, filename))
+            served.append(data.decode())
+    # Returned in the order asked for, whatever order they are read in
+    files, served = files[::-1], served[::-1]
+    assert wrappers.read_files(files, data_dir=data_dir,
+                               metadata=metadata) == served
@@ -0,0 +1,89 @@
+import pytest
+
+from edgar.subheader_parser_8k import Parser_8K
+
+# Form 8-K item titles as the SEC words them
+OFFICIAL_TITLES = {
+    '1.01': 'Entry into a Material Definitive Agreement',
+    '1.02': 'Termination of a Material Definitive Agreement',
+    '1.03': 'Bankruptcy or Receivership',
+    '1.04': 'Mine Safety - Reporting of Shutdowns and Patterns of Violations',
+    '1.05': 'Material Cybersecurity Incidents',
+    '2.01': 'Completion of Acquisition or Disposition of Assets',
+    '2.02': 'Results of Operations and Financial Condition',
+    '2.03': ('Creation of a Direct Financial Obligation or an Obligation '
+             'under an Off-Balance Sheet Arrangement of a Registrant'),
+    '2.04': ('Triggering Events That Accelerate or Increase a Direct '
+             'Financial Obligation or an Obligation under an Off-Balance '
+             'Sheet Arrangement'),
+    '2.05': 'Costs Associated with Exit or Disposal Activities',
+    '2.06': 'Material Impairments',
+    '3.01': ('Notice of Delisting or Failure to Satisfy a Continued Listing '
+             'Rule or Standard; Transfer of Listing'),
+    '3.02': 'Unregistered Sales of Equity Securities',
+    '3.03': 'Material Modification to Rights of Security Holders',
+    '4.01': "Changes in Registrant's Certifying Accountant",
+    '4.02': ('Non-Reliance on Previously Issued Financial Statements or a '
+             'Related Audit Report or Completed Interim Review'),
+    '5.01': 'Changes in Control of Registrant',
+    '5.02': ('Departure of Directors or Certain Officers; Election of '
+             'Directors; Appointment of Certain Officers; Compensatory '
+             'Arrangements of Certain Officers'),
+    '5.03': ('Amendments to Articles of Incorporation or Bylaws; Change in '
+             'Fiscal Year'),
+    '5.04': ("Temporary Suspension of Trading Under Registrant's Employee "
+             'Benefit Plans'),
+    '5.05': ("Amendments to the Registrant's Code of Ethics, or Waiver of a "
+             'Provision of the Code of Ethics'),
+    '5.06': 'Change in Shell Company Status',
+    '5.07': 'Submission of Matters to a Vote of Security Holders',
+    '5.08': 'Shareholder Director Nominations',
+    '6.01': 'ABS Informational and Computational Material',
+    '6.02': 'Change of Servicer or Trustee',
+    '6.03': 'Change in Credit Enhancement or Other External Support',
+    '6.04': 'Failure to Make a Required Distribution',
+    '6.05': 'Securities Act Updating Disclosure',
+    '6.06': 'Static Pool',
+    '7.01': 'Regulation FD Disclosure',
+    '8.01': 'Other Events',
+    '9.01': 'Financial Statements and Exhibits',
+}
+
+
+@pytest.mark.parametrize('item,title', sorted(OFFICIAL_TITLES.items()))
+def test_official_titles_map_to_their_item(item, title):
+    assert Parser_8K.item_number(title) == item
+    assert Parser_8K.item_number(title.upper()) == item
+
+
+@pytest.mark.parametrize('title,item', [
+    ('Cost Associated with Exit or Disposal Activities', '2.05'),
+    ('Acquisition or Disposition of Assets', '2.01'),
+    ('Material Modifications to Rights of Security Holders', '3.03'),
+    ('Departure of Directors or Certain Officers; Election of Directors; '
+     'Appointment of Certain Officers: Compensatory Arrangements of '
+     'Certain Officers', '5.02'),
+    ('Results of Operations', '2.02'),
+    ('Financial Statements', '9.01'),
+    ('Regulation FD', '7.01'),
+])
+def test_variant_titles_map_to_their_item(title, item):
+    assert Parser_8K.item_number(title) == item
+
+
+@pytest.mark.parametrize('title', [
+    '', 'Status', 'Quarterly Report',
+    # Each starts several titles, or too little of one
+    'Material', 'Change', 'Change in', 'Financial', 'Entry',
+])
+def test_unknown_titles_map_to_nothing(title):
+    assert Parser_8K.item_number(title) is None
+
+
+def test_sections_are_found_under_official_titles():
+    text = ('<p>Item 2.05 Costs Associated with Exit or Disposal '
+            'Activities</p><p>We closed a plant.</p>'
+            '<p>Item 9.01 Financial Statements and Exhibits</p>')
+    sections, items = Parser_8K().get_sections(text, return_types=True)
+    assert items == ['2.05', '9.01']
+    assert 'closed a plant' in sections[0]
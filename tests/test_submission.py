@@ -0,0 +1,181 @@
+import binascii
+import io
+import os
+
+import pytest
+
+from edgar.downloader import Downloader
+from edgar.metadata_manager import metadata_manager
+from edgar.submission import SubmissionReader, scan_submission, scan_stream
+
+ACCESSION = '0001000000-20-000001'
+# cp1252 quotes and accents, a stray NUL and 0xFF, and CRLF line ends
+BODIES = [b'<html><p>caf\xe9 \x93quoted\x94</p>\r\n<p>line 2</p>\r\n'
+          b'</html>\r\n',
+          b'<html>\x00\xff not text\r\n\r\n</html>\r\n']
+
+
+def crlf_dump(documents=None):
+    header = ('<SEC-DOCUMENT>{0}.txt : 20200102\r\n'
+              '<SEC-HEADER>{0}.hdr.sgml : 20200102\r\n'
+              'ACCESSION NUMBER:\t\t{0}\r\n'
+              'CONFORMED SUBMISSION TYPE:\t8-K\r\n'
+              'FILED AS OF DATE:\t\t20200102\r\n'
+              'FILER:\r\n'
+              '\tCOMPANY DATA:\t\r\n'
+              '\t\tCENTRAL INDEX KEY:\t\t\t0001000000\r\n'
+              '\tFILING VALUES:\r\n'
+              '\t\tFORM TYPE:\t\t8-K\r\n'
+              '</SEC-HEADER>\r\n').format(ACCESSION).encode('ascii')
+    if documents is None:
+        documents = [(b'8-K', b'a8-k.htm', BODIES[0]),
+                     (b'EX-99.1', b'ex991.htm', BODIES[1])]
+    docs = b''.join(
+        b'<DOCUMENT>\r\n<TYPE>%s\r\n<SEQUENCE>%d\r\n<FILENAME>%s\r\n'
+        b'<TEXT>\r\n%s</TEXT>\r\n</DOCUMENT>\r\n' % (
+            doc_type, n + 1, filename, body)
+        for n, (doc_type, filename, body) in enumerate(documents))
+    return header + docs + b'</SEC-DOCUMENT>\r\n'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 1 << 16])
+def test_reader_bodies_are_byte_exact(chunk_size):
+    reader = SubmissionReader(io.BytesIO(crlf_dump()), chunk_size=chunk_size)
+    assert reader.kind == 'SEC-DOCUMENT'
+    docs = [(i.filename, i.type, b''.join(i.iter_body())) for i in reader]
+    assert docs == [('a8-k.htm', '8-K', BODIES[0]),
+                    ('ex991.htm', 'EX-99.1', BODIES[1])]
+
+
+def test_scanned_offsets_are_byte_exact(tmp_path):
+    data = crlf_dump()
+    path = tmp_path / f'{ACCESSION}.txt'
+    path.write_bytes(data)
+    for kind, header, docs in (scan_submission(str(path)),
+                               scan_stream(io.BytesIO(data))):
+        assert kind == 'SEC-DOCUMENT'
+        assert f'ACCESSION NUMBER:\t\t{ACCESSION}\r\n' in header
+        assert [data[i.offset:i.offset + i.length] for i in docs] == BODIES
+
+
+def test_unskipped_bodies_are_passed_over():
+    reader = SubmissionReader(io.BytesIO(crlf_dump()), chunk_size=5)
+    assert [i.filename for i in reader] == ['a8-k.htm', 'ex991.htm']
+
+
+@pytest.mark.parametrize('virtual', [False, True])
+def test_unpacked_documents_are_byte_exact(data_dir, virtual):
+    raw = os.path.join(data_dir, '.rawcache', 'aapl', '8-K')
+    os.makedirs(raw)
+    with open(os.path.join(raw, f'{ACCESSION}.txt'), 'wb') as f:
+        f.write(crlf_dump())
+    metadata = metadata_manager(data_dir=data_dir)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.unpack_file('aapl', f'{ACCESSION}.txt', document_type='8-K',
+                       include_supplementary=True, virtual=virtual)
+
+    for filename, body in zip(['a8-k.htm', 'ex991.htm'], BODIES):
+        with metadata.open_document('aapl', ACCESSION, filename) as doc:
+            assert bytes(doc.buffer) == body
+        # Text is decoded leniently, with universal newlines
+        text = metadata.read_document('aapl', ACCESSION, filename)
+        assert '\r' not in text
+    assert 'caf� �quoted�' in metadata.read_document(
+        'aapl', ACCESSION, 'a8-k.htm')
+
+
+def uuencode(data, name):
+    lines = [binascii.b2a_uu(data[i:i + 45])
+             for i in range(0, len(data), 45)]
+    return b'begin 644 %s\n%s`\nend\n' % (name, b''.join(lines))
+
+
+def test_binary_exhibits_are_uudecoded_on_demand(data_dir):
+    image = bytes(range(256)) * 3
+    pdf = b'%PDF-1.4\n' + bytes(range(255, -1, -1)) + b'\n%%EOF\n'
+    dump = crlf_dump([
+        (b'8-K', b'a8-k.htm', BODIES[0]),
+        (b'GRAPHIC', b'g1.jpg', uuencode(image, b'g1.jpg')),
+        (b'EX-99.2', b'r1.pdf',
+         b'<PDF>\n' + uuencode(pdf, b'r1.pdf') + b'</PDF>\n')])
+    raw = os.path.join(data_dir, '.rawcache', 'aapl', '8-K')
+    os.makedirs(raw)
+    with open(os.path.join(raw, f'{ACCESSION}.txt'), 'wb') as f:
+        f.write(dump)
+    metadata = metadata_manager(data_dir=data_dir)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.unpack_file('aapl', f'{ACCESSION}.txt', document_type='8-K',
+                       include_supplementary=True)
+
+    # Left in the raw dump, with only their byte range recorded
+    assert os.listdir(os.path.join(data_dir, 'files', 'aapl', '8-K',
+                                   ACCESSION)) == ['a8-k.htm']
+    assert metadata.read_exhibit('aapl', ACCESSION, 'g1.jpg') == image
+    assert metadata.read_exhibit('aapl', ACCESSION, 'r1.pdf') == pdf
+    with pytest.raises(FileNotFoundError):
+        metadata.read_exhibit('aapl', ACCESSION, 'missing.jpg')
+
+
+@pytest.mark.parametrize('include,exclude,supplementary,expected', [
+    (['EX-99.*'], None, False, ['a8-k.htm', 'ex991.htm', 'ex992.htm']),
+    (['EX-99.*'], ['EX-99.2'], False, ['a8-k.htm', 'ex991.htm']),
+    (None, ['ex-10*'], True, ['a8-k.htm', 'ex991.htm', 'ex992.htm']),
+    (['EX-10.1'], None, False, ['a8-k.htm', 'ex101.htm']),
+])
+def test_exhibits_are_selected_by_type(data_dir, include, exclude,
+                                       supplementary, expected):
+    exhibits = [(b'EX-99.1', b'ex991.htm'), (b'EX-99.2', b'ex992.htm'),
+                (b'EX-10.1', b'ex101.htm')]
+    dump = crlf_dump([(b'8-K', b'a8-k.htm', BODIES[0])] + [
+        (doc_type, filename, b'<html>%s</html>\r\n' % filename)
+        for doc_type, filename in exhibits])
+    raw = os.path.join(data_dir, '.rawcache', 'aapl', '8-K')
+    os.makedirs(raw)
+    with open(os.path.join(raw, f'{ACCESSION}.txt'), 'wb') as f:
+        f.write(dump)
+    metadata = metadata_manager(data_dir=data_dir)
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.unpack_file('aapl', f'{ACCESSION}.txt', document_type='8-K',
+                       include_supplementary=supplementary,
+                       include_types=include, exclude_types=exclude)
+
+    assert sorted(os.listdir(os.path.join(
+        data_dir, 'files', 'aapl', '8-K', ACCESSION))) == expected
+    # Skipped exhibits stay readable from the raw dump
+    for _, filename in exhibits:
+        assert metadata.read_exhibit('aapl', ACCESSION, filename.decode()) \
+            == b'<html>%s</html>\r\n' % filename
+
+
+@pytest.mark.parametrize('documents', [True, False])
+def test_scanned_headers_match_unpacked_metadata(make_data_dir, documents):
+    submissions = []
+    for scan in (True, False):
+        data_dir = make_data_dir()
+        raw = os.path.join(data_dir, '.rawcache', 'aapl', '8-K')
+        os.makedirs(raw)
+        with open(os.path.join(raw, f'{ACCESSION}.txt'), 'wb') as f:
+            f.write(crlf_dump())
+        metadata = metadata_manager(data_dir=data_dir)
+        loader = Downloader(data_dir=data_dir, metadata=metadata)
+        if scan:
+            loader.scan_file('aapl', f'{ACCESSION}.txt', document_type='8-K',
+                             documents=documents)
+            assert not os.path.exists(os.path.join(data_dir, 'files'))
+        else:
+            loader.unpack_file('aapl', f'{ACCESSION}.txt',
+                               document_type='8-K')
+        submissions.append(metadata._get_submission('aapl', ACCESSION))
+    scanned, unpacked = submissions
+
+    assert scanned['attrs'] == unpacked['attrs']
+    assert scanned['attrs']['FORM TYPE'] == '8-K'
+    if not documents:
+        assert scanned['documents'] == {}
+        return
+    # Only unpacking extracts anything
+    for entry in unpacked['documents'].values():
+        entry.pop('extracted')
+    for entry in scanned['documents'].values():
+        assert entry.pop('extracted') is False
+    assert scanned['documents'] == unpacked['documents']
@@ -0,0 +1,73 @@
+import pytest
+
+from edgar.network import EDGARClient, TokenBucket
+from edgar.tickers import TickerIndex, TICKERS_EXCHANGE_PATH
+
+
+def make_client(server, tickers):
+    return EDGARClient('Test test@example.com', base_url=server.base_url,
+                       rate_limiter=TokenBucket(rate=1000, capacity=1000),
+                       tickers=tickers)
+
+
+def index_requests(server):
+    return [i for _, i in server.request_log if i == TICKERS_EXCHANGE_PATH]
+
+
+@pytest.fixture
+def companies(server):
+    server.add_company('aapl', name='Apple Inc.', exchange='Nasdaq')
+    server.add_company('msft', name='Microsoft Corp', exchange='Nasdaq')
+    cik = server.add_company('goog', name='Alphabet Inc.', exchange='Nasdaq')
+    server.add_company('googl', cik=cik, name='Alphabet Inc.',
+                       exchange='Nasdaq')
+    return server
+
+
+def test_companies_are_looked_up_and_searched(companies, tmp_path):
+    path = str(tmp_path / 'company_tickers_exchange.json')
+    index = TickerIndex(path)
+    index.update(make_client(companies, index))
+
+    # Saved, and answered from disk from then on
+    for index in (index, TickerIndex(path)):
+        index.load()
+        assert len(index) == 4 and 'AAPL' in index
+        assert index.get('Msft') == {'ticker': 'msft', 'cik': 1000001,
+                                     'name': 'Microsoft Corp',
+                                     'exchange': 'Nasdaq'}
+        assert index.get_cik('aapl') == 1000000
+        assert index.get_tickers(1000002) == ['goog', 'googl']
+        assert index.get('nvda') is None
+        with pytest.raises(KeyError):
+            index.get_cik('nvda')
+
+        # Tickers first, then names
+        assert [i['ticker'] for i in index.search('goo')] == \
+            ['goog', 'googl']
+        assert [i['ticker'] for i in index.search('a')] == \
+            ['aapl', 'goog', 'googl']
+        assert [i['ticker'] for i in index.search('MICRO')] == ['msft']
+        assert index.search('a', limit=1)[0]['ticker'] == 'aapl'
+        assert index.search('zzz') == []
+    assert len(index_requests(companies)) == 1
+
+
+def test_missing_tickers_refresh_the_index_once(companies, tmp_path):
+    path = str(tmp_path / 'company_tickers_exchange.json')
+    client = make_client(companies, TickerIndex(path))
+    assert client.get_cik('aapl') == 1000000
+    assert client.get_cik('googl') == 1000002
+    assert client.get_cik('320193') == 320193
+    assert len(index_requests(companies)) == 1
+
+    # Listed since the index was saved
+    cik = companies.add_company('nvda')
+    client = make_client(companies, TickerIndex(path))
+    assert client.get_cik('msft') == 1000001
+    assert len(index_requests(companies)) == 1
+    assert client.get_cik('nvda') == cik
+    assert len(index_requests(companies)) == 2
+    with pytest.raises(KeyError):
+        client.get_cik('zzzz')
+    assert len(index_requests(companies)) == 2
@@ -0,0 +1,52 @@
+import os
+
+from edgar.downloader import Downloader
+from edgar.metadata_manager import metadata_manager
+
+
+def stored(root, area):
+    """List the files under one area of a tier, relative to it."""
+    return sorted(os.path.relpath(os.path.join(path, i), root)
+                  for path, _, names in os.walk(os.path.join(root, area))
+                  for i in names)
+
+
+def test_demoted_files_are_promoted_on_read(server, data_dir, tmp_path):
+    tikrs = server.add_synthetic(['aapl'], filings_per_type=3, size=5000)
+    cold = str(tmp_path / 'cold')
+    metadata = metadata_manager(data_dir=data_dir)
+    metadata.set_tiers([cold])
+    loader = Downloader(data_dir=data_dir, metadata=metadata)
+    loader.query_server_bulk(tikrs, '10-Q', rate=1000,
+                             base_url=server.base_url, loading_bar=False)
+    loader.unpack_bulk('aapl', document_type='10-Q')
+    submissions = metadata.get_submissions('aapl')
+    texts = {i: metadata.read_document('aapl', i, '10-q.htm')
+             for i in submissions}
+    hot = {i: stored(data_dir, i) for i in ['.rawcache', 'files']}
+
+    tiers = metadata.get_tiers()
+    # Everything was used just now
+    assert tiers.demote(3600) == []
+    moved = tiers.demote(-1)
+    assert sorted(moved) == sorted(
+        [(f'.rawcache/aapl/10-Q/{i}.txt', 1) for i in submissions] +
+        [(f'files/aapl/10-Q/{i}', 1) for i in submissions])
+    for area, files in hot.items():
+        assert stored(data_dir, area) == []
+        assert stored(cold, area) == files
+    assert tiers.usage()[0] == 0 and tiers.usage()[1] > 0
+
+    # Found in the cold tier, and moved back up as it is read
+    first = submissions[0]
+    metadata = metadata_manager(data_dir=data_dir)
+    assert metadata.read_document('aapl', first, '10-q.htm') == texts[first]
+    assert stored(data_dir, 'files') == \
+        [f'files/aapl/10-Q/{first}/10-q.htm']
+    assert f'files/aapl/10-Q/{first}/10-q.htm' not in stored(cold, 'files')
+    for submission in submissions[1:]:
+        assert metadata.read_document('aapl', submission, '10-q.htm') == \
+            texts[submission]
+    assert stored(data_dir, 'files') == hot['files']
+    assert stored(cold, 'files') == []
+    assert stored(cold, '.rawcache') == hot['.rawcache']
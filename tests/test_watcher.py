@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from edgar.downloader import Downloader
+from edgar.localserver import synthetic_submission
+from edgar.watcher import FilingWatcher
+
+
+def add_8k(server, tikr, n):
+    cik = server.add_company(tikr)
+    accession = f'{cik:010d}-20-{n:06d}'
+    server.add_filing(tikr, '8-K', accession, synthetic_submission(
+        accession, form_type='8-K', cik=cik))
+    return accession
+
+
+def test_new_filings_are_detected_once(server, data_dir):
+    server.add_company('msft')
+    first = add_8k(server, 'aapl', 1)
+    events = []
+    watcher = FilingWatcher(Downloader(data_dir=data_dir), ['aapl'],
+                            callback=events.append, rate=1000,
+                            base_url=server.base_url)
+
+    assert [i.accession for i in watcher.poll()] == [first]
+    assert watcher.poll() == []
+
+    # Only followed companies are ingested, oldest first
+    add_8k(server, 'msft', 1)
+    second = add_8k(server, 'aapl', 2)
+    third = add_8k(server, 'aapl', 3)
+    assert [i.accession for i in watcher.poll()] == [second, third]
+    assert [i.accession for i in events] == [first, second, third]
+
+    metadata = watcher.metadata
+    assert sorted(metadata.get_submissions('aapl')) == [first, second, third]
+    for event in events:
+        assert event.error is None and event.tikr == 'aapl'
+        assert event.detected <= event.downloaded <= event.unpacked <= \
+            event.finished
+        assert os.path.exists(os.path.join(
+            data_dir, '.rawcache', 'aapl', '8-K', f'{event.accession}.txt'))
+        filename = metadata.get_primary_doc_name('aapl', event.accession)
+        assert metadata.read_document('aapl', event.accession, filename)
+
+    # Filings already in the metadata are never fetched again
+    watcher = FilingWatcher(Downloader(data_dir=data_dir), ['aapl'],
+                            rate=1000, base_url=server.base_url)
+    assert watcher.poll() == []
+
+
+def test_unreadable_feed_is_skipped(server, data_dir):
+    add_8k(server, 'aapl', 1)
+    watcher = FilingWatcher(Downloader(data_dir=data_dir), ['aapl'],
+                            rate=1000, base_url=server.base_url)
+    watcher.client.max_retries = 0
+    assert len(watcher.poll()) == 1
+
+    server.error_rate = 1.0
+    with pytest.warns(RuntimeWarning, match='filings feed'):
+        assert watcher.poll() == []
+    server.error_rate = 0.0
+    add_8k(server, 'aapl', 2)
+    assert len(watcher.poll()) == 1